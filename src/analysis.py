@@ -0,0 +1,436 @@
+import re
+from math import isfinite
+import numpy as np
+from arrays import array_names, reads_arrays
+from errors import BudgetExceededError, InvalidInputError
+from evaluator import Evaluator
+from optimizer import optimize
+from registry import functions
+from shunting_yard import ShuntingYard
+from vectorized import VectorEvaluator
+
+# the absolute tolerance of solve and integrate
+DEFAULT_TOLERANCE = 1e-9
+# how many times an operation may evaluate its expression
+DEFAULT_BUDGET = 1_000_000
+# how many points solve evaluates at once when it narrows the bracket
+SOLVE_POINTS = 64
+# how many terms sum evaluates at once
+SUM_CHUNK = 64 * 1024
+
+# the nodes of the 15-point Gauss-Kronrod rule on [-1, 1], and the weights of the
+# Kronrod rule and of the 7-point Gauss rule that uses every other node
+_kronrod_half = np.array([0.991455371120812639206854697526329, 0.949107912342758524526189684047851,
+                          0.864864423359769072789712788640926, 0.741531185599394439863864773280788,
+                          0.586087235467691130294144845693013, 0.405845151377397166906606412076961,
+                          0.207784955007898467600689403773245, 0.0])
+_kronrod_half_weights = np.array([
+    0.022935322010529224963732008058970, 0.063092092629978553290700663189204,
+    0.104790010322250183839876322541518, 0.140653259715525918745189590510238,
+    0.169004726639267902826583426598550, 0.190350578064785409913256402421014,
+    0.204432940075298892414161999234649, 0.209482141084727828012999174891714])
+kronrod_nodes = np.concatenate([-_kronrod_half[:-1], _kronrod_half[::-1]])
+kronrod_weights = np.concatenate([_kronrod_half_weights[:-1], _kronrod_half_weights[::-1]])
+gauss_weights = np.zeros(15)
+gauss_weights[[1, 13]] = 0.129484966168869693270611432679082
+gauss_weights[[3, 11]] = 0.279705391489276667901467771423780
+gauss_weights[[5, 9]] = 0.381830050505118944950369775488975
+gauss_weights[7] = 0.417959183673469387755102040816327
+
+# the operations that can be typed in the calculator: solve(expression, x, lo, hi),
+# integrate(expression, x, a, b) and sum(expression, k, m, n)
+operation_pattern = re.compile(r"\s*(solve|integrate|sum)\s*\((.*)\)\s*", re.DOTALL)
+# the start of an operation inside a longer expression, e.g. in "2*integrate(x, x, 0, 1)"
+call_pattern = re.compile(r"(?<![a-z0-9_.])(solve|integrate|sum)\s*\(")
+
+
+class Sampler:
+    """Evaluates a program at many values of one variable with VectorEvaluator.
+
+    Attributes:
+        program: The compiled expression.
+        name: The variable that gets the values.
+        columns: The values of the other variables the program uses.
+        budget: How many evaluations are allowed.
+        evaluations: How many evaluations have been done.
+    """
+
+    def __init__(self, expression, name: str, variables: dict, budget: int):
+        """The constructor for the Sampler class.
+
+        Args:
+            expression (str | Program): The expression, which is compiled once here.
+            name (str): The variable that gets the values.
+            variables (dict): The values of the other variables.
+            budget (int): How many evaluations are allowed.
+
+        Raises:
+            UnknownInputError: Raised when the expression uses an unknown name.
+        """
+        if isinstance(expression, str):
+            expression = ShuntingYard(expression, {**variables, name: None}).parse()
+        self.program = optimize(expression)
+        self.name = name
+        self.columns = {other: variables[other] for other in self.program.names
+                        if other != name and other in variables}
+        self.budget = budget
+        self.evaluations = 0
+
+    def __call__(self, points):
+        """Evaluates the program at each point.
+
+        Args:
+            points (array_like): The values of the variable.
+
+        Raises:
+            BudgetExceededError: Raised when the evaluations would go over the budget.
+            UnknownInputError: Raised when the program uses a variable without a value.
+            ArithmeticError, ValueError, TypeError: The error of the first point that failed,
+                                                    the same as Evaluator would raise.
+
+        Returns:
+            ndarray: The values of the program, not rounded.
+        """
+        points = np.asarray(points, dtype=np.float64)
+        if self.evaluations + points.size > self.budget:
+            raise BudgetExceededError(f"more than {self.budget} evaluations needed")
+        self.evaluations += points.size
+        evaluator = VectorEvaluator(self.program, {**self.columns, self.name: points})
+        values = np.broadcast_to(evaluator.value(), points.shape)
+        if evaluator.failed.any():
+            raise evaluator.errors[evaluator.failed][0]
+        return values
+
+
+def sign_change(values):
+    """Finds the first pair of neighbouring points where the values change sign.
+
+    Args:
+        values (ndarray): The values at points in increasing order.
+
+    Returns:
+        int | None: The index of the first point of the pair, or None.
+    """
+    changes = np.flatnonzero(np.signbit(values[:-1]) != np.signbit(values[1:]))
+    return int(changes[0]) if len(changes) else None
+
+
+def solve(expression, name: str, lo: float, hi: float, variables=None, *,
+          tolerance: float = DEFAULT_TOLERANCE, budget: int = DEFAULT_BUDGET) -> float:
+    """Finds a root of an expression between two values of a variable.
+
+    The interval is split into SOLVE_POINTS parts, which are evaluated at once, and the
+    first part where the expression changes sign is split again until it is shorter than
+    the tolerance. Each step makes the bracket 64 times shorter, so a root is found in a
+    few vectorized evaluations.
+
+    Example: solve("x^2-2", "x", 0, 2) -> 1.414213562...
+
+    Args:
+        expression (str | Program): The expression.
+        name (str): The variable that is solved for.
+        lo (float): The start of the interval.
+        hi (float): The end of the interval.
+        variables (dict | None): The values of the other variables.
+        tolerance (float): How close to the root the result must be. Defaults to 1e-9.
+        budget (int): How many times the expression may be evaluated.
+
+    Raises:
+        ValueError: Raised when the expression doesn't change sign in the interval.
+        BudgetExceededError: Raised when the root isn't found within the budget.
+
+    Returns:
+        float: The root.
+    """
+    sample = Sampler(expression, name, variables or {}, budget)
+    lo, hi = sorted((float(lo), float(hi)))
+    points = np.linspace(lo, hi, SOLVE_POINTS + 1)
+    values = sample(points)
+    while True:
+        zeros = np.flatnonzero(values == 0)
+        if len(zeros):
+            return float(points[zeros[0]])
+        index = sign_change(values)
+        if index is None:
+            raise ValueError(f"the expression doesn't change sign between {lo} and {hi}")
+        low, high = points[index], points[index + 1]
+        if high - low <= tolerance:
+            return float((low + high) / 2)
+        inside = np.linspace(low, high, SOLVE_POINTS + 1)[1:-1]
+        if not (low < inside[0] and inside[-1] < high):  # no more floats in between
+            return float((low + high) / 2)
+        points = np.concatenate([[low], inside, [high]])
+        values = np.concatenate([[values[index]], sample(inside), [values[index + 1]]])
+
+
+def gauss_kronrod(sample, starts, ends) -> tuple:
+    """Integrates over many intervals with one evaluation of the expression.
+
+    Args:
+        sample (Sampler): Evaluates the expression.
+        starts (ndarray): The starts of the intervals.
+        ends (ndarray): The ends of the intervals.
+
+    Returns:
+        tuple: The integrals over the intervals and the estimates of their errors.
+    """
+    centers, halves = (starts + ends) / 2, (ends - starts) / 2
+    values = sample(centers[:, None] + halves[:, None] * kronrod_nodes)
+    integrals = halves * (values @ kronrod_weights)
+    return integrals, np.abs(integrals - halves * (values @ gauss_weights))
+
+
+def integrate(expression, name: str, a: float, b: float, variables=None, *,
+              tolerance: float = DEFAULT_TOLERANCE, budget: int = DEFAULT_BUDGET) -> float:
+    """Calculates the definite integral of an expression with adaptive quadrature.
+
+    Each interval is integrated with the 15-point Gauss-Kronrod rule, and the difference
+    to the 7-point Gauss rule estimates the error. The intervals whose error is over
+    their share of the tolerance are halved, and all of them are evaluated at once in
+    the next round.
+
+    Example: integrate("sin(x)", "x", 0, 3.14159) -> 2.0
+
+    Args:
+        expression (str | Program): The expression.
+        name (str): The variable of integration.
+        a (float): The lower limit.
+        b (float): The upper limit.
+        variables (dict | None): The values of the other variables.
+        tolerance (float): The largest allowed absolute error. Defaults to 1e-9.
+        budget (int): How many times the expression may be evaluated.
+
+    Raises:
+        ValueError: Raised when a limit isn't finite.
+        BudgetExceededError: Raised when the tolerance isn't met within the budget.
+
+    Returns:
+        float: The integral.
+    """
+    sample = Sampler(expression, name, variables or {}, budget)
+    a, b = float(a), float(b)
+    if not (np.isfinite(a) and np.isfinite(b)):
+        raise ValueError("the limits of integration must be finite")
+    if a == b:
+        return 0.0
+    sign = 1.0 if a < b else -1.0
+    a, b = min(a, b), max(a, b)
+    starts, ends = np.array([a]), np.array([b])
+    total = 0.0
+    while len(starts):
+        integrals, errors = gauss_kronrod(sample, starts, ends)
+        # an interval is done when its error is within its share of the tolerance, or
+        # when it is too short to be halved
+        done = (errors <= tolerance * (ends - starts) / (b - a)) | (
+            ends - starts <= 1e-15 * np.abs(starts + ends))
+        total += np.sum(integrals[done])
+        starts, ends = starts[~done], ends[~done]
+        starts, ends = (np.concatenate([starts, (starts + ends) / 2]),
+                        np.concatenate([(starts + ends) / 2, ends]))
+    return sign * float(total)
+
+
+def summation(expression, name: str, first: int, last: int, variables=None, *,
+              budget: int = DEFAULT_BUDGET) -> float:
+    """Adds up the values of an expression for each integer from first to last.
+
+    The terms are evaluated SUM_CHUNK at a time and added with NumPy's pairwise sum.
+
+    Example: summation("1/k^2", "k", 1, 1000) -> 1.6439345...
+
+    Args:
+        expression (str | Program): The expression.
+        name (str): The index variable.
+        first (int): The first index.
+        last (int): The last index. If it is smaller than first the sum is 0.
+        variables (dict | None): The values of the other variables.
+        budget (int): How many terms are allowed.
+
+    Raises:
+        ValueError: Raised when a bound isn't an integer.
+        BudgetExceededError: Raised when there are more terms than the budget.
+
+    Returns:
+        float: The sum.
+    """
+    sample = Sampler(expression, name, variables or {}, budget)
+    if first != int(first) or last != int(last):
+        raise ValueError("the bounds of a sum must be integers")
+    first, last = int(first), int(last)
+    if last - first + 1 > budget:
+        raise BudgetExceededError(f"more than {budget} terms")
+    total = 0.0
+    for start in range(first, last + 1, SUM_CHUNK):
+        total += float(np.sum(sample(np.arange(start, min(start + SUM_CHUNK, last + 1)))))
+    return total
+
+
+# the operation for each name that can be typed, and the optional arguments it takes
+# after the expression, the variable and the two bounds
+operations = {
+    "solve": (solve, ("tolerance", "budget")),
+    "integrate": (integrate, ("tolerance", "budget")),
+    "sum": (summation, ("budget",))
+}
+
+
+def split_arguments(text: str):
+    """Splits the arguments of a call at the commas that aren't inside parentheses.
+
+    Args:
+        text (str): The text between the parentheses of the call.
+
+    Returns:
+        list | None: The arguments, or None when the parentheses don't belong to one call,
+                     e.g. in "sum(...)+sum(...)".
+    """
+    arguments = []
+    depth = 0
+    start = 0
+    for index, character in enumerate(text):
+        if character == "(":
+            depth += 1
+        elif character == ")":
+            depth -= 1
+            if depth < 0:
+                return None
+        elif character == "," and depth == 0:
+            arguments.append(text[start:index])
+            start = index + 1
+    arguments.append(text[start:])
+    return arguments
+
+
+def split_operation(expression: str):
+    """Recognizes an expression that is one call of solve, integrate or sum.
+
+    A call with one argument is left to the parser if a function has the same name.
+
+    Args:
+        expression (str): The typed expression.
+
+    Returns:
+        tuple | None: The name of the operation and its arguments as strings, or None
+                      when the expression is something else.
+    """
+    match = operation_pattern.fullmatch(expression)
+    if match is None:
+        return None
+    arguments = split_arguments(match.group(2))
+    # sum(x) is the function that adds up the elements of an array
+    if arguments is None or (len(arguments) == 1 and match.group(1) in functions):
+        return None
+    return match.group(1), [argument.strip() for argument in arguments]
+
+
+def run_operation(name: str, arguments: list, variables: dict) -> float:
+    """Calculates a typed solve, integrate or sum call.
+
+    The bounds and the optional tolerance and budget can be expressions of the variables.
+    The variable of the operation hides a stored variable with the same name.
+
+    Args:
+        name (str): solve, integrate or sum.
+        arguments (list): The expression, the variable and the numbers as strings.
+        variables (dict): The stored variables.
+
+    Raises:
+        InvalidInputError: Raised when the arguments aren't valid.
+
+    Returns:
+        float: The result, not rounded.
+    """
+    operation, optional = operations[name]
+    if not 4 <= len(arguments) <= 4 + len(optional):
+        raise InvalidInputError(f"{name} takes from 4 to {4 + len(optional)} arguments")
+    expression, variable = arguments[:2]
+    if not re.fullmatch("[a-z]+", variable) or variable in functions:
+        raise InvalidInputError(f"'{variable}' can't be the variable of {name}")
+    program = ShuntingYard(expression, {**variables, variable: None}).parse()
+    if not array_names(variables).isdisjoint(program.names - {variable}):
+        raise InvalidInputError(f"the expression of {name} can't read array variables")
+    numbers = [ShuntingYard(expand_operations(argument, variables), variables).parse()
+               for argument in arguments[2:]]
+    if any(reads_arrays(number, variables) for number in numbers):
+        raise InvalidInputError(f"the bounds of {name} can't read array variables")
+    first, second, *extra = [Evaluator(number, variables).value() for number in numbers]
+    options = dict(zip(optional, extra))
+    if "budget" in options:
+        options["budget"] = int(options["budget"])
+    return operation(program, variable, first, second, variables, **options)
+
+
+def closing_parenthesis(text: str, start: int):
+    """Finds the parenthesis that closes a call.
+
+    Args:
+        text (str): The expression.
+        start (int): The position right after the opening parenthesis.
+
+    Returns:
+        int | None: The position of the closing parenthesis, or None if there is none.
+    """
+    depth = 1
+    for index in range(start, len(text)):
+        if text[index] == "(":
+            depth += 1
+        elif text[index] == ")":
+            depth -= 1
+            if depth == 0:
+                return index
+    return None
+
+
+def find_operations(expression: str):
+    """Finds the solve, integrate and sum calls inside an expression.
+
+    A call with one argument is left to the parser if a function has the same name, and
+    so is a call without a closing parenthesis. Calls inside the arguments of a call that
+    was found aren't found separately.
+
+    Args:
+        expression (str): The typed expression.
+
+    Yields:
+        tuple: The name of the operation, its arguments as strings, and the positions of
+               the start of the call and of its closing parenthesis.
+    """
+    position = 0
+    for match in call_pattern.finditer(expression):
+        end = closing_parenthesis(expression, match.end())
+        if match.start() < position or end is None:
+            continue
+        arguments = split_arguments(expression[match.end():end])
+        if len(arguments) == 1 and match.group(1) in functions:
+            continue
+        yield match.group(1), [argument.strip() for argument in arguments], match.start(), end
+        position = end + 1
+
+
+def expand_operations(expression: str, variables: dict) -> str:
+    """Replaces the solve, integrate and sum calls inside an expression with their results.
+
+    This lets the operations be used as parts of longer expressions, e.g.
+    "2*integrate(x, x, 0, 1)".
+
+    Args:
+        expression (str): The typed expression.
+        variables (dict): The stored variables.
+
+    Raises:
+        InvalidInputError: Raised when the arguments of a call aren't valid.
+        OverflowError: Raised when the result of a call isn't a finite number.
+
+    Returns:
+        str: The expression with the results in parentheses in place of the calls.
+    """
+    parts = []
+    position = 0
+    for name, arguments, start, end in find_operations(expression):
+        value = run_operation(name, arguments, variables)
+        if not isfinite(value):
+            raise OverflowError(f"the result of {name} isn't finite")
+        parts += [expression[position:start], f"({value!r})"]
+        position = end + 1
+    parts.append(expression[position:])
+    return "".join(parts)
@@ -0,0 +1,180 @@
+import numpy as np
+from errors import InvalidInputError, UnknownInputError
+from evaluator import Evaluator
+from program import Program
+from variable_store import VariableStore
+from vectorized import VectorEvaluator
+
+# the functions that reduce their arguments to one number
+aggregates = {
+    "sum": np.sum,
+    "mean": np.mean,
+    "_min": np.min,
+    "_max": np.max,
+    "norm": np.linalg.norm,
+    "dot": lambda x, y: np.sum(x * y)
+}
+
+
+class ArrayEvaluator(VectorEvaluator):
+    """Evaluates a program where variables can be arrays, with one array operation per opcode.
+
+    The operators and functions apply to each element of an array, a number is combined
+    with every element, and sum, mean, min, max, dot and norm reduce an array to a number.
+    Unlike in VectorEvaluator the operands keep their own shapes, so an array can be
+    reduced in the middle of an expression, and an error in any element fails the whole
+    expression like it does in Evaluator.
+
+    Attributes:
+        columns: The values of the variables the program reads, as arrays or numbers.
+    """
+
+    def __init__(self, expression: Program, variables: dict):
+        """The constructor for the ArrayEvaluator class.
+
+        Args:
+            expression (Program): The equation as a compiled program.
+            variables (dict): The variable values as numbers or arrays.
+        """
+        super().__init__(expression, {})
+        self.columns = {name: self.column(variables[name]) for name in expression.names
+                        if name in variables}
+
+    def evaluate(self):
+        """Calculates the result of the program.
+
+        Raises:
+            UnknownInputError: Raised when the program uses a variable that isn't set.
+            InvalidInputError: Raised when arrays of different lengths are combined.
+
+        Returns:
+            float | list: The result rounded to three decimals, a list for an array.
+        """
+        result = self.value()
+        if np.ndim(result) == 0:
+            return round(float(result), 3)
+        return self.round(result).tolist()
+
+    def number(self, value):
+        return np.float64(value)
+
+    def variable(self, name: str):
+        if name not in self.columns:
+            raise UnknownInputError
+        return self.columns[name]
+
+    def fail(self, rows, error):
+        """Raises an error if it happened in any element.
+
+        Args:
+            rows (ndarray | bool): Where the error happened.
+            error (type): The exception class that Evaluator would raise.
+
+        Raises:
+            Exception: The error.
+        """
+        if np.any(rows):
+            raise error
+
+    @staticmethod
+    def shape(*operands) -> tuple:
+        """Returns the shape of the result of an element-wise operation.
+
+        Args:
+            operands (ndarray): The operands.
+
+        Raises:
+            InvalidInputError: Raised when the arrays have different lengths.
+
+        Returns:
+            tuple: The shape of the arrays, or () if they are all numbers.
+        """
+        shapes = {np.shape(operand) for operand in operands if np.ndim(operand)}
+        if len(shapes) > 1:
+            raise InvalidInputError("arrays of different lengths")
+        return shapes.pop() if shapes else ()
+
+    def calculate(self, operator: str, first, second):
+        self.shape(first, second)
+        return super().calculate(operator, first, second)
+
+    def function(self, name: str, *args):
+        self.shape(*args)
+        if name in aggregates:
+            return np.float64(aggregates[name](*args))
+        return super().function(name, *args)
+
+    def rows(self, implementation, args):
+        """Calls a scalar function once for each element.
+
+        Args:
+            implementation (callable): The function.
+            args (list): The inputs of the function.
+
+        Returns:
+            ndarray: The results.
+        """
+        shape = self.shape(*args)
+        args = [np.broadcast_to(arg, shape) for arg in args]
+        result = np.empty(shape)
+        for index in range(result.size):
+            result.flat[index] = float(implementation(*(float(arg.flat[index])
+                                                        for arg in args)))
+        return result
+
+
+def array_names(variables) -> frozenset:
+    """Returns the names of the variables whose values are arrays.
+
+    Args:
+        variables (dict): The variables. Only a VariableStore holds arrays.
+
+    Returns:
+        frozenset | set: The names.
+    """
+    return variables.arrays if isinstance(variables, VariableStore) else frozenset()
+
+
+def reads_arrays(program: Program, variables) -> bool:
+    """Tells whether a program reads a variable whose value is an array.
+
+    Args:
+        program (Program): The compiled program.
+        variables (dict): The variables.
+
+    Returns:
+        bool: True if the program has to be evaluated with ArrayEvaluator.
+    """
+    arrays = array_names(variables)
+    return bool(arrays) and not arrays.isdisjoint(program.names)
+
+
+def evaluate_program(program: Program, variables, metrics=None):
+    """Evaluates a program with Evaluator, or with ArrayEvaluator if it reads an array.
+
+    Args:
+        program (Program): The compiled program.
+        variables (dict): The variables.
+        metrics (Metrics | None): Passed on to Evaluator.
+
+    Returns:
+        float | list: The rounded result.
+    """
+    if reads_arrays(program, variables):
+        return ArrayEvaluator(program, variables).evaluate()
+    return Evaluator(program, variables, metrics).evaluate()
+
+
+def program_value(program: Program, variables):
+    """Evaluates a program like evaluate_program() but without rounding the result.
+
+    Args:
+        program (Program): The compiled program.
+        variables (dict): The variables.
+
+    Returns:
+        int | float | ndarray: The result.
+    """
+    if reads_arrays(program, variables):
+        return ArrayEvaluator(program, variables).value()
+    return Evaluator(program, variables).value()
@@ -0,0 +1,369 @@
+import numpy as np
+from evaluator import Evaluator
+from program import FUNCTION, OPERATOR, Program, StackMachineMixin
+from vectorized import BatchResult, VectorEvaluator
+
+
+def power_tangent(args, tangents, result):
+    """The derivative of u^w: w*u^(w-1)*du + u^w*ln(u)*dw."""
+    (u, w), (du, dw) = args, tangents
+    # a term is left out where its operand is constant, since e.g. log(u) isn't defined
+    # for a negative u with a constant exponent
+    return (np.where(du != 0, w * u ** (w - 1) * du, 0.0)
+            + np.where(dw != 0, result * np.log(u) * dw, 0.0))
+
+
+def log_tangent(args, tangents, result):
+    """The derivative of log(x, base): dx/(x*ln(base)) - log(x, base)*dbase/(base*ln(base))."""
+    (x, base), (dx, dbase) = args, tangents
+    return dx / (x * np.log(base)) - np.where(dbase != 0, result * dbase / (base * np.log(base)),
+                                              0.0)
+
+
+# the derivative of each operator and function by name: (operands, their tangents, the
+# result) -> the tangent of the result. A tangent holds the partial derivatives with
+# respect to every chosen variable along its first axis.
+derivatives = {
+    "+": lambda args, tangents, result: tangents[0] + tangents[1],
+    "-": lambda args, tangents, result: tangents[0] - tangents[1],
+    "*": lambda args, tangents, result: tangents[0] * args[1] + args[0] * tangents[1],
+    "/": lambda args, tangents, result: (tangents[0] - result * tangents[1]) / args[1],
+    "^": power_tangent,
+    "abs": lambda args, tangents, result: np.sign(args[0]) * tangents[0],
+    "atan2": lambda args, tangents, result: (args[1] * tangents[0] - args[0] * tangents[1])
+    / (args[0] ** 2 + args[1] ** 2),
+    "cos": lambda args, tangents, result: -np.sin(args[0]) * tangents[0],
+    "dot": lambda args, tangents, result: tangents[0] * args[1] + args[0] * tangents[1],
+    "exp": lambda args, tangents, result: result * tangents[0],
+    "lb": lambda args, tangents, result: tangents[0] / (args[0] * np.log(2.0)),
+    "lg": lambda args, tangents, result: tangents[0] / (args[0] * np.log(10.0)),
+    "ln": lambda args, tangents, result: tangents[0] / args[0],
+    "log": log_tangent,
+    "max": lambda args, tangents, result: np.where(args[1] > args[0], tangents[1], tangents[0]),
+    "mean": lambda args, tangents, result: tangents[0],
+    "min": lambda args, tangents, result: np.where(args[1] < args[0], tangents[1], tangents[0]),
+    "norm": lambda args, tangents, result: np.sign(args[0]) * tangents[0],
+    "sin": lambda args, tangents, result: np.cos(args[0]) * tangents[0],
+    "sqrt": lambda args, tangents, result: tangents[0] / (2 * result),
+    "sum": lambda args, tangents, result: tangents[0],
+    "tan": lambda args, tangents, result: (1 + result ** 2) * tangents[0],
+    "_square": lambda args, tangents, result: 2 * args[0] * tangents[0],
+    "_sqrt": lambda args, tangents, result: tangents[0] / (2 * result),
+    "_min": lambda args, tangents, result: tangents[0],
+    "_max": lambda args, tangents, result: tangents[0],
+    "_float": lambda args, tangents, result: tangents[0]
+}
+
+
+def tangent(name: str, args: list, tangents: list, result):
+    """Calculates the tangent of the result of one operation.
+
+    Where the derivative isn't defined, e.g. sqrt at 0, the partial derivatives are
+    infinite or NaN instead of raising errors.
+
+    Args:
+        name (str): The operator or the function.
+        args (list): The operands, as numbers or arrays of rows.
+        tangents (list): The tangents of the operands.
+        result (float | ndarray): The result of the operation.
+
+    Returns:
+        ndarray: The tangent of the result.
+    """
+    args = [np.asarray(arg, dtype=np.float64) for arg in args]
+    with np.errstate(all="ignore"):
+        return derivatives[name](args, tangents, np.asarray(result, dtype=np.float64))
+
+
+def check_differentiable(program):
+    """Checks that there is a derivative for every operation of a program.
+
+    Args:
+        program (Program): The program.
+
+    Raises:
+        ValueError: Raised when the program calls a function without a derivative,
+                    e.g. one added with register_function.
+    """
+    for opcode, value in program:
+        if opcode in (OPERATOR, FUNCTION) and value not in derivatives:
+            raise ValueError(f"function {value} has no derivative")
+
+
+class Differentiator(StackMachineMixin):
+    """Calculates the value of a program and its partial derivatives in one pass.
+
+    This is forward-mode automatic differentiation: every operand on the stack carries
+    its tangent, the partial derivatives with respect to the chosen variables, and each
+    operation calculates the tangent of its result with the chain rule. The values are
+    calculated by Evaluator, so they and the raised errors are the same as when the
+    program is evaluated, but they aren't rounded. The operands are (value, tangent) pairs.
+
+    Attributes:
+        expression: The equation as a compiled program.
+        variables: The values of the variables the program refers to.
+        wrt: The names of the variables the derivatives are taken with respect to.
+        evaluator: Calculates the values.
+        operands: An empty list for storing the operands.
+        slots: The operands of the common subexpressions, by slot number.
+        zero: The tangent of a number.
+    """
+
+    def __init__(self, expression: Program, variables: dict, wrt: list):
+        """The constructor for the Differentiator class.
+
+        Args:
+            expression (Program): The equation as a compiled program.
+            variables (dict): The variable values as numbers or numeric strings.
+            wrt (list): The names of the variables to differentiate with respect to.
+
+        Raises:
+            ValueError: Raised when the program calls a function without a derivative.
+        """
+        check_differentiable(expression)
+        self.expression = expression
+        self.variables = variables
+        self.wrt = list(wrt)
+        self.evaluator = Evaluator(Program(), variables)
+        self.operands = []
+        self.slots = {}
+        self.zero = np.zeros(len(self.wrt))
+
+    def seed(self, name: str):
+        """Returns the tangent of a variable.
+
+        Args:
+            name (str): The name of the variable.
+
+        Returns:
+            ndarray: 1 for the variable itself and 0 for the others.
+        """
+        return np.array([1.0 if name == other else 0.0 for other in self.wrt])
+
+    def run(self) -> tuple:
+        """Runs the program on a stack of (value, tangent) pairs.
+
+        Returns:
+            tuple: The value and a dict of variable name -> partial derivative.
+        """
+        value, partials = self.execute(self.expression)
+        return value, {name: float(partials[index]) for index, name in enumerate(self.wrt)}
+
+    def number(self, value) -> tuple:
+        """Returns the operand of a number in the program.
+
+        Args:
+            value (int | float): The number.
+
+        Returns:
+            tuple: The number and a zero tangent.
+        """
+        return value, self.zero
+
+    def variable(self, name: str) -> tuple:
+        """Returns the operand of a variable in the program.
+
+        Args:
+            name (str): The name of the variable.
+
+        Returns:
+            tuple: The value and the tangent of the variable.
+        """
+        return self.evaluator.variable(name), self.seed(name) if name in self.wrt else self.zero
+
+    def function(self, name: str, *args) -> tuple:
+        """Calls a function and calculates the tangent of the result.
+
+        Args:
+            name (str): The name of the function.
+            args (tuple): The operands of the arguments.
+
+        Returns:
+            tuple: The result and its tangent.
+        """
+        values = [value for value, _ in args]
+        result = self.evaluator.function(name, *values)
+        return result, tangent(name, values, [darg for _, darg in args], result)
+
+    def calculate(self, operator: str, first: tuple, second: tuple) -> tuple:
+        """Calculates an operation and the tangent of the result.
+
+        Args:
+            operator (str): The operator.
+            first (tuple): The first operand.
+            second (tuple): The second operand.
+
+        Returns:
+            tuple: The result and its tangent.
+        """
+        result = self.evaluator.calculate(operator, first[0], second[0])
+        return result, tangent(operator, [first[0], second[0]], [first[1], second[1]], result)
+
+
+class GradientResult(BatchResult):
+    """The values and the partial derivatives of a program over many rows.
+
+    Attributes:
+        values: A float array of the results, not rounded. Rows that failed are NaN.
+        errors: An object array with the exception class of each failed row, None otherwise.
+        partials: A dict of variable name -> array of the partial derivatives of each row.
+    """
+
+    def __init__(self, values, errors, partials):
+        """The constructor for the GradientResult class.
+
+        Args:
+            values (ndarray): The results.
+            errors (ndarray): The exception classes of the failed rows.
+            partials (dict): The partial derivatives by variable name.
+        """
+        super().__init__(values, errors)
+        self.partials = partials
+
+
+class VectorDifferentiator(VectorEvaluator):
+    """Calculates the values and the partial derivatives of a program for many rows.
+
+    The values are calculated by VectorEvaluator, so an error only fails its own row,
+    and the tangents of all the rows are calculated with one array operation per
+    instruction. A tangent is an array with a row of partial derivatives for each
+    chosen variable, and the operands are (values, tangent) pairs.
+
+    Attributes:
+        wrt: The names of the variables the derivatives are taken with respect to.
+        zero: The tangent of a number.
+    """
+
+    def __init__(self, expression: Program, columns: dict, wrt: list):
+        """The constructor for the VectorDifferentiator class.
+
+        Args:
+            expression (Program): The equation as a compiled program.
+            columns (dict): The variable names and their values as arrays or scalars.
+            wrt (list): The names of the variables to differentiate with respect to.
+
+        Raises:
+            ValueError: Raised when the program calls a function without a derivative.
+        """
+        check_differentiable(expression)
+        super().__init__(expression, columns)
+        self.wrt = list(wrt)
+        self.zero = np.zeros((len(self.wrt),) + self.errors.shape)
+
+    def evaluate(self) -> GradientResult:
+        """Runs each instruction of the program once over all the rows.
+
+        Raises:
+            UnknownInputError: Raised when the program uses a variable with no column.
+
+        Returns:
+            GradientResult: The values, the errors and the partial derivatives of each row.
+        """
+        values, partials = self.value()
+        values = np.array(values, dtype=np.float64)
+        partials = np.array(partials, dtype=np.float64)
+        values[self.failed] = np.nan
+        partials[:, self.failed] = np.nan
+        return GradientResult(values, self.errors,
+                              {name: partials[index] for index, name in enumerate(self.wrt)})
+
+    def number(self, value) -> tuple:
+        """Returns the operand of a number in the program.
+
+        Args:
+            value (int | float): The number.
+
+        Returns:
+            tuple: The number in every row and a zero tangent.
+        """
+        return super().number(value), self.zero
+
+    def variable(self, name: str) -> tuple:
+        """Returns the operand of a variable in the program.
+
+        Args:
+            name (str): The name of the variable.
+
+        Raises:
+            UnknownInputError: Raised when the variable has no column.
+
+        Returns:
+            tuple: The values and the tangent of the variable.
+        """
+        seed = self.zero.copy()
+        if name in self.wrt:
+            seed[self.wrt.index(name)] = 1.0
+        return super().variable(name), seed
+
+    def function(self, name: str, *args) -> tuple:
+        """Calls a function for every row and calculates the tangent of the result.
+
+        Args:
+            name (str): The name of the function.
+            args (tuple): The operands of the arguments.
+
+        Returns:
+            tuple: The results and their tangent.
+        """
+        values = [value for value, _ in args]
+        result = super().function(name, *values)
+        return result, tangent(name, values, [darg for _, darg in args], result)
+
+    def calculate(self, operator: str, first: tuple, second: tuple) -> tuple:
+        """Calculates an operation for every row and the tangent of the result.
+
+        Args:
+            operator (str): The operator.
+            first (tuple): The first operands.
+            second (tuple): The second operands.
+
+        Returns:
+            tuple: The results and their tangent.
+        """
+        result = super().calculate(operator, first[0], second[0])
+        return result, tangent(operator, [first[0], second[0]], [first[1], second[1]], result)
+
+
+def names_of(program, wrt) -> list:
+    """Returns the variables to differentiate with respect to.
+
+    Args:
+        program (Program): The program.
+        wrt (iterable | None): The names, or None for every variable of the program.
+
+    Returns:
+        list: The names.
+    """
+    return sorted(program.names) if wrt is None else list(wrt)
+
+
+def gradient(program: Program, variables: dict, wrt=None) -> tuple:
+    """Calculates the value of a program and its partial derivatives in one pass.
+
+    Example: gradient(program, {"x": 2, "y": 3}, ["x"]) -> (value, {"x": d/dx})
+
+    Args:
+        program (Program): The compiled program.
+        variables (dict): The variable values as numbers or numeric strings.
+        wrt (iterable | None): The variables to differentiate with respect to. Defaults
+                               to every variable of the program.
+
+    Returns:
+        tuple: The value, not rounded, and a dict of variable name -> partial derivative.
+    """
+    return Differentiator(program, variables, names_of(program, wrt)).run()
+
+
+def gradient_many(program: Program, columns: dict, wrt=None) -> GradientResult:
+    """Calculates the values and the partial derivatives of a program for many rows.
+
+    Args:
+        program (Program): The compiled program.
+        columns (dict): The variable names and their values as arrays or scalars.
+        wrt (iterable | None): The variables to differentiate with respect to. Defaults
+                               to every variable of the program.
+
+    Returns:
+        GradientResult: The values, the errors and the partial derivatives of each row.
+    """
+    return VectorDifferentiator(program, columns, names_of(program, wrt)).evaluate()
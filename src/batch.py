@@ -0,0 +1,109 @@
+from itertools import islice
+from calculator import Calculator, error_message, handled_errors
+
+
+def read_lines(stream):
+    """Yields the lines of a stream without the line breaks.
+
+    Args:
+        stream (TextIO): A file or stdin.
+
+    Yields:
+        str: One line at a time.
+    """
+    for line in stream:
+        yield line.rstrip("\r\n")
+
+
+def load_variables(calculator: Calculator, stream):
+    """Stores the variables of a variables file in the calculator.
+
+    Each line is of the form 'name = value', the same as the 'list' command prints.
+    Empty lines and lines starting with '#' are skipped.
+
+    Args:
+        calculator (Calculator): The calculator to store the variables in.
+        stream (TextIO): The variables file.
+
+    Raises:
+        ValueError: Raised when a line is not a valid variable definition.
+    """
+    for number, line in enumerate(read_lines(stream), start=1):
+        line = line.strip()
+        if line == "" or line.startswith("#"):
+            continue
+        name, separator, value = line.partition("=")
+        if not separator:
+            raise ValueError(f"line {number}: expected 'name = value'")
+        try:
+            calculator.assign(name.strip(), value.strip())
+        except ValueError as error:
+            raise ValueError(f"line {number}: {error}") from error
+
+
+def evaluate_lines(calculator: Calculator, lines):
+    """Evaluates expressions one at a time.
+
+    An error only affects the result of its own line. Empty lines give empty results
+    so that the output lines match the input lines.
+
+    Args:
+        calculator (Calculator): The calculator used for the evaluation.
+        lines (iterable): The expressions.
+
+    Yields:
+        str: The result or the error message of each expression.
+    """
+    for expression in lines:
+        if expression.strip() == "":
+            yield ""
+            continue
+        try:
+            yield str(calculator.calculate(expression))
+        except handled_errors as error:
+            yield error_message(error)
+
+
+def evaluate_batch(calculator: Calculator, expressions: list) -> list:
+    """Evaluates a list of expressions, computing the subexpressions they share only once.
+
+    Gives the same results as evaluate_lines.
+
+    Args:
+        calculator (Calculator): The calculator used for the evaluation.
+        expressions (list): The expressions.
+
+    Returns:
+        list: The result or the error message of each expression.
+    """
+    positions = [position for position, expression in enumerate(expressions)
+                 if expression.strip() != ""]
+    results = [""] * len(expressions)
+    calculated = calculator.calculate_many([expressions[position] for position in positions])
+    for position, result in zip(positions, calculated):
+        if isinstance(result, Exception):
+            results[position] = error_message(result)
+        else:
+            results[position] = str(result)
+    return results
+
+
+def run_batch(calculator: Calculator, stream, output, chunk_size: int = 1000):
+    """Streams expressions from a file through the calculator and writes one result per line.
+
+    Only one chunk of lines is held in memory at a time, so the input can be of any size.
+    The expressions of a chunk are evaluated together with evaluate_batch.
+
+    Args:
+        calculator (Calculator): The calculator used for the evaluation.
+        stream (TextIO): The input with one expression per line.
+        output (TextIO): Where the results are written.
+        chunk_size (int): The number of lines per chunk. Defaults to 1000.
+    """
+    lines = read_lines(stream)
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            break
+        output.writelines(result + "\n" for result in evaluate_batch(calculator, chunk))
+    output.flush()
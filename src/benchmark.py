@@ -0,0 +1,431 @@
+import json
+import os
+import random
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from string import ascii_lowercase
+from time import perf_counter_ns
+import numpy as np
+from calculator import Calculator
+from calculator_io import BufferedIO
+from evaluator import Evaluator
+from parallel import ParallelEvaluator
+from registry import functions, public_functions
+from shunting_yard import ShuntingYard
+
+scenarios = {
+    "small": {"terms": 4, "depth": 1, "operators": "+-*/", "function_density": 0.0,
+              "variables": 0},
+    "medium": {"terms": 16, "depth": 2, "operators": "+-*/^", "function_density": 0.2,
+               "variables": 4},
+    "large": {"terms": 256, "depth": 4, "operators": "+-*/", "function_density": 0.2,
+              "variables": 16},
+    "deep": {"terms": 48, "depth": 24, "operators": "+*", "function_density": 0.1,
+             "variables": 2},
+    "functions": {"terms": 16, "depth": 2, "operators": "+-", "function_density": 0.8,
+                  "variables": 4},
+    "variables": {"terms": 32, "depth": 1, "operators": "+-*", "function_density": 0.0,
+                  "variables": 64},
+    # runs the phases of a process pool instead, see parallel_phases
+    "parallel": {"terms": 5, "depth": 1, "operators": "+-*/", "function_density": 0.8,
+                 "variables": 2, "parallel": True}
+}
+
+# how many rows bench_columns evaluates for each expression of the scenario
+ROWS_PER_EXPRESSION = 1000
+
+# functions that give a result for any positive input, so generated expressions evaluate
+safe_functions = [name for name in public_functions(1) if name not in ("exp", "tan")]
+
+
+def variable_names(count: int) -> list:
+    """Returns distinct lowercase names that aren't function names."""
+    names = []
+    length = 1
+    while len(names) < count:
+        for index in range(26 ** length):
+            name = ""
+            for _ in range(length):
+                index, letter = divmod(index, 26)
+                name += ascii_lowercase[letter]
+            if name not in functions:
+                names.append(name)
+            if len(names) == count:
+                break
+        length += 1
+    return names
+
+
+def generate_operand(rng: random.Random, depth: int, settings: dict, names: list) -> str:
+    """Generates a number, a variable or a nested term, possibly wrapped in a function.
+
+    Args:
+        rng (Random): The random generator.
+        depth (int): How many levels of nested terms the operand has.
+        settings (dict): The settings of the scenario.
+        names (list): The variable names that can be used.
+
+    Returns:
+        str: The operand.
+    """
+    # only the first operand of a term is nested, so the size grows linearly with the depth
+    if depth > 1:
+        operand = f"({generate_term(rng, depth - 1, settings, names)})"
+    elif names and rng.random() < 0.5:
+        operand = rng.choice(names)
+    else:
+        operand = f"{rng.randint(1, 99)}.{rng.randint(0, 99)}"
+    if rng.random() < settings["function_density"]:
+        operand = f"{rng.choice(safe_functions)}(abs({operand})+1)"
+    return operand
+
+
+def generate_term(rng: random.Random, depth: int, settings: dict, names: list) -> str:
+    """Generates operands joined with random operators.
+
+    Args:
+        rng (Random): The random generator.
+        depth (int): How many levels of nested terms the first operand has.
+        settings (dict): The settings of the scenario.
+        names (list): The variable names that can be used.
+
+    Returns:
+        str: The term.
+    """
+    terms = max(2, settings["terms"] // settings["depth"])
+    expression = generate_operand(rng, depth, settings, names)
+    for _ in range(terms - 1):
+        operator = rng.choice(settings["operators"])
+        operand = generate_operand(rng, 1, settings, names)
+        if operator == "^":
+            operand = str(rng.randint(1, 3))
+        expression += operator + operand
+    return expression
+
+
+def generate_expressions(settings: dict, count: int, seed: int = 0):
+    """Generates random expressions and the variables they use.
+
+    Args:
+        settings (dict): The size, nesting depth, operators, function density and the
+                         number of variables of the expressions.
+        count (int): The number of expressions.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        tuple: The expressions and the variables as a dict.
+    """
+    rng = random.Random(seed)
+    names = variable_names(settings["variables"])
+    variables = {name: f"{rng.randint(1, 9)}.{rng.randint(0, 9)}" for name in names}
+    expressions = [generate_term(rng, settings["depth"], settings, names) for _ in range(count)]
+    return expressions, variables
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Returns the value below which the given fraction of the sorted values are.
+
+    Args:
+        values (list): The values in ascending order.
+        fraction (float): The fraction, e.g. 0.99.
+
+    Returns:
+        float: The percentile.
+    """
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def summarize(latencies: list) -> dict:
+    """Returns the throughput and the latency percentiles of timed calls.
+
+    Args:
+        latencies (list): The duration of each call in nanoseconds.
+
+    Returns:
+        dict: Operations per second and latency percentiles in microseconds.
+    """
+    latencies = sorted(latencies)
+    total = sum(latencies) or 1
+    return {
+        "ops_per_sec": len(latencies) / (total / 1e9),
+        "p50_us": percentile(latencies, 0.5) / 1000,
+        "p90_us": percentile(latencies, 0.9) / 1000,
+        "p95_us": percentile(latencies, 0.95) / 1000,
+        "p99_us": percentile(latencies, 0.99) / 1000
+    }
+
+
+def throughput(operations: int, function) -> dict:
+    """Times one call that does many operations.
+
+    Args:
+        operations (int): The number of operations the call does.
+        function (callable): The call.
+
+    Returns:
+        dict: Operations per second.
+    """
+    start = perf_counter_ns()
+    function()
+    return {"ops_per_sec": operations / ((perf_counter_ns() - start or 1) / 1e9)}
+
+
+def peak_memory(function) -> int:
+    """Returns the peak memory allocated by a call, in bytes."""
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_parse(expressions: list, variables: dict) -> dict:
+    """Times parsing each expression.
+
+    Args:
+        expressions (list): The expressions.
+        variables (dict): The variables they use.
+
+    Returns:
+        dict: The measurements.
+    """
+    latencies = []
+    for expression in expressions:
+        start = perf_counter_ns()
+        ShuntingYard(expression, variables).parse()
+        latencies.append(perf_counter_ns() - start)
+    result = summarize(latencies)
+    result["peak_bytes"] = peak_memory(lambda: ShuntingYard(expressions[0], variables).parse())
+    return result
+
+
+def bench_evaluate(expressions: list, variables: dict) -> dict:
+    """Times evaluating each expression that has been parsed before.
+
+    Args:
+        expressions (list): The expressions.
+        variables (dict): The variables they use.
+
+    Returns:
+        dict: The measurements.
+    """
+    programs = [ShuntingYard(expression, variables).parse() for expression in expressions]
+    latencies = []
+    for program in programs:
+        start = perf_counter_ns()
+        try:
+            Evaluator(program, variables).evaluate()
+        except (ArithmeticError, ValueError, TypeError):
+            pass
+        latencies.append(perf_counter_ns() - start)
+    result = summarize(latencies)
+    result["peak_bytes"] = peak_memory(lambda: Evaluator(programs[0], variables).evaluate())
+    return result
+
+
+class TimedIO(BufferedIO):
+    """A BufferedIO that records when each input is read.
+
+    Attributes:
+        reads: The perf_counter_ns() of each read.
+    """
+
+    def __init__(self, inputs=None):
+        super().__init__(inputs)
+        self.reads = []
+
+    def read(self, text="Input"):
+        self.reads.append(perf_counter_ns())
+        return super().read(text)
+
+
+def run_calculator(expressions: list, variables: dict) -> list:
+    """Types the expressions into a calculator like a user would.
+
+    The variables are loaded into the calculator's VariableStore, so the results are
+    cached like in an interactive session.
+
+    Args:
+        expressions (list): The expressions.
+        variables (dict): The variables they use.
+
+    Returns:
+        list: The time from reading each expression to reading the next input, in
+              nanoseconds.
+    """
+    io = TimedIO(expressions + [""])
+    calculator = Calculator(io)
+    calculator.variables.load(variables)
+    with open(os.devnull, "w", encoding="utf-8") as devnull, redirect_stdout(devnull):
+        calculator.start()
+    return [end - start for start, end in zip(io.reads, io.reads[1:])]
+
+
+def bench_calculator(expressions: list, variables: dict) -> dict:
+    """Times the whole calculator loop for each expression: reading, calculating and output.
+
+    Args:
+        expressions (list): The expressions.
+        variables (dict): The variables they use.
+
+    Returns:
+        dict: The measurements.
+    """
+    result = summarize(run_calculator(expressions, variables))
+    result["peak_bytes"] = peak_memory(lambda: run_calculator(expressions[:10], variables))
+    return result
+
+
+def bench_batch(expressions: list, variables: dict) -> dict:
+    """Times evaluating the expressions in a worker process for each CPU.
+
+    The time includes starting the workers, like for a batch with --workers.
+
+    Args:
+        expressions (list): The expressions.
+        variables (dict): The variables they use.
+
+    Returns:
+        dict: The measurements.
+    """
+    evaluator = ParallelEvaluator(variables=variables)
+    result = throughput(len(expressions), lambda: list(evaluator.evaluate(expressions)))
+    result["peak_bytes"] = peak_memory(lambda: list(evaluator.evaluate(expressions[:10])))
+    return result
+
+
+def bench_columns(expressions: list, variables: dict) -> dict:
+    """Times evaluating the first expression over many rows in a worker process for each CPU.
+
+    Each worker gets about four ranges of rows. The operations are rows.
+
+    Args:
+        expressions (list): The expressions.
+        variables (dict): The variables they use, which get a random value in each row.
+
+    Returns:
+        dict: The measurements.
+    """
+    program = ShuntingYard(expressions[0], variables).parse()
+    rows = len(expressions) * ROWS_PER_EXPRESSION
+    rng = np.random.default_rng(0)
+    columns = {name: rng.uniform(1, 10, rows) for name in variables}
+    evaluator = ParallelEvaluator()
+    evaluator.chunk_size = max(rows // (evaluator.workers * 4), 1)
+    result = throughput(rows, lambda: evaluator.evaluate_columns(program, columns))
+    result["peak_bytes"] = peak_memory(lambda: evaluator.evaluate_columns(program, columns))
+    return result
+
+
+phases = {
+    "parse": bench_parse,
+    "evaluate": bench_evaluate,
+    "calculator": bench_calculator
+}
+
+# the phases of the scenarios that have "parallel" set
+parallel_phases = {
+    "batch": bench_batch,
+    "columns": bench_columns
+}
+
+
+def run(count: int = 1000, selected=None) -> dict:
+    """Runs the benchmarks.
+
+    Args:
+        count (int): The number of expressions per scenario.
+        selected (list | None): The names of the scenarios to run. Defaults to all.
+
+    Returns:
+        dict: scenario -> phase -> measurements.
+    """
+    results = {}
+    for name, settings in scenarios.items():
+        if selected and name not in selected:
+            continue
+        expressions, variables = generate_expressions(settings, count)
+        selected_phases = parallel_phases if settings.get("parallel") else phases
+        results[name] = {phase: bench(expressions, variables)
+                         for phase, bench in selected_phases.items()}
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Finds the measurements whose throughput dropped more than the threshold.
+
+    Args:
+        results (dict): The new measurements.
+        baseline (dict): The stored measurements.
+        threshold (float): The allowed relative drop, e.g. 0.1 for 10 %.
+
+    Returns:
+        list: (scenario, phase, baseline ops/s, new ops/s) for each regression.
+    """
+    regressions = []
+    for scenario, measured in results.items():
+        for phase, values in measured.items():
+            old = baseline.get(scenario, {}).get(phase)
+            if old and values["ops_per_sec"] < old["ops_per_sec"] * (1 - threshold):
+                regressions.append((scenario, phase, old["ops_per_sec"], values["ops_per_sec"]))
+    return regressions
+
+
+def report(results: dict):
+    """Prints the measurements as a table.
+
+    Args:
+        results (dict): The results of run().
+    """
+    print(f"{'scenario':<10} {'phase':<11} {'ops/s':>12} {'p50 us':>9} {'p95 us':>9} "
+          f"{'p99 us':>9} {'peak KiB':>9}")
+    for scenario, measured in results.items():
+        for phase, values in measured.items():
+            print(f"{scenario:<10} {phase:<11} {values['ops_per_sec']:>12.0f} "
+                  f"{values.get('p50_us', 0):>9.1f} {values.get('p95_us', 0):>9.1f} "
+                  f"{values.get('p99_us', 0):>9.1f} {values['peak_bytes'] / 1024:>9.1f}")
+
+
+def main(arguments=None):
+    """Runs the benchmarks from the command line.
+
+    Args:
+        arguments (list | None): The command line arguments. Defaults to sys.argv.
+
+    Returns:
+        int: The exit status, 1 if --compare found a regression.
+    """
+    parser = ArgumentParser(description="Benchmarks for the parser, evaluator, calculator "
+                                        "and worker processes")
+    parser.add_argument("--count", type=int, default=1000,
+                        help="expressions per scenario")
+    parser.add_argument("--scenario", action="append", choices=list(scenarios),
+                        help="run only the given scenario, can be repeated")
+    parser.add_argument("--output", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--compare", metavar="FILE",
+                        help="fail if the throughput is worse than in this baseline JSON")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="allowed relative throughput drop for --compare")
+    arguments = parser.parse_args(arguments)
+
+    results = run(arguments.count, arguments.scenario)
+    report(results)
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    if arguments.compare:
+        with open(arguments.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, arguments.threshold)
+        for scenario, phase, old, new in regressions:
+            print(f"REGRESSION {scenario}/{phase}: {old:.0f} -> {new:.0f} ops/s")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+from collections import Counter, OrderedDict
+from threading import Lock
+from graph import share_subexpressions
+from optimizer import Optimizer
+from registry import builtin_functions, functions, generation
+from shunting_yard import ShuntingYard, UnknownInputError
+
+
+class ExpressionCache:
+    """A size-bounded cache of compiled expressions with LRU eviction.
+
+    The compiled programs refer to variables by name, so changing the value of a variable
+    doesn't make an entry stale. An entry only depends on the names it uses being defined,
+    which is checked on every hit, and entries are dropped when one of their names is
+    deleted. Calls of functions on numbers are folded into constants, so the keys include
+    the generation of the registry, and the entries compiled before a function was
+    registered or unregistered are never found again and get evicted. Expressions that
+    call registered functions aren't kept in the store, since another process may have
+    registered something else with the same name. The cache can be shared between threads.
+
+    Attributes:
+        capacity: The maximum number of compiled expressions kept in the cache.
+        entries: An ordered dict of key -> CompactProgram, oldest first.
+        dependents: A dict of variable name -> set of cached expressions that use it.
+        counters: A Counter of the lookups that found a compiled expression ("hits"), the
+                  lookups that had to parse it ("misses"), the entries dropped because the
+                  cache was full ("evictions") and the instructions the optimizer has
+                  removed in total ("eliminated").
+        optimize: Whether parsed programs are simplified with Optimizer and have their
+                  repeated subexpressions shared before caching.
+        store: A DiskCache that is tried before parsing and written after it, or None.
+        seen: An ordered dict of the keys of the expressions that were evaluated once
+              without compiling them, oldest first. Its size is bounded by the capacity.
+    """
+
+    def __init__(self, capacity: int = 128, optimize: bool = True, store=None):
+        """The constructor for the ExpressionCache class.
+
+        Args:
+            capacity (int): The maximum number of entries. 0 disables caching.
+            optimize (bool): Whether to optimize the parsed programs. Defaults to True.
+            store (DiskCache | None): A persistent cache shared with other processes.
+        """
+        self.capacity = capacity
+        self.optimize = optimize
+        self.store = store
+        self.entries = OrderedDict()
+        self.seen = OrderedDict()
+        self.dependents = {}
+        self.counters = Counter(hits=0, misses=0, evictions=0, eliminated=0)
+        self.lock = Lock()
+
+    @property
+    def hits(self) -> int:
+        """int: The number of lookups that found a compiled expression."""
+        return self.counters["hits"]
+
+    @property
+    def misses(self) -> int:
+        """int: The number of lookups that had to parse the expression."""
+        return self.counters["misses"]
+
+    @property
+    def evictions(self) -> int:
+        """int: The number of entries dropped because the cache was full."""
+        return self.counters["evictions"]
+
+    @property
+    def eliminated(self) -> int:
+        """int: The number of instructions the optimizer has removed in total."""
+        return self.counters["eliminated"]
+
+    @staticmethod
+    def normalize(expression: str) -> str:
+        """Returns the cache key of an expression.
+
+        Args:
+            expression (str): The expression in infix notation.
+
+        Returns:
+            str: The expression without spaces.
+        """
+        return expression.replace(" ", "")
+
+    @classmethod
+    def key(cls, expression: str) -> tuple:
+        """Returns the key of an expression in the entries.
+
+        Args:
+            expression (str): The expression in infix notation.
+
+        Returns:
+            tuple: The generation of the registry and the normalized expression.
+        """
+        return generation(), cls.normalize(expression)
+
+    @staticmethod
+    def persistent(expression: str) -> bool:
+        """Tells whether the program of an expression can be kept in the store.
+
+        Args:
+            expression (str): The normalized expression.
+
+        Returns:
+            bool: False if the expression may call a registered function.
+        """
+        registered = functions.keys() - builtin_functions
+        return not any(name in expression for name in registered)
+
+    def compile(self, expression: str, variables, metrics=None):
+        """Returns the compiled program of an expression, parsing it only on a miss.
+
+        Args:
+            expression (str): The expression in infix notation.
+            variables (dict): The variables currently stored.
+            metrics (Metrics | None): Passed on to the parser on a miss.
+
+        Raises:
+            UnknownInputError: Raised when a cached expression uses a name that isn't set.
+
+        Returns:
+            CompactProgram: The compiled program.
+        """
+        key = self.key(expression)
+        with self.lock:
+            program = self.entries.get(key)
+            if program is not None:
+                self.entries.move_to_end(key)
+                self.counters["hits"] += 1
+            else:
+                self.counters["misses"] += 1
+        if program is not None:
+            self.check_names(program, variables)
+            return program
+        eliminated = 0
+        text = key[1]
+        store = self.store if self.store is not None and self.persistent(text) else None
+        program = store.load(text) if store is not None else None
+        if program is not None:
+            self.check_names(program, variables)
+        else:
+            program = ShuntingYard(text, variables, metrics).parse()
+            if self.optimize:
+                optimizer = Optimizer(program)
+                program = share_subexpressions(optimizer.optimize())
+                eliminated = optimizer.eliminated
+            program = program.compact()
+            if store is not None:
+                store.save(text, program)
+        with self.lock:
+            self.counters["eliminated"] += eliminated
+            self.add(key, program)
+        return program
+
+    @staticmethod
+    def check_names(program, variables):
+        """Checks that the names a compiled program uses are set.
+
+        Args:
+            program (CompactProgram): The compiled program.
+            variables (dict): The variables currently stored.
+
+        Raises:
+            UnknownInputError: Raised when a name isn't set.
+        """
+        for name in program.names:
+            if name not in variables:
+                raise UnknownInputError
+
+    def add(self, key: tuple, program):
+        """Stores a compiled program, evicting the least recently used entry if needed.
+
+        Args:
+            key (tuple): The key of the expression.
+            program (Program): The compiled program.
+        """
+        if self.capacity <= 0:
+            return
+        self.entries[key] = program
+        for name in program.names:
+            self.dependents.setdefault(name, set()).add(key)
+        while len(self.entries) > self.capacity:
+            oldest, evicted = self.entries.popitem(last=False)
+            self.forget(oldest, evicted)
+            self.counters["evictions"] += 1
+
+    def forget(self, key: tuple, program):
+        """Removes an entry from the dependency index.
+
+        Args:
+            key (tuple): The key of the expression.
+            program (Program): The compiled program of the expression.
+        """
+        for name in program.names:
+            keys = self.dependents.get(name)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.dependents[name]
+
+    def invalidate(self, name: str):
+        """Drops every cached expression that uses the given variable.
+
+        Args:
+            name (str): The name of the variable.
+        """
+        with self.lock:
+            for key in self.dependents.pop(name, ()):
+                program = self.entries.pop(key, None)
+                if program is not None:
+                    self.forget(key, program)
+
+    def first_sight(self, expression: str) -> bool:
+        """Tells whether an expression is new, i.e. neither cached nor seen before.
+
+        A new expression is remembered, so that the next time it is compiled and cached.
+        This keeps expressions that are only used once out of the cache.
+
+        Args:
+            expression (str): The expression in infix notation.
+
+        Returns:
+            bool: True the first time an expression is seen, and always when caching is
+                  disabled.
+        """
+        key = self.key(expression)
+        with self.lock:
+            if key in self.entries:
+                return False
+            if self.capacity <= 0:
+                return True
+            if self.seen.pop(key, None) is not None:
+                return False
+            self.seen[key] = True
+            if len(self.seen) > self.capacity:
+                self.seen.popitem(last=False)
+            return True
+
+    def clear(self):
+        """Empties the cache. The counters are kept."""
+        with self.lock:
+            self.entries.clear()
+            self.seen.clear()
+            self.dependents.clear()
+
+    def stats(self) -> dict:
+        """Returns the size and the counters of the cache.
+
+        Returns:
+            dict: The number of entries, capacity, hits, misses, evictions, the
+                  instructions removed by the optimizer and the counters of the store.
+        """
+        stats = {
+            "size": len(self.entries),
+            "capacity": self.capacity,
+            **self.counters
+        }
+        if self.store is not None:
+            stats["disk"] = self.store.stats()
+        return stats
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, expression: str):
+        return self.key(expression) in self.entries
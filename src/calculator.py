@@ -1,10 +1,55 @@
-from string import ascii_lowercase
+from time import perf_counter
+from analysis import expand_operations, operations, run_operation, split_operation
+from arrays import array_names, evaluate_program, reads_arrays
 from calculator_io import calculator_io as default_io
+from cache import ExpressionCache
+from disk_cache import DiskCache
+from errors import BudgetExceededError
 from shunting_yard import (InvalidInputError,
                            MismatchedParenthesesError,
                            ShuntingYard,
                            UnknownInputError)
-from evaluator import Evaluator
+from formulas import FormulaGraph
+from fused import evaluate_fused
+from graph import evaluate_shared
+from registry import functions
+from result_cache import ResultCache
+from variable_store import VariableStore, name_pattern, to_plain, to_text
+
+error_messages = {
+    InvalidInputError: "ERROR: invalid input",
+    UnknownInputError: "ERROR: unknown input",
+    IndexError: "ERROR: mismatched parentheses",
+    MismatchedParenthesesError: "ERROR: mismatched parentheses",
+    ZeroDivisionError: "ERROR: division by zero",
+    # math domain errors, overflows and complex results such as (-8)^0.5
+    ValueError: "ERROR: math error",
+    OverflowError: "ERROR: math error",
+    TypeError: "ERROR: math error",
+    BudgetExceededError: "ERROR: evaluation budget exceeded"
+}
+
+# the variable that holds the result of the previous expression typed in
+ANSWER = "ans"
+
+# the errors that error_message() has a message for
+handled_errors = (InvalidInputError, UnknownInputError, IndexError, MismatchedParenthesesError,
+                  ZeroDivisionError, ValueError, OverflowError, TypeError, BudgetExceededError)
+
+
+def error_message(error: Exception) -> str:
+    """Returns the message that is shown to the user for an error.
+
+    Args:
+        error (Exception): An error raised while parsing or evaluating an expression.
+
+    Returns:
+        str: The error message.
+    """
+    for error_type in type(error).__mro__:
+        if error_type in error_messages:
+            return error_messages[error_type]
+    raise error
 
 
 class Calculator:
@@ -17,18 +62,40 @@ class Calculator:
 
     Attributes:
         io: Class instance for inputs and outputs. The default value is of the CalculatorI0 class.
+        cache: The compiled expressions, so that repeated expressions aren't parsed again.
+        results: The results of expressions, so that repeated expressions aren't evaluated
+                 again while the variables they read are unchanged.
+        formulas: The variables that are defined as formulas of other variables.
+        metrics: Where timings, instruction counts and errors are recorded, or None.
+        store: The persistent cache directory, or None.
     """
 
-    def __init__(self, io=default_io):
+    def __init__(self, io=default_io, cache_size: int = 128, cache: ExpressionCache = None,
+                 metrics=None, cache_dir: str = None, *, result_cache_size: int = 256):
         """The constructor for this class. It creates an instance of the IO-class.
 
         Args:
             io: Used for inputs and outputs. Defaults to CalculatorIO.
-            rpn: Stores the RPN version of the expression. (Only for testing purposes.)
+            cache_size (int): How many compiled expressions are cached. Defaults to 128.
+            cache (ExpressionCache | None): A cache shared with other calculators. If not
+                                            given, the calculator gets its own cache.
+            metrics (Metrics | None): Turns on the instrumentation. Defaults to None.
+            cache_dir (str | None): A directory where compiled expressions and the variables
+                                    are kept between runs. Defaults to None.
+            result_cache_size (int): How many results are cached. 0 turns the result
+                                     cache off. Defaults to 256.
+            rpn: Stores the compiled RPN program of the expression. (Only for testing purposes.)
         """
         self.io = io
-        self.rpn = ""
-        self.variables = {}
+        self.rpn = None
+        self.variables = VariableStore()
+        self.store = DiskCache(cache_dir) if cache_dir is not None else None
+        self.cache = cache if cache is not None else ExpressionCache(cache_size, store=self.store)
+        self.results = ResultCache(result_cache_size)
+        self.formulas = FormulaGraph()
+        self.metrics = metrics
+        if self.store is not None:
+            self.restore(self.store.load_state())
 
     def start(self):
         """Starts the calculator and is in charge of running it.
@@ -37,10 +104,11 @@ class Calculator:
         interpreting the user input and giving it to the algorithm for parsing.
         """
         while True:
-            expression = self.io.read(
+            expression = self.read(
                 "Input an expression, empty to exit, help for instructions, var for variables")
             print()
             if expression == "":
+                self.save_state()
                 self.io.write("Quitting calculator")
                 break
             if expression == "help":
@@ -49,20 +117,166 @@ class Calculator:
                 self.variable_menu()
             else:
                 try:
-                    self.rpn = ShuntingYard(expression, self.variables).parse()
-                    # self.io.write(self.rpn)
-                    result = Evaluator(self.rpn).evaluate()
-                    self.io.write(result)
-                except InvalidInputError:
-                    self.io.write("ERROR: invalid input")
-                except UnknownInputError:
-                    self.io.write("ERROR: unknown input")
-                except IndexError:
-                    self.io.write("ERROR: mismatched parentheses")
-                except MismatchedParenthesesError:
-                    self.io.write("ERROR: mismatched parentheses")
-                except ZeroDivisionError:
-                    self.io.write("ERROR: division by zero")
+                    result = self.calculate_input(expression)
+                    self.variables[ANSWER] = result
+                    self.write(result)
+                except handled_errors as error:
+                    self.write(error_message(error))
+
+    def read(self, text: str) -> str:
+        """Reads an input with the IO, timing it if the instrumentation is on.
+
+        Args:
+            text (str): The prompt.
+
+        Returns:
+            str: The input.
+        """
+        if self.metrics is None:
+            return self.io.read(text)
+        start = perf_counter()
+        input_str = self.io.read(text)
+        self.metrics.time("io", perf_counter() - start)
+        return input_str
+
+    def write(self, output):
+        """Writes an output with the IO, timing it if the instrumentation is on.
+
+        Args:
+            output: The output.
+        """
+        if self.metrics is None:
+            self.io.write(output)
+            return
+        start = perf_counter()
+        self.io.write(output)
+        self.metrics.time("io", perf_counter() - start)
+
+    def calculate(self, expression: str, typed: bool = False) -> float:
+        """Calculates the result of an expression using the stored variables.
+
+        The result is taken from the result cache if the expression has been calculated
+        before and the variables it reads haven't changed since. Otherwise the compiled
+        expression is taken from the cache if it has been seen before. An expression that
+        is one solve, integrate or sum call is calculated by analysis, and calls inside a
+        longer expression are replaced with their results before it is compiled.
+
+        Results aren't cached when the instrumentation is on, so that every expression is
+        measured, or when the variables have been replaced with a plain dict, which has no
+        versions.
+
+        Args:
+            expression (str): The expression in infix notation.
+            typed (bool): Whether the expression was typed in, see calculate_input().
+
+        Returns:
+            float: The result of the expression.
+        """
+        remember = self.metrics is None and isinstance(self.variables, VariableStore)
+        if remember:
+            result = self.results.get(expression, self.variables)
+            if result is not None:
+                return result
+        operation = split_operation(expression)
+        source = expression if operation is not None else expand_operations(expression,
+                                                                            self.variables)
+        if operation is not None:
+            result = self.analyze(*operation)
+        elif self.metrics is not None:
+            start = perf_counter()
+            try:
+                self.rpn = self.cache.compile(source, self.variables, self.metrics)
+                return evaluate_program(self.rpn, self.variables, self.metrics)
+            except handled_errors as error:
+                self.metrics.error(error)
+                raise
+            finally:
+                self.metrics.time("calculate", perf_counter() - start)
+        elif (typed and self.cache.store is None and not array_names(self.variables)
+              and self.cache.first_sight(source)):
+            self.rpn = None
+            result = evaluate_fused(source, self.variables)
+        else:
+            self.rpn = self.cache.compile(source, self.variables)
+            result = evaluate_program(self.rpn, self.variables)
+        if remember:
+            self.results.add(expression, result, self.variables)
+        return result
+
+    def calculate_input(self, expression: str) -> float:
+        """Calculates an expression that was typed in.
+
+        An expression that isn't cached and hasn't been typed before is parsed and
+        evaluated in one pass, without compiling it. If it is typed again, it is compiled
+        and cached like in calculate(). With the instrumentation, a cache directory or
+        array variables every expression is compiled. A result is reused like in calculate().
+
+        Args:
+            expression (str): The expression in infix notation.
+
+        Returns:
+            float: The result of the expression.
+        """
+        return self.calculate(expression, typed=True)
+
+    def analyze(self, name: str, arguments: list) -> float:
+        """Calculates a solve, integrate or sum call with the stored variables.
+
+        Args:
+            name (str): The operation.
+            arguments (list): The arguments of the call as strings.
+
+        Returns:
+            float: The result, rounded to three decimals.
+        """
+        self.rpn = None
+        return round(run_operation(name, arguments, self.variables), 3)
+
+    def calculate_many(self, expressions: list) -> list:
+        """Calculates many expressions, computing the subexpressions they share only once.
+
+        Args:
+            expressions (list): The expressions in infix notation.
+
+        Returns:
+            list: The result of each expression, or the exception it raised.
+        """
+        results = [None] * len(expressions)
+        programs = []
+        positions = []
+        for position, expression in enumerate(expressions):
+            try:
+                operation = split_operation(expression)
+                if operation is not None:
+                    results[position] = self.analyze(*operation)
+                    continue
+                program = self.cache.compile(expand_operations(expression, self.variables),
+                                             self.variables, self.metrics)
+                if reads_arrays(program, self.variables):
+                    results[position] = evaluate_program(program, self.variables)
+                    continue
+                programs.append(program)
+                positions.append(position)
+            except handled_errors as error:
+                results[position] = error
+        for position, result in zip(positions, evaluate_shared(programs, self.variables)):
+            results[position] = result
+        if self.metrics is not None:
+            for result in results:
+                if isinstance(result, Exception):
+                    self.metrics.error(result)
+        return results
+
+    def stats(self) -> dict:
+        """Returns the cache counters and, if the instrumentation is on, the measurements.
+
+        Returns:
+            dict: The statistics.
+        """
+        stats = {"cache": self.cache.stats(), "results": self.results.stats()}
+        if self.metrics is not None:
+            stats.update(self.metrics.stats())
+        return stats
 
     def instructions(self):
         """Uses the IO to print out instructions for the calculator.
@@ -79,11 +293,11 @@ class Calculator:
                 "Input 'set', 'list', 'del' or empty to exit")
 
             if input_str == "":
+                self.save_state()
                 break
 
             if input_str == "list":
-                for key, value in self.variables.items():
-                    self.io.write(f"{key} = {value}")
+                self.list_variables()
 
             elif input_str == "set":
                 self.set_variable()
@@ -95,8 +309,53 @@ class Calculator:
             else:
                 continue
 
+    def snapshot(self) -> dict:
+        """Returns the variables and the formulas in a form that can be saved as JSON.
+
+        Returns:
+            dict: The variables that are numbers, and the formulas in an order where each
+                  formula comes after the formulas it uses. The previous result isn't kept.
+        """
+        return {
+            "variables": {name: to_plain(value) for name, value in self.variables.items()
+                          if name not in self.formulas and name != ANSWER},
+            "formulas": [[name, self.formulas.expressions[name]]
+                         for name in self.formulas.order(set(self.formulas.expressions))]
+        }
+
+    def restore(self, state):
+        """Sets the variables and the formulas of a snapshot. Invalid ones are skipped.
+
+        Args:
+            state (dict | None): A snapshot made with snapshot(), or None.
+        """
+        try:
+            definitions = list(dict(state["variables"]).items())
+            definitions += list(state["formulas"])
+        except (KeyError, TypeError, ValueError):
+            return
+        for definition in definitions:
+            try:
+                name, value = definition
+                self.assign(name, value)
+            except (ValueError, TypeError):
+                continue
+
+    def save_state(self):
+        """Saves the variables to the persistent cache directory, if there is one."""
+        if self.store is None:
+            return
+        try:
+            self.store.save_state(self.snapshot())
+        except OSError as error:
+            self.io.write(f"Could not save the variables: {error}")
+
     def check_var_name(self, name: str) -> bool:
-        """Checks that the name consists of lowercase letters.
+        """Checks that the name consists of lowercase letters and isn't a function name.
+
+        The name can be in namespaces separated by dots, e.g. "tbl.x". An empty name is
+        accepted, since it cancels setting a variable. "ans" is reserved for the previous
+        result.
 
         Args:
             name (str): The name of the variable.
@@ -104,21 +363,22 @@ class Calculator:
         Returns:
             bool: False if name is invalid, otherwise True.
         """
-        for letter in name:
-            if letter not in ascii_lowercase:
-                return False
-        return True
+        if name in functions or name in operations or name == ANSWER:
+            return False
+        return name == "" or name_pattern.fullmatch(name) is not None
 
     def check_var_value(self, value: str) -> bool:
-        """Checks that the value consists of numbers
+        """Checks that the value is a number, or numbers in brackets separated by commas
 
         Args:
-            value (str): The value of the variable as a string
-                        everything is handled as strings until final calculations.
+            value (str): The value of the variable as a string, e.g. "-1.5" or "[1, 2, 3]".
 
         Returns:
             bool: False if value is invalid, otherwise True.
         """
+        if value.startswith("[") and value.endswith("]"):
+            items = [item.strip() for item in value[1:-1].split(",")]
+            return all(item != "" and self.check_var_value(item) for item in items)
         for index, token in enumerate(value):
             if token == "." and index in (0, len(value)-1):
                 return False
@@ -139,11 +399,73 @@ class Calculator:
                 break
         while True:
             value = self.io.read("Input variable value")
-            if self.check_var_value(value):
+            if name == "" or value == "":
+                return
+            try:
+                self.assign(name, value)
                 break
-        if name == "" or value == "":
-            return
-        self.variables[name] = value
+            except ValueError as error:
+                self.io.write(str(error))
+        if name in self.formulas.errors:
+            self.io.write(f"{name}: {error_message(self.formulas.errors[name])}")
+
+    def assign(self, name: str, value: str):
+        """Stores a variable without asking the user for anything.
+
+        The value is either a number or a formula of other variables, e.g. 'w*h'. The
+        formulas that use the variable are computed again.
+
+        Args:
+            name (str): The name of the variable.
+            value (str | int | float | list | ndarray): The value of the variable as a
+                                                        string, a number or an array.
+
+        Raises:
+            ValueError: Raised when the name or the value is invalid, or when a formula
+                        would depend on itself.
+        """
+        if name == "" or not self.check_var_name(name):
+            raise ValueError(f"invalid variable name '{name}'")
+        if isinstance(value, str) and value == "":
+            raise ValueError(f"invalid value '{value}' for variable {name}")
+        if not isinstance(value, str) or self.check_var_value(value):
+            self.formulas.remove(name)
+            # compiled expressions look the value up when they are evaluated, so changing
+            # a value doesn't make any cached expression stale. Cached results are checked
+            # against the version the store gives the variable.
+            self.variables[name] = value
+        else:
+            self.formulas.define(name, value, self.parse_formula(name, value))
+        self.formulas.update(name, self.variables)
+
+    def parse_formula(self, name: str, value: str):
+        """Compiles the formula of a variable.
+
+        Args:
+            name (str): The name of the variable.
+            value (str): The formula.
+
+        Raises:
+            ValueError: Raised when the formula is not a valid expression.
+
+        Returns:
+            Program: The compiled formula.
+        """
+        # a formula can't use ans, since it isn't computed again when ans changes
+        names = (set(self.variables) | set(self.formulas.expressions)) - {ANSWER}
+        try:
+            return ShuntingYard(value, names).parse()
+        except handled_errors as error:
+            raise ValueError(f"invalid value '{value}' for variable {name}") from error
+
+    def list_variables(self):
+        """Writes each variable, with the formula instead of the value for formulas."""
+        for name, value in self.variables.items():
+            if name == ANSWER:
+                continue
+            self.io.write(f"{name} = {self.formulas.expressions.get(name, to_text(value))}")
+        for name, error in self.formulas.errors.items():
+            self.io.write(f"{name} = {self.formulas.expressions[name]} ({error_message(error)})")
 
     def del_variable(self, name: str):
         """Deletes a variable.
@@ -151,7 +473,11 @@ class Calculator:
         Args:
             name (str): The name of the variable.
         """
-        try:
-            self.variables.pop(name)
-        except KeyError:
+        if name not in self.variables and name not in self.formulas:
             self.io.write(f"Variable {name} not found")
+            return
+        self.variables.pop(name, None)
+        self.formulas.remove(name)
+        self.cache.invalidate(name)
+        # the formulas that used the variable fail until it is set again
+        self.formulas.update(name, self.variables)
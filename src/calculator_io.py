@@ -2,8 +2,14 @@ instructions = [
     "Use periods to indicate decimal places",
     "Trigonometric functions use radians",
     "Variable names can only include lowercase letters",
-    "Variable value can only be a number",
-    "Functions must always be followed by a left parenthesis, i.e. 'ln 2' is not ok"]
+    "Variable value can be a number or a formula of other variables, e.g. 'w*h'",
+    "Variable value can also be an array, e.g. '[1, 2, 3]'. Operators and functions apply "
+    "to each element, and sum(x), mean(x), min(x), max(x), dot(x, y) and norm(x) reduce it",
+    "ans is the result of the previous expression, e.g. 'ans*2'",
+    "Functions must always be followed by a left parenthesis, i.e. 'ln 2' is not ok",
+    "Arguments are separated by commas: min(a, b), max(a, b), log(x, base), atan2(y, x)",
+    "solve(x^2-2, x, 0, 2), integrate(sin(x), x, 0, 1) and sum(1/k^2, k, 1, 100) "
+    "find a root, an integral or a sum"]
 
 
 class CalculatorIO:
@@ -21,4 +27,33 @@ class CalculatorIO:
         print()
 
 
+class BufferedIO:
+    """IO for running the calculator without a terminal.
+
+    Inputs are given beforehand and outputs are collected, so nothing blocks on
+    input() or print(). Used by the server, where each session has its own BufferedIO.
+    """
+
+    def __init__(self, inputs=None):
+        self.inputs = list(inputs) if inputs else []
+        self.outputs = []
+
+    def feed(self, *inputs):
+        self.inputs.extend(inputs)
+
+    def read(self, text="Input"):  # pylint: disable=unused-argument
+        return self.inputs.pop(0) if self.inputs else ""
+
+    def write(self, output):
+        self.outputs.append(output)
+
+    def print_instructions(self):
+        self.outputs.extend(instructions)
+
+    def take(self) -> list:
+        outputs = self.outputs
+        self.outputs = []
+        return outputs
+
+
 calculator_io = CalculatorIO()
@@ -0,0 +1,218 @@
+import ast
+from evaluator import Evaluator, load_variable
+from program import Program, StackMachineMixin
+from registry import functions
+
+binary_operators = {
+    "+": ast.Add,
+    "-": ast.Sub,
+    "*": ast.Mult,
+    "/": ast.Div,
+    "^": ast.Pow
+}
+
+namespace = {
+    "float": float,
+    "load": load_variable,
+    "round": round
+}
+
+
+class CompiledExpression:
+    """A program compiled into a single Python function.
+
+    Attributes:
+        program: The program the function was compiled from.
+        function: The Python function. It takes the variable values as a dict.
+    """
+
+    def __init__(self, program: Program, function):
+        """The constructor for the CompiledExpression class.
+
+        Args:
+            program (Program): The compiled program.
+            function (callable): The Python function of the program.
+        """
+        self.program = program
+        self.function = function
+
+    def evaluate(self, variables=None) -> float:
+        """Evaluates the expression.
+
+        Args:
+            variables (dict | None): The variable values as numbers or numeric strings.
+
+        Returns:
+            float: The result, rounded to three decimals.
+        """
+        return self.function(variables if variables is not None else {})
+
+    __call__ = evaluate
+
+
+class Compiler(StackMachineMixin):
+    """Turns a program into one Python function with the operations inlined.
+
+    The function computes the same thing as Evaluator, in the same order, so the results
+    and the raised errors are the same, but there is no interpreter loop or operand stack.
+    Each operation is wrapped in float() like Evaluator.calculate and Evaluator.function.
+
+    Attributes:
+        expression: The equation as a compiled program.
+        operands: A list of AST nodes used as the operand stack while compiling.
+        slots: A dict of variable name -> local name, for variables that have been loaded.
+        calls: A dict of global name -> implementation, for the functions the program calls.
+    """
+
+    def __init__(self, expression: Program):
+        """The constructor for the Compiler class.
+
+        Args:
+            expression (Program): The equation as a compiled program.
+        """
+        self.expression = expression
+        self.operands = []
+        self.slots = {}
+        self.calls = {}
+
+    def compile(self) -> CompiledExpression:
+        """Generates and compiles the Python function.
+
+        Expressions nested too deeply for the Python compiler fall back to Evaluator.
+
+        Returns:
+            CompiledExpression: The compiled expression.
+        """
+        try:
+            function = self.build()
+        except RecursionError:
+            program = self.expression
+
+            def function(variables):
+                return Evaluator(program, variables).evaluate()
+        return CompiledExpression(self.expression, function)
+
+    def build(self):
+        """Builds the AST of the function and compiles it.
+
+        Returns:
+            callable: The compiled function.
+        """
+        body = self.call("round", self.execute(self.expression), ast.Constant(3))
+        tree = ast.Module(body=[ast.FunctionDef(
+            name="compiled",
+            args=ast.arguments(posonlyargs=[], args=[ast.arg(arg="variables")],
+                               kwonlyargs=[], kw_defaults=[], defaults=[]),
+            body=[ast.Return(body)],
+            decorator_list=[])],
+            type_ignores=[])
+        code = compile(ast.fix_missing_locations(tree), "<expression>", "exec")
+        scope = dict(namespace, **self.calls)
+        exec(code, scope)  # pylint: disable=exec-used
+        return scope["compiled"]
+
+    def number(self, value):
+        """Returns the AST node of a number.
+
+        Args:
+            value (int | float): The number.
+
+        Returns:
+            ast.Constant: The node.
+        """
+        return ast.Constant(value)
+
+    def store(self, slot: int):
+        """Assigns the value on top of the stack to a local where it is first computed.
+
+        Args:
+            slot (int): The slot number.
+        """
+        self.operands.append(ast.NamedExpr(target=ast.Name(f"s{slot}", ast.Store()),
+                                           value=self.operands.pop()))
+
+    def recall(self, slot: int):
+        """Returns the AST node that reads the local of a slot.
+
+        Args:
+            slot (int): The slot number.
+
+        Returns:
+            ast.Name: The node.
+        """
+        return ast.Name(f"s{slot}", ast.Load())
+
+    @staticmethod
+    def call(name: str, *args):
+        """Returns the AST node of a function call.
+
+        Args:
+            name (str): The name of the function in the namespace.
+            args (ast.expr): The arguments.
+
+        Returns:
+            ast.Call: The function call.
+        """
+        return ast.Call(func=ast.Name(name, ast.Load()), args=list(args), keywords=[])
+
+    def variable(self, name: str):
+        """Returns the AST node that reads a variable.
+
+        The variable is looked up where Evaluator would first look it up, so a missing
+        variable is reported at the same point, and the value is kept in a local after that.
+
+        Args:
+            name (str): The name of the variable.
+
+        Returns:
+            ast.expr: The node that gives the value of the variable.
+        """
+        if name in self.slots:
+            return ast.Name(self.slots[name], ast.Load())
+        slot = f"v{len(self.slots)}"
+        self.slots[name] = slot
+        load = self.call("load", ast.Name("variables", ast.Load()), ast.Constant(name))
+        return ast.NamedExpr(target=ast.Name(slot, ast.Store()), value=load)
+
+    def calculate(self, operator: str, first, second):
+        """Returns the AST node of one operation.
+
+        Args:
+            operator (str): The operation in question.
+            first (ast.expr): The first operand.
+            second (ast.expr): The second operand.
+
+        Returns:
+            ast.expr: The operation wrapped in float().
+        """
+        operation = ast.BinOp(left=first, op=binary_operators[operator](), right=second)
+        return self.call("float", operation)
+
+    def function(self, name: str, *args):
+        """Returns the AST node of a function call.
+
+        The implementation of the function is bound when the program is compiled, under a
+        global name that can't clash with the names of the namespace.
+
+        Args:
+            name (str): The name of the function.
+            args (ast.expr): The inputs for the function.
+
+        Returns:
+            ast.expr: The function call wrapped in float().
+        """
+        function = f"fn_{name}"
+        self.calls[function] = functions[name].implementation
+        return self.call("float", self.call(function, *args))
+
+
+def compile_program(program: Program) -> CompiledExpression:
+    """Compiles a program into a Python function.
+
+    Args:
+        program (Program): The compiled program.
+
+    Returns:
+        CompiledExpression: The compiled expression.
+    """
+    return Compiler(program).compile()
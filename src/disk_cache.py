@@ -0,0 +1,188 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+from hashlib import sha256
+from program import VERSION as PROGRAM_VERSION, CompactProgram
+
+# the first bytes of an entry file and the version of the entry format
+MAGIC = b"RPNC"
+VERSION = 1
+entry_header = struct.Struct("<4sBBI")
+
+
+def write_atomic(path: str, data: bytes):
+    """Writes a file so that readers see either the old or the new file, never a part of one.
+
+    The data is written to a temporary file in the same directory, which then replaces
+    the file. Concurrent writers don't clobber each other, the last one wins.
+
+    Args:
+        path (str): The path of the file.
+        data (bytes): The contents.
+    """
+    directory = os.path.dirname(path)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)
+    except OSError:
+        try:
+            os.unlink(temporary)
+        except OSError:
+            pass
+        raise
+
+
+class DiskCache:
+    """A cache directory of compiled expressions and a snapshot of the variables.
+
+    Like .pyc files, each compiled expression is kept in its own file, named by a hash of
+    the expression and the format versions, so a new format never reads old files. Nothing
+    is read when the cache is opened; an entry is memory-mapped only when its expression is
+    asked for. An entry that is corrupt, of another version or of another expression is
+    ignored. Files are replaced atomically, so processes can share the directory.
+
+    Attributes:
+        directory: The cache directory.
+        hits: The number of expressions loaded from the disk.
+        misses: The number of expressions that had no valid entry.
+        errors: The number of entries that were ignored as corrupt or stale.
+    """
+
+    def __init__(self, directory: str):
+        """The constructor for the DiskCache class.
+
+        Args:
+            directory (str): The cache directory. It is created if it doesn't exist.
+        """
+        self.directory = directory
+        os.makedirs(os.path.join(directory, "expressions"), exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @staticmethod
+    def key(expression: str) -> str:
+        """Returns the hash of an expression and the format versions.
+
+        Args:
+            expression (str): The normalized expression.
+
+        Returns:
+            str: The hash as hex.
+        """
+        text = f"{VERSION}:{PROGRAM_VERSION}:{expression}"
+        return sha256(text.encode("utf-8")).hexdigest()
+
+    def path(self, expression: str) -> str:
+        """Returns the path of the entry of an expression.
+
+        The entries are spread over subdirectories by the first two characters of the hash,
+        so that no directory gets too large.
+
+        Args:
+            expression (str): The normalized expression.
+
+        Returns:
+            str: The path of the entry file.
+        """
+        key = self.key(expression)
+        return os.path.join(self.directory, "expressions", key[:2], key[2:])
+
+    def load(self, expression: str):
+        """Reads the compiled program of an expression.
+
+        Args:
+            expression (str): The normalized expression.
+
+        Returns:
+            CompactProgram | None: The program, or None if there is no valid entry.
+        """
+        try:
+            with open(self.path(expression), "rb") as file, \
+                    mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                program = self.read_entry(data, expression)
+        except (OSError, ValueError):
+            # a missing file is a plain miss, an empty file can't be mapped
+            program = None
+        if program is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return program
+
+    def read_entry(self, data, expression: str):
+        """Checks an entry and reads the program in it.
+
+        Args:
+            data (mmap | bytes): The contents of the entry file.
+            expression (str): The expression the entry should be for.
+
+        Returns:
+            CompactProgram | None: The program, or None if the entry isn't valid.
+        """
+        try:
+            magic, version, program_version, length = entry_header.unpack_from(data)
+            if (magic, version, program_version) != (MAGIC, VERSION, PROGRAM_VERSION):
+                raise ValueError("stale entry")
+            start = entry_header.size
+            if data[start:start + length].decode("utf-8") != expression:
+                raise ValueError("entry of another expression")
+            return CompactProgram.from_bytes(data[start + length:])
+        except (struct.error, UnicodeDecodeError, ValueError):
+            self.errors += 1
+            return None
+
+    def save(self, expression: str, program):
+        """Writes the compiled program of an expression.
+
+        A failed write only means the expression isn't cached, so errors are ignored.
+
+        Args:
+            expression (str): The normalized expression.
+            program (Program | CompactProgram): The compiled program.
+        """
+        text = expression.encode("utf-8")
+        data = (entry_header.pack(MAGIC, VERSION, PROGRAM_VERSION, len(text)) + text
+                + program.compact().to_bytes())
+        path = self.path(expression)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_atomic(path, data)
+        except OSError:
+            pass
+
+    def load_state(self):
+        """Reads the snapshot of the variables.
+
+        Returns:
+            dict | None: The snapshot, or None if there is none or it can't be read.
+        """
+        try:
+            with open(os.path.join(self.directory, "variables.json"), encoding="utf-8") as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(state, dict) or state.get("version") != VERSION:
+            return None
+        return state
+
+    def save_state(self, state: dict):
+        """Writes the snapshot of the variables.
+
+        Args:
+            state (dict): The variables and formulas as JSON-compatible values.
+        """
+        data = json.dumps({"version": VERSION, **state}).encode("utf-8")
+        write_atomic(os.path.join(self.directory, "variables.json"), data)
+
+    def stats(self) -> dict:
+        """Returns the counters of the cache.
+
+        Returns:
+            dict: The hits, misses and ignored entries.
+        """
+        return {"hits": self.hits, "misses": self.misses, "errors": self.errors}
@@ -0,0 +1,14 @@
+class InvalidInputError(Exception):
+    pass
+
+
+class UnknownInputError(Exception):
+    pass
+
+
+class MismatchedParenthesesError(Exception):
+    pass
+
+
+class BudgetExceededError(Exception):
+    pass
@@ -1,23 +1,58 @@
-from math import cos, exp, log, sin, sqrt, tan
-from shunting_yard import operators, functions
+from time import perf_counter
+from program import (FUNCTION, NUMBER, OPERATOR, STORE, VARIABLE, CompactProgram, Program,
+                     StackMachineMixin, to_number)
+from registry import functions, lookup, operators
+from shunting_yard import UnknownInputError
 
 
-class Evaluator:
+def load_variable(variables, name: str):
+    """Looks up the value of a variable.
+
+    Args:
+        variables (dict): The variable values as numbers or numeric strings.
+        name (str): The name of the variable.
+
+    Raises:
+        UnknownInputError: Raised when the variable doesn't have a value.
+
+    Returns:
+        int | float: The value of the variable.
+    """
+    try:
+        value = variables[name]
+    except KeyError as error:
+        raise UnknownInputError from error
+    if isinstance(value, str):
+        return to_number(value)
+    return value
+
+
+class Evaluator(StackMachineMixin):
     """This class calculates the result of an equation in reverse Polish notation.
 
     Attributes:
-        expression: The equation as a string.
+        expression: The equation as a Program or a CompactProgram.
+        variables: The values of the variables the program refers to.
         operands: An empty list for storing the operands.
+        slots: The values of the common subexpressions, by slot number.
+        metrics: Where the evaluation time and the instructions are recorded, or None.
     """
 
-    def __init__(self, expression: str):
+    __slots__ = ("expression", "variables", "operands", "slots", "metrics")
+
+    def __init__(self, expression: Program, variables=None, metrics=None):
         """The constrcutor for this class.
 
         Args:
-            expression (str): The equation as a string.
+            expression (Program): The equation as a compiled program.
+            variables (dict | None): The variable values as numbers or numeric strings.
+            metrics (Metrics | None): Turns on the instrumentation. Defaults to None.
         """
-        self.expression = expression.split(" ")
+        self.expression = expression
+        self.variables = variables if variables is not None else {}
         self.operands = []
+        self.slots = {}
+        self.metrics = metrics
 
     def evaluate(self) -> float:
         """This method iterates the equation and is in charge of handling the tokens.
@@ -25,22 +60,96 @@ class Evaluator:
         Returns:
             int | float: The final result.
         """
-        for token in self.expression:
-            if token in functions:
-                x = self.operands.pop()
-                result = self.function(token, x)
-                self.operands.append(result)
-            elif token in operators:
-                second = self.operands.pop()
-                first = self.operands.pop()
-                result = self.calculate(token, first, second)
-                self.operands.append(result)
-            else:
-                try:
-                    self.operands.append(int(token))
-                except ValueError:
-                    self.operands.append(float(token))
-        return round(self.operands.pop(), 3)
+        if self.metrics is None:
+            return self.run()
+        start = perf_counter()
+        result = self.run()
+        self.metrics.evaluated(self.expression, perf_counter() - start)
+        return result
+
+    def run(self) -> float:
+        """Runs the instructions of the program and rounds the result.
+
+        Returns:
+            int | float: The final result.
+        """
+        return round(self.value(), 3)
+
+    def value(self):
+        """Runs the instructions of the program with an operand stack.
+
+        Returns:
+            int | float: The result without rounding.
+        """
+        if type(self.expression) is CompactProgram:  # pylint: disable=unidiomatic-typecheck
+            return self.run_compact(self.expression)
+        return self.execute(self.expression)
+
+    def run_compact(self, program: CompactProgram):
+        """Runs a compact program on a stack that is allocated once at its full depth.
+
+        Args:
+            program (CompactProgram): The program.
+
+        Returns:
+            int | float: The result without rounding.
+        """
+        stack = [None] * program.max_depth
+        slots = [None] * program.slots
+        constants = program.constants
+        variables = program.variables
+        calls = [lookup(name).implementation for name in program.symbols]
+        arities = [lookup(name).arity for name in program.symbols]
+        top = -1
+        for opcode, argument in zip(program.opcodes, program.arguments):
+            if opcode == NUMBER:
+                top += 1
+                stack[top] = constants[argument]
+            elif opcode == OPERATOR:
+                second = stack[top]
+                top -= 1
+                stack[top] = float(calls[argument](stack[top], second))
+            elif opcode == VARIABLE:
+                top += 1
+                stack[top] = load_variable(self.variables, variables[argument])
+            elif opcode == FUNCTION:
+                arity = arities[argument]
+                if arity == 1:
+                    stack[top] = float(calls[argument](stack[top]))
+                else:
+                    top -= arity - 1
+                    stack[top] = float(calls[argument](*stack[top:top + arity]))
+            elif opcode == STORE:
+                slots[argument] = stack[top]
+            else:  # opcode == RECALL
+                top += 1
+                stack[top] = slots[argument]
+        return stack[0]
+
+    def number(self, value):
+        """Returns the operand of a number in the program.
+
+        Args:
+            value (int | float): The number.
+
+        Returns:
+            int | float: The number.
+        """
+        return value
+
+    def variable(self, name: str):
+        """Looks up the value of a variable.
+
+        Args:
+            name (str): The name of the variable.
+
+        Raises:
+            UnknownInputError: Raised when the variable doesn't have a value.
+
+        Returns:
+            int | float: The value of the variable.
+        """
+        return load_variable(self.variables, name)
 
     def calculate(self, operator: str, first: int, second: int) -> float:
         """This method returns the result of one operation.
@@ -53,55 +162,27 @@ class Evaluator:
         Returns:
             float: The result of the operation.
         """
-        if operator == "+":
-            result = first + second
-        elif operator == "-":
-            result = first - second
-        elif operator == "*":
-            result = first * second
-        elif operator == "/":
-            result = first / second
-        else:  # operator == "^":
-            result = first ** second
-        return float(result)
-
-    def function(self, name: str, x: int) -> float:
+        return float(operators[operator].implementation(first, second))
+
+    def function(self, name: str, *args) -> float:
         """Calculates the result of different functions.
 
         Args:
             name (str): The name of the function.
-            x (int): The input for the function.
+            args (int | float): The inputs for the function.
 
         Returns:
             float: The result of the function.
         """
-        if name == "abs":
-            result = abs(x)
-        elif name == "cos":
-            result = cos(x)
-        elif name == "exp":
-            result = exp(x)
-        elif name == "lb":
-            result = log(x, 2)
-        elif name == "lg":
-            result = log(x, 10)
-        elif name == "ln":
-            result = log(x)
-        elif name == "sin":
-            result = sin(x)
-        elif name == "sqrt":
-            result = sqrt(x)
-        else:  # name == "tan":
-            result = tan(x)
-        return float(result)
-
-    def set_expression(self, expression: str):
+        return float(functions[name].implementation(*args))
+
+    def set_expression(self, expression: Program):
         """Sets the expression, used for testing purposes.
 
         Args:
-            expression (str): The expression to be evaluated.
+            expression (Program): The expression to be evaluated.
         """
-        self.expression = expression.split(" ")
+        self.expression = expression
 
 
 # if __name__ == "__main__":
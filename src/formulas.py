@@ -0,0 +1,151 @@
+from collections import deque
+from arrays import program_value
+from errors import InvalidInputError, UnknownInputError
+from graph import share_subexpressions
+from optimizer import optimize
+from program import Program
+
+# the errors that make a formula fail instead of stopping the update
+formula_errors = (UnknownInputError, InvalidInputError, ArithmeticError, ValueError, TypeError)
+
+
+class FormulaGraph:
+    """Variables that are defined as formulas of other variables, like cells of a spreadsheet.
+
+    The graph knows which formulas use each name, so when a variable changes only the
+    formulas downstream of it are computed again, in topological order. The values of all
+    the other formulas are kept as they are. A formula that would depend on itself is
+    refused when it is defined.
+
+    The values are stored in the variables dict of the calculator, so expressions read a
+    formula like any other variable. A formula that fails, e.g. because it divides by
+    zero, is left out of the variables and its error is kept in errors.
+
+    Attributes:
+        expressions: A dict of formula name -> the expression as it was given.
+        programs: A dict of formula name -> compiled program.
+        dependents: A dict of name -> set of the formulas that use it directly.
+        errors: A dict of formula name -> the error of a formula that failed.
+    """
+
+    def __init__(self):
+        """The constructor for the FormulaGraph class."""
+        self.expressions = {}
+        self.programs = {}
+        self.dependents = {}
+        self.errors = {}
+
+    def define(self, name: str, expression: str, program: Program):
+        """Adds a formula or replaces the formula of a name.
+
+        Args:
+            name (str): The name of the formula.
+            expression (str): The expression in infix notation.
+            program (Program): The compiled program of the expression.
+
+        Raises:
+            ValueError: Raised when the formula would depend on itself.
+        """
+        if name in program.names or program.names & self.downstream(name):
+            raise ValueError(f"formula for {name} would depend on itself")
+        self.remove(name)
+        self.expressions[name] = expression
+        self.programs[name] = share_subexpressions(optimize(program)).compact()
+        for dependency in program.names:
+            self.dependents.setdefault(dependency, set()).add(name)
+
+    def remove(self, name: str):
+        """Removes the formula of a name, if it has one.
+
+        Args:
+            name (str): The name of the formula.
+        """
+        program = self.programs.pop(name, None)
+        if program is None:
+            return
+        del self.expressions[name]
+        self.errors.pop(name, None)
+        for dependency in program.names:
+            names = self.dependents[dependency]
+            names.discard(name)
+            if not names:
+                del self.dependents[dependency]
+
+    def downstream(self, name: str) -> set:
+        """Returns every formula that uses a name directly or through other formulas.
+
+        Args:
+            name (str): The name of a variable or a formula.
+
+        Returns:
+            set: The names of the formulas.
+        """
+        found = set()
+        queue = deque([name])
+        while queue:
+            for dependent in self.dependents.get(queue.popleft(), ()):
+                if dependent not in found:
+                    found.add(dependent)
+                    queue.append(dependent)
+        return found
+
+    def order(self, names: set) -> list:
+        """Sorts formulas so that each comes after the formulas it uses.
+
+        Args:
+            names (set): The names of the formulas.
+
+        Returns:
+            list: The names in topological order.
+        """
+        waiting = {name: len(self.programs[name].names & names) for name in names}
+        ready = deque(name for name, count in waiting.items() if count == 0)
+        ordered = []
+        while ready:
+            name = ready.popleft()
+            ordered.append(name)
+            for dependent in self.dependents.get(name, ()):
+                if dependent not in waiting:
+                    continue
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    ready.append(dependent)
+        return ordered
+
+    def update(self, name: str, variables: dict) -> list:
+        """Computes again the formulas affected by a change of a name.
+
+        Args:
+            name (str): The variable or formula that changed.
+            variables (dict): The variables, where the new values are stored.
+
+        Returns:
+            list: The names of the formulas that were computed, in order.
+        """
+        affected = self.downstream(name)
+        if name in self.programs:
+            affected.add(name)
+        ordered = self.order(affected)
+        for formula in ordered:
+            self.compute(formula, variables)
+        return ordered
+
+    def compute(self, name: str, variables: dict):
+        """Computes the value of one formula.
+
+        Args:
+            name (str): The name of the formula.
+            variables (dict): The variables, where the value is stored.
+        """
+        try:
+            variables[name] = program_value(self.programs[name], variables)
+            self.errors.pop(name, None)
+        except formula_errors as error:
+            variables.pop(name, None)
+            self.errors[name] = error
+
+    def __contains__(self, name: str):
+        return name in self.programs
+
+    def __len__(self):
+        return len(self.programs)
@@ -0,0 +1,121 @@
+from evaluator import load_variable
+from graph import evaluation_errors
+from registry import functions, operators
+from shunting_yard import ShuntingYard
+
+
+class FusedEvaluator:
+    """An output for ShuntingYard that calculates each instruction as soon as it is parsed.
+
+    The operands are kept on a value stack instead of being written to a program, so an
+    expression that is evaluated only once is never compiled. Each operation is
+    calculated like Evaluator does it, in the same order.
+
+    ShuntingYard raises its errors only after reading up to the invalid token, while the
+    two-stage path parses the whole expression before evaluating anything. So the first
+    evaluation error is kept and the rest of the expression is only parsed. It is raised
+    by result() if the parsing succeeds, which makes the errors the same as in the
+    two-stage path.
+
+    Attributes:
+        variables: The variable values as numbers or numeric strings.
+        operands: The values of the parsed operands. After an error they are meaningless.
+        error: The first error raised by an operation, or None.
+    """
+
+    __slots__ = ("variables", "operands", "error")
+
+    def __init__(self, variables):
+        """The constructor for the FusedEvaluator class.
+
+        Args:
+            variables (dict): The variable values as numbers or numeric strings.
+        """
+        self.variables = variables
+        self.operands = []
+        self.error = None
+
+    def number(self, value):
+        """Pushes a number.
+
+        Args:
+            value (int | float): The number.
+        """
+        self.operands.append(value)
+
+    def variable(self, name: str):
+        """Pushes the value of a variable.
+
+        Args:
+            name (str): The name of the variable.
+        """
+        value = None
+        if self.error is None:
+            try:
+                value = load_variable(self.variables, name)
+            except evaluation_errors as error:
+                self.error = error
+        self.operands.append(value)
+
+    def operator(self, name: str):
+        """Applies an operator to the two operands on top of the stack.
+
+        Args:
+            name (str): The operator.
+        """
+        operands = self.operands
+        if len(operands) < 2:
+            # an expression such as "1+" is incomplete, which the parser reports next
+            return
+        second = operands.pop()
+        if self.error is None:
+            try:
+                operands[-1] = float(operators[name].implementation(operands[-1], second))
+            except evaluation_errors as error:
+                self.error = error
+
+    def function(self, name: str):
+        """Applies a function to the operands on top of the stack.
+
+        Args:
+            name (str): The name of the function.
+        """
+        operation = functions[name]
+        first = len(self.operands) - operation.arity
+        args = self.operands[first:]
+        del self.operands[first + 1:]
+        if self.error is None:
+            try:
+                self.operands[-1] = float(operation.implementation(*args))
+            except evaluation_errors as error:
+                self.error = error
+
+    def result(self) -> float:
+        """Returns the value of the parsed expression.
+
+        Raises:
+            Exception: The first error raised by an operation.
+
+        Returns:
+            float: The result, rounded like Evaluator.evaluate.
+        """
+        if self.error is not None:
+            raise self.error
+        return round(self.operands.pop(), 3)
+
+
+def evaluate_fused(expression: str, variables) -> float:
+    """Parses and evaluates an expression in one pass, without building a program.
+
+    Gives the same result and raises the same errors as parsing the expression with
+    ShuntingYard and evaluating the program with Evaluator.
+
+    Args:
+        expression (str): The expression in infix notation.
+        variables (dict): The variable values as numbers or numeric strings.
+
+    Returns:
+        float: The result of the expression.
+    """
+    parser = ShuntingYard(expression, variables)
+    return parser.shunt(output=FusedEvaluator(variables)).result()
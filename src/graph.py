@@ -0,0 +1,234 @@
+from errors import UnknownInputError
+from evaluator import Evaluator
+from program import FUNCTION, NUMBER, OPERATOR, VARIABLE, Program, StackMachineMixin
+
+# the errors a subexpression can raise, which are kept as its value in evaluate()
+evaluation_errors = (UnknownInputError, ArithmeticError, ValueError, TypeError)
+
+
+class ExpressionGraph(StackMachineMixin):
+    """Programs merged into one graph where equal subexpressions are one node.
+
+    Each node is hash-consed: before a node is added, the graph looks for a node with the
+    same instruction and the same children, so every distinct subexpression is stored once
+    however many times it appears in one program or in many programs. A node always comes
+    after its children, so the nodes are in evaluation order. A program is added by
+    running it like in the evaluators, with node indices as the operands.
+
+    Attributes:
+        nodes: A list of (opcode, value, children) tuples, children being node indices.
+        table: A dict of node key -> node index, for finding existing nodes.
+        uses: How many times each node is used by other nodes or as a root.
+        roots: The node index of each added program.
+        operands: The stack of node indices while a program is added.
+        slots: The node indices of the slots of the program being added.
+    """
+
+    def __init__(self, programs=()):
+        """The constructor for the ExpressionGraph class.
+
+        Args:
+            programs (iterable): Programs to add to the graph.
+        """
+        self.nodes = []
+        self.table = {}
+        self.uses = []
+        self.roots = []
+        self.operands = []
+        self.slots = {}
+        for program in programs:
+            self.add(program)
+
+    def node(self, opcode: int, value, children: tuple) -> int:
+        """Returns the index of a node, adding it if the graph doesn't have it yet.
+
+        Args:
+            opcode (int): The opcode of the instruction.
+            value: The number or the name of the instruction.
+            children (tuple): The indices of the operands.
+
+        Returns:
+            int: The index of the node.
+        """
+        # repr() tells 1 from 1.0 and 0.0 from -0.0, which would be equal keys otherwise
+        key = (opcode, repr(value) if opcode == NUMBER else value, children)
+        index = self.table.get(key)
+        if index is None:
+            index = self.table[key] = len(self.nodes)
+            self.nodes.append((opcode, value, children))
+            self.uses.append(0)
+            for child in children:
+                self.uses[child] += 1
+        return index
+
+    def add(self, program: Program) -> int:
+        """Adds a program to the graph.
+
+        Args:
+            program (Program): The program. It may already use slots.
+
+        Returns:
+            int: The index of the root node of the program.
+        """
+        self.slots = {}
+        root = self.execute(program)
+        self.uses[root] += 1
+        self.roots.append(root)
+        return root
+
+    def number(self, value) -> int:
+        """Returns the node of a number.
+
+        Args:
+            value (int | float): The number.
+
+        Returns:
+            int: The index of the node.
+        """
+        return self.node(NUMBER, value, ())
+
+    def variable(self, name: str) -> int:
+        """Returns the node of a variable.
+
+        Args:
+            name (str): The name of the variable.
+
+        Returns:
+            int: The index of the node.
+        """
+        return self.node(VARIABLE, name, ())
+
+    def function(self, name: str, *args) -> int:
+        """Returns the node of a function call.
+
+        Args:
+            name (str): The name of the function.
+            args (int): The nodes of the arguments.
+
+        Returns:
+            int: The index of the node.
+        """
+        return self.node(FUNCTION, name, args)
+
+    def calculate(self, operator: str, first: int, second: int) -> int:
+        """Returns the node of an operation.
+
+        Args:
+            operator (str): The operator.
+            first (int): The node of the first operand.
+            second (int): The node of the second operand.
+
+        Returns:
+            int: The index of the node.
+        """
+        return self.node(OPERATOR, operator, (first, second))
+
+    def shared(self, index: int) -> bool:
+        """Tells whether a node is worth keeping in a slot.
+
+        Args:
+            index (int): The index of the node.
+
+        Returns:
+            bool: True for operations and function calls that are used more than once.
+        """
+        return self.uses[index] > 1 and self.nodes[index][0] in (OPERATOR, FUNCTION)
+
+    def program(self, root: int) -> Program:
+        """Builds the program of a node, computing each shared subexpression only once.
+
+        The first time a shared node is reached its value is stored in a slot, and the
+        other uses recall it. The subexpressions are computed in the same order as in the
+        original program, so the same error is raised first.
+
+        Args:
+            root (int): The index of the node.
+
+        Returns:
+            Program: The program with STORE and RECALL instructions.
+        """
+        program = Program()
+        slots = {}
+        stack = [(root, False)]
+        while stack:
+            index, ready = stack.pop()
+            opcode, value, children = self.nodes[index]
+            if ready:
+                program.instructions.append((opcode, value))
+                if opcode == VARIABLE:
+                    program.names.add(value)
+                if self.shared(index):
+                    slots[index] = len(slots)
+                    program.store(slots[index])
+            elif index in slots:
+                program.recall(slots[index])
+            else:
+                stack.append((index, True))
+                stack.extend((child, False) for child in reversed(children))
+        return program
+
+    def evaluate(self, variables) -> list:
+        """Evaluates every node once and returns the result of each program.
+
+        A node whose operand failed fails with the error of its first failing operand,
+        which is the error the program would raise when evaluated on its own.
+
+        Args:
+            variables (dict): The variable values as numbers or numeric strings.
+
+        Returns:
+            list: The rounded result of each added program, or the exception it raised.
+        """
+        evaluator = Evaluator(Program(), variables)
+        values = []
+        for opcode, value, children in self.nodes:
+            operands = [values[child] for child in children]
+            failed = next((x for x in operands if isinstance(x, Exception)), None)
+            if failed is not None:
+                values.append(failed)
+                continue
+            try:
+                if opcode == NUMBER:
+                    values.append(value)
+                elif opcode == VARIABLE:
+                    values.append(evaluator.variable(value))
+                elif opcode == FUNCTION:
+                    values.append(evaluator.function(value, *operands))
+                else:  # opcode == OPERATOR
+                    values.append(evaluator.calculate(value, *operands))
+            except evaluation_errors as error:
+                values.append(error)
+        return [values[root] if isinstance(values[root], Exception) else round(values[root], 3)
+                for root in self.roots]
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+def share_subexpressions(program: Program) -> Program:
+    """Rewrites a program so that repeated subexpressions are computed only once.
+
+    Args:
+        program (Program): The program.
+
+    Returns:
+        Program: The program with slots, or the same program if nothing repeats.
+    """
+    graph = ExpressionGraph()
+    root = graph.add(program)
+    if not any(graph.shared(index) for index in range(len(graph))):
+        return program
+    return graph.program(root)
+
+
+def evaluate_shared(programs: list, variables) -> list:
+    """Evaluates many programs, computing the subexpressions they share only once.
+
+    Args:
+        programs (list): The programs.
+        variables (dict): The variable values as numbers or numeric strings.
+
+    Returns:
+        list: The result of each program, or the exception it raised.
+    """
+    return ExpressionGraph(programs).evaluate(variables)
@@ -1,9 +1,213 @@
-from calculator import Calculator
+import asyncio
+import json
+import sys
+from argparse import ArgumentParser
+import numpy as np
+from batch import load_variables, read_lines, run_batch
+from calculator import Calculator, error_message, handled_errors
+from errors import InvalidInputError
+from parallel import ParallelEvaluator
+from pipeline import BINARY_SUFFIX, BINARY_TYPE, DEFAULT_CHUNK_ROWS, run_pipeline
+from server import CalculatorServer
+from streaming import RPNWriter, parse_stream
+
+
+def parse_arguments(arguments=None):
+    parser = ArgumentParser(description="Scientific calculator")
+    parser.add_argument("--batch", nargs="?", const="-", metavar="FILE",
+                        help="evaluate one expression per line from FILE, or stdin if FILE is - or "
+                             "not given, and print one result per line")
+    parser.add_argument("--variables", metavar="FILE",
+                        help="load variables from FILE, one 'name = value' per line, or a "
+                             "JSON object (.json) or the binary format (.bin)")
+    parser.add_argument("--array", action="append", default=[], metavar="NAME=FILE",
+                        help="load an array variable from FILE, raw float64 values (.f64) or "
+                             "numbers separated by whitespace, can be repeated")
+    parser.add_argument("--workers", type=int, metavar="N",
+                        help="evaluate the batch in N worker processes")
+    parser.add_argument("--rpn", metavar="FILE",
+                        help="print the RPN of the expression in FILE, or stdin if FILE is -, "
+                             "reading it in chunks")
+    parser.add_argument("--pipeline", nargs=2, metavar=("INPUT", "OUTPUT"),
+                        help="append the columns of the formulas to a CSV file, or write them "
+                             "for a directory of raw float64 columns, in chunks")
+    parser.add_argument("--formula", action="append", default=[], metavar="NAME=EXPRESSION",
+                        help="a computed column of the pipeline, can be repeated")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, metavar="N",
+                        help="how many rows the pipeline holds in memory at a time")
+    parser.add_argument("--stats", action="store_true",
+                        help="print the rows, errors and throughput of the pipeline, or the "
+                             "cache statistics of the calculator, to stderr")
+    parser.add_argument("--result-cache", type=int, default=256, metavar="N",
+                        help="how many results of expressions are cached, 0 for none")
+    parser.add_argument("--cache-dir", metavar="DIR",
+                        help="keep compiled expressions and variables in DIR between runs")
+    parser.add_argument("--serve", metavar="[HOST:]PORT",
+                        help="serve calculator sessions over TCP")
+    parser.add_argument("--socket", metavar="PATH",
+                        help="serve calculator sessions over a Unix socket")
+    return parser.parse_args(arguments)
+
+
+def read_variables(calc: Calculator, path: str):
+    """Loads the variables file given with --variables into the calculator.
+
+    Args:
+        calc (Calculator): The calculator.
+        path (str): The file. Its suffix tells the format.
+
+    Raises:
+        ValueError: Raised when the file isn't a valid variables file.
+        OSError: Raised when the file can't be read.
+    """
+    if path.endswith(".bin"):
+        with open(path, "rb") as stream:
+            calc.variables.load_binary(stream)
+        return
+    with open(path, encoding="utf-8") as stream:
+        if path.endswith(".json"):
+            calc.variables.load_json(stream)
+        else:
+            load_variables(calc, stream)
+
+
+def read_array(calc: Calculator, definition: str):
+    """Loads an array variable given with --array into the calculator.
+
+    Args:
+        calc (Calculator): The calculator.
+        definition (str): The name and the file, e.g. "prices=prices.f64".
+
+    Raises:
+        ValueError: Raised when the definition or the file isn't valid.
+        OSError: Raised when the file can't be read.
+    """
+    name, separator, path = definition.partition("=")
+    if not separator:
+        raise ValueError(f"expected NAME=FILE, got '{definition}'")
+    path = path.strip()
+    if path.endswith(BINARY_SUFFIX):
+        values = np.fromfile(path, dtype=BINARY_TYPE)
+    else:
+        with open(path, encoding="utf-8") as stream:
+            values = np.array(stream.read().split(), dtype=np.float64)
+    calc.assign(name.strip(), values)
+
+
+def batch(calc: Calculator, stream, workers):
+    """Evaluates the expressions of --batch and prints one result per line.
+
+    Args:
+        calc (Calculator): The calculator with the loaded variables.
+        stream (TextIO): The expressions, one per line.
+        workers (int | None): The number of worker processes, or None to evaluate the
+                              expressions in this process.
+    """
+    if workers:
+        results = ParallelEvaluator(workers, variables=calc.variables).evaluate(read_lines(stream))
+        sys.stdout.writelines(result + "\n" for result in results)
+    else:
+        run_batch(calc, stream, sys.stdout)
+
+
+def rpn(calc: Calculator, path: str):
+    """Prints the RPN of the expression of --rpn, reading the input in chunks.
+
+    Args:
+        calc (Calculator): The calculator with the loaded variables.
+        path (str): The file of the expression, or - for stdin.
+    """
+    writer = RPNWriter(sys.stdout)
+    try:
+        if path == "-":
+            parse_stream(sys.stdin.buffer, calc.variables, writer)
+        else:
+            with open(path, "rb") as stream:
+                parse_stream(stream, calc.variables, writer)
+    except handled_errors as error:
+        sys.exit(f"{path}: {error_message(error)}: {error}")
+    except OSError as error:
+        sys.exit(str(error))
+    finally:
+        sys.stdout.write("\n")
+
+
+def pipeline(calc: Calculator, arguments):
+    """Runs the formulas of --formula over the data file of --pipeline.
+
+    Args:
+        calc (Calculator): The calculator whose variables the formulas can use.
+        arguments (Namespace): The command line arguments.
+    """
+    source, destination = arguments.pipeline
+    try:
+        stats = run_pipeline(arguments.formula, source, destination, calc.variables,
+                             arguments.chunk_rows)
+    except ValueError as error:
+        # a formula or the data isn't valid, math errors only fail their own rows
+        sys.exit(f"{source}: {error_message(InvalidInputError())}: {error}")
+    except handled_errors as error:
+        sys.exit(f"{source}: {error_message(error)}: {error}")
+    except OSError as error:
+        sys.exit(str(error))
+    if arguments.stats:
+        sys.stderr.write(json.dumps(stats.stats(), indent=2) + "\n")
+
+
+def serve(arguments):
+    """Serves calculator sessions on the port of --serve or the socket of --socket.
+
+    Runs until interrupted.
+
+    Args:
+        arguments (Namespace): The command line arguments.
+    """
+    server = CalculatorServer()
+    if arguments.socket:
+        coroutine = server.serve(path=arguments.socket)
+    else:
+        host, _, port = arguments.serve.rpartition(":")
+        coroutine = server.serve(host=host or "127.0.0.1", port=int(port))
+    try:
+        asyncio.run(coroutine)
+    except KeyboardInterrupt:
+        pass
 
 
 def main():
-    calc = Calculator()
-    calc.start()
+    arguments = parse_arguments()
+    if arguments.serve or arguments.socket:
+        serve(arguments)
+        return
+    calc = Calculator(cache_dir=arguments.cache_dir, result_cache_size=arguments.result_cache)
+    if arguments.variables:
+        try:
+            read_variables(calc, arguments.variables)
+        except (OSError, ValueError) as error:
+            sys.exit(f"{arguments.variables}: {error}")
+    for definition in arguments.array:
+        try:
+            read_array(calc, definition)
+        except (OSError, ValueError) as error:
+            sys.exit(f"{definition}: {error}")
+    if arguments.rpn:
+        rpn(calc, arguments.rpn)
+        return
+    if arguments.pipeline:
+        pipeline(calc, arguments)
+        return
+    if arguments.batch is None:
+        calc.start()
+    elif arguments.batch == "-":
+        batch(calc, sys.stdin, arguments.workers)
+    else:
+        try:
+            with open(arguments.batch, encoding="utf-8") as stream:
+                batch(calc, stream, arguments.workers)
+        except OSError as error:
+            sys.exit(str(error))
+    if arguments.stats:
+        sys.stderr.write(json.dumps(calc.stats(), indent=2) + "\n")
 
 
 if __name__ == "__main__":
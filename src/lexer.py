@@ -0,0 +1,182 @@
+import re
+from errors import InvalidInputError
+
+NUMBER = "number"
+IDENTIFIER = "identifier"
+OPERATOR = "operator"
+LEFT = "left"
+RIGHT = "right"
+COMMA = "comma"
+
+# %s is what may come between a called name and its "("
+TOKEN_PATTERN = r"""
+    (?P<number>[0-9]+(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?)
+  | (?P<identifier>[a-z]+[0-9]+(?=%s\()|[a-z]+(?:\.[a-z]+)*)
+  | (?P<operator>[-+*/^])
+  | (?P<left>\()
+  | (?P<right>\))
+  | (?P<comma>,)
+  | (?P<invalid>.)
+"""
+pattern = re.compile(TOKEN_PATTERN % "", re.VERBOSE | re.DOTALL)
+
+
+class Token:
+    """A token of an expression.
+
+    Attributes:
+        kind: The type of the token: NUMBER, IDENTIFIER, OPERATOR, LEFT, RIGHT
+              or COMMA.
+        text: The text of the token.
+        position: The index of the first character of the token in the expression.
+    """
+
+    __slots__ = ("kind", "text", "position")
+
+    def __init__(self, kind: str, text: str, position: int):
+        self.kind = kind
+        self.text = text
+        self.position = position
+
+    def __eq__(self, other):
+        if isinstance(other, Token):
+            return (self.kind, self.text, self.position) == (other.kind, other.text,
+                                                              other.position)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Token({self.kind!r}, {self.text!r}, {self.position})"
+
+
+class Lexer:
+    """Splits an expression into typed tokens in one linear pass with a regular expression.
+
+    Numbers can have decimals and an exponent, e.g. 1.5e-3. A name can end in digits only
+    when it is called, e.g. atan2(y, x), so "x2" is still a name followed by a number. A
+    variable name can be in namespaces separated by dots, e.g. "tbl.x". A minus sign is
+    always an operator token, the parser decides whether it is a negation.
+
+    Attributes:
+        expression: The expression in infix notation, without spaces.
+    """
+
+    def __init__(self, expression: str):
+        """The constructor for the Lexer class.
+
+        Args:
+            expression (str): The expression in infix notation, without spaces.
+        """
+        self.expression = expression
+
+    def tokens(self):
+        """Yields the tokens of the expression one at a time.
+
+        Raises:
+            InvalidInputError: Raised at a character that can't start a token.
+
+        Yields:
+            Token: The next token.
+        """
+        for match in pattern.finditer(self.expression):
+            kind = match.lastgroup
+            if kind == "invalid":
+                raise InvalidInputError(
+                    f"invalid character '{match.group()}' at position {match.start()}")
+            yield Token(kind, match.group(), match.start())
+
+    def __iter__(self):
+        return self.tokens()
+
+
+# the same tokens, with whitespace between them
+stream_pattern = re.compile(r"(?P<space>\s+)|" + TOKEN_PATTERN % r"\s*", re.VERBOSE | re.DOTALL)
+
+# how many characters a stream may hold without a place to cut it, i.e. about the
+# length of the longest token
+MAX_TOKEN_LENGTH = 4096
+
+# the text up to the last place where a stream can be cut without cutting a token: after
+# a character that can't be inside a token or right before a "(", after a sign that isn't
+# in an exponent, and after whitespace. Whitespace after a digit may be followed by the
+# "(" of a call of a name like atan2, so it is only cut before a character that isn't "("
+last_boundary = re.compile(r".*(?:[*/^(),]|(?<![eE])[+-]|(?<![0-9\s])\s+|\s(?=[^\s(]))",
+                           re.DOTALL)
+
+
+class StreamLexer:
+    """Splits an expression that arrives in chunks into tokens, one chunk at a time.
+
+    A token may be split between two chunks, so the text after the last place where the
+    stream can be cut is kept until the next chunk arrives. Only that tail is held in
+    memory, not the whole expression, and only the new chunk is searched for a place to
+    cut. Whitespace separates tokens and is skipped. Bytes are read one character per
+    byte, so the positions of the tokens and of the errors are byte offsets from the start
+    of the stream; for text they count characters.
+
+    Attributes:
+        chunks: An iterable of str or bytes chunks.
+    """
+
+    def __init__(self, chunks):
+        """The constructor for the StreamLexer class.
+
+        Args:
+            chunks (iterable): The expression as str or bytes chunks.
+        """
+        self.chunks = chunks
+
+    def tokens(self):
+        """Yields the tokens of the stream one at a time.
+
+        Raises:
+            InvalidInputError: Raised at a character that can't start a token, or when a
+                               token is longer than MAX_TOKEN_LENGTH.
+
+        Yields:
+            Token: The next token.
+        """
+        pending = ""
+        offset = 0
+        for chunk in self.chunks:
+            if isinstance(chunk, (bytes, bytearray)):
+                chunk = chunk.decode("latin-1")
+            text = pending + chunk
+            # the last character of the tail can be a place to cut once the next is known
+            match = last_boundary.match(text, max(len(pending) - 1, 0))
+            if match is None:
+                pending = text
+            else:
+                yield from self.split(text[:match.end()], offset)
+                offset += match.end()
+                pending = text[match.end():]
+            if len(pending) > MAX_TOKEN_LENGTH:
+                raise InvalidInputError(f"the token at position {offset} is longer than "
+                                        f"{MAX_TOKEN_LENGTH} characters")
+        yield from self.split(pending, offset)
+
+    @staticmethod
+    def split(text: str, offset: int):
+        """Yields the tokens of a piece of the stream.
+
+        Args:
+            text (str): A piece that starts and ends between tokens.
+            offset (int): The position of the piece in the stream.
+
+        Raises:
+            InvalidInputError: Raised at a character that can't start a token.
+
+        Yields:
+            Token: The next token.
+        """
+        for match in stream_pattern.finditer(text):
+            kind = match.lastgroup
+            if kind == "space":
+                continue
+            if kind == "invalid":
+                raise InvalidInputError(
+                    f"invalid character {ascii(match.group())} at position "
+                    f"{offset + match.start()}")
+            yield Token(kind, match.group(), offset + match.start())
+
+    def __iter__(self):
+        return self.tokens()
@@ -0,0 +1,174 @@
+from collections import Counter
+from program import FUNCTION, NUMBER, OPERATOR, RECALL, STORE, VARIABLE
+from registry import functions
+
+opcode_names = {
+    NUMBER: "number",
+    OPERATOR: "operator",
+    FUNCTION: "function",
+    VARIABLE: "variable",
+    STORE: "store",
+    RECALL: "recall"
+}
+
+# upper bounds of the latency histogram buckets in seconds
+buckets = (0.00001, 0.0001, 0.001, 0.01, 0.1, 1.0)
+
+
+class Timing:
+    """A latency histogram of one phase.
+
+    Attributes:
+        count: The number of measurements.
+        total: The sum of the measurements in seconds.
+        maximum: The longest measurement in seconds.
+        buckets: The number of measurements that fit in each bucket, not cumulative.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.buckets = [0] * (len(buckets) + 1)
+
+    def add(self, seconds: float):
+        """Adds a measurement.
+
+        Args:
+            seconds (float): The duration.
+        """
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+        for index, bound in enumerate(buckets):
+            if seconds <= bound:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+
+
+class Metrics:
+    """Collects measurements of the parse, evaluate and IO phases.
+
+    An instance is given to Calculator, ShuntingYard and Evaluator to turn the
+    instrumentation on. They only check whether they have one, so without it they do
+    no extra work.
+
+    Attributes:
+        timings: A dict of phase -> Timing.
+        characters: The number of input characters parsed.
+        instructions: The number of instructions in the parsed programs.
+        max_stack_depth: The deepest operand stack needed by an evaluated program.
+        opcodes: A Counter of evaluated instructions by opcode name.
+        calls: A Counter of evaluated operators and functions by name.
+        errors: A Counter of errors by exception name.
+    """
+
+    def __init__(self):
+        """The constructor for the Metrics class."""
+        self.timings = {}
+        self.characters = 0
+        self.instructions = 0
+        self.max_stack_depth = 0
+        self.opcodes = Counter()
+        self.calls = Counter()
+        self.errors = Counter()
+
+    def time(self, phase: str, seconds: float):
+        """Records the duration of one phase.
+
+        Args:
+            phase (str): The name of the phase, e.g. 'parse'.
+            seconds (float): The duration.
+        """
+        timing = self.timings.get(phase)
+        if timing is None:
+            timing = self.timings[phase] = Timing()
+        timing.add(seconds)
+
+    def parsed(self, expression: str, program, seconds: float):
+        """Records a parsed expression.
+
+        Args:
+            expression (str): The parsed expression.
+            program (Program): The result of the parsing.
+            seconds (float): How long the parsing took.
+        """
+        self.time("parse", seconds)
+        self.characters += len(expression)
+        self.instructions += len(program)
+
+    def evaluated(self, program, seconds: float):
+        """Records an evaluated program, its instructions and its stack depth.
+
+        Args:
+            program (Program): The evaluated program.
+            seconds (float): How long the evaluation took.
+        """
+        self.time("evaluate", seconds)
+        depth = 0
+        deepest = 0
+        for opcode, value in program:
+            self.opcodes[opcode_names[opcode]] += 1
+            if opcode in (NUMBER, VARIABLE, RECALL):
+                depth += 1
+                deepest = max(deepest, depth)
+            elif opcode != STORE:
+                self.calls[value] += 1
+                depth -= 1 if opcode == OPERATOR else functions[value].arity - 1
+        self.max_stack_depth = max(self.max_stack_depth, deepest)
+
+    def error(self, error: Exception):
+        """Counts an error.
+
+        Args:
+            error (Exception): The error.
+        """
+        self.errors[type(error).__name__] += 1
+
+    def stats(self) -> dict:
+        """Returns all the measurements.
+
+        Returns:
+            dict: The measurements as plain dicts and numbers.
+        """
+        return {
+            "timings": {phase: {"count": timing.count, "total": timing.total,
+                                "max": timing.maximum}
+                        for phase, timing in self.timings.items()},
+            "characters": self.characters,
+            "instructions": self.instructions,
+            "max_stack_depth": self.max_stack_depth,
+            "opcodes": dict(self.opcodes),
+            "calls": dict(self.calls),
+            "errors": dict(self.errors)
+        }
+
+    def prometheus(self) -> str:
+        """Returns the measurements in the Prometheus text format.
+
+        Returns:
+            str: The snapshot.
+        """
+        lines = ["# TYPE calculator_phase_seconds histogram"]
+        for phase, timing in self.timings.items():
+            cumulative = 0
+            for bound, count in zip(buckets + ("+Inf",), timing.buckets):
+                cumulative += count
+                lines.append(f'calculator_phase_seconds_bucket{{phase="{phase}",le="{bound}"}} '
+                             f'{cumulative}')
+            lines.append(f'calculator_phase_seconds_sum{{phase="{phase}"}} {timing.total}')
+            lines.append(f'calculator_phase_seconds_count{{phase="{phase}"}} {timing.count}')
+        lines.append("# TYPE calculator_characters_total counter")
+        lines.append(f"calculator_characters_total {self.characters}")
+        lines.append("# TYPE calculator_instructions_total counter")
+        lines.append(f"calculator_instructions_total {self.instructions}")
+        lines.append("# TYPE calculator_max_stack_depth gauge")
+        lines.append(f"calculator_max_stack_depth {self.max_stack_depth}")
+        for name, label, counter in (("opcodes", "opcode", self.opcodes),
+                                     ("calls", "name", self.calls),
+                                     ("errors", "type", self.errors)):
+            lines.append(f"# TYPE calculator_{name}_total counter")
+            for key, count in sorted(counter.items()):
+                lines.append(f'calculator_{name}_total{{{label}="{key}"}} {count}')
+        return "\n".join(lines) + "\n"
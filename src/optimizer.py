@@ -0,0 +1,204 @@
+from evaluator import Evaluator
+from program import FUNCTION, NUMBER, OPERATOR, VARIABLE, Program, StackMachineMixin
+
+# operator -> (constant, side) pairs where the operation gives back the other operand,
+# side 0 meaning that the constant is the first operand and 1 the second
+identities = {
+    "+": ((0, 0), (0, 1)),
+    "-": ((0, 1),),
+    "*": ((1, 0), (1, 1)),
+    "/": ((1, 1),),
+    "^": ((1, 1),)
+}
+
+# exponent -> the cheaper function that gives the same result and errors as "^"
+strength_reductions = {
+    2: "_square",
+    0.5: "_sqrt"
+}
+
+
+class Operand:
+    """A subexpression on the optimizer's stack.
+
+    Attributes:
+        start: The index of the first instruction of the subexpression in the output.
+        constant: The value of the subexpression if it is a number, otherwise None.
+        is_float: True when the value is always a float, i.e. it isn't a variable or an
+                  int literal that an operation would convert to a float.
+    """
+
+    __slots__ = ("start", "constant", "is_float")
+
+    def __init__(self, start: int, constant=None, is_float: bool = True):
+        self.start = start
+        self.constant = constant
+        self.is_float = is_float
+
+
+class Optimizer(StackMachineMixin):
+    """Simplifies a program before it is evaluated.
+
+    The optimizer folds operations and function calls whose operands are all numbers,
+    removes operations that give back one of their operands (x*1, x+0, x-0, x/1, x^1),
+    and replaces x^2 and x^0.5 with the cheaper functions _square and _sqrt.
+
+    The optimized program gives the same results and raises the same errors as the
+    original. An operation is only folded if calculating it doesn't raise, so e.g. 1/0
+    is left in the program and still raises ZeroDivisionError when it is evaluated. No
+    subexpression with a variable is ever removed, since looking the variable up may
+    raise UnknownInputError. An identity applies to any subexpression, but when the
+    remaining operand may be an int the operation is replaced with _float, which does
+    the conversion to a float that the operation would have done. The only difference
+    is that x+0 keeps the sign of a zero x, which compares equal.
+
+    The program is run like in the evaluators, but an operand is the Operand of a
+    subexpression in the output.
+
+    Attributes:
+        expression: The program to optimize.
+        output: The instructions of the optimized program.
+        operands: The stack of the subexpressions in the output.
+        eliminated: How many instructions the optimization removed.
+        evaluator: Calculates the folded operations the same way as at evaluation time.
+    """
+
+    def __init__(self, expression: Program):
+        """The constructor for the Optimizer class.
+
+        Args:
+            expression (Program): The program to optimize.
+        """
+        self.expression = expression
+        self.output = []
+        self.operands = []
+        self.eliminated = 0
+        self.evaluator = Evaluator(Program())
+
+    def optimize(self) -> Program:
+        """Goes through the instructions once and simplifies them.
+
+        Returns:
+            Program: The optimized program.
+        """
+        self.output = []
+        self.operands = []
+        self.execute(self.expression)
+        self.eliminated = len(self.expression) - len(self.output)
+        return Program(self.output)
+
+    def number(self, value) -> Operand:
+        """Adds a number to the output.
+
+        Args:
+            value (int | float): The number.
+
+        Returns:
+            Operand: The number.
+        """
+        self.output.append((NUMBER, value))
+        return Operand(len(self.output) - 1, value, isinstance(value, float))
+
+    def variable(self, name: str) -> Operand:
+        """Adds a variable to the output.
+
+        Args:
+            name (str): The name of the variable.
+
+        Returns:
+            Operand: The variable.
+        """
+        self.output.append((VARIABLE, name))
+        return Operand(len(self.output) - 1, is_float=False)
+
+    def function(self, name: str, *args) -> Operand:
+        """Folds a function call on numbers, or adds it to the output.
+
+        Args:
+            name (str): The name of the function.
+            args (Operand): The arguments.
+
+        Returns:
+            Operand: The call.
+        """
+        if all(x.constant is not None for x in args):
+            try:
+                return self.fold(args[0].start, self.evaluator.function(
+                    name, *(x.constant for x in args)))
+            except (ArithmeticError, ValueError, TypeError):
+                pass
+        self.output.append((FUNCTION, name))
+        return Operand(args[0].start)
+
+    def calculate(self, operator: str, first: Operand, second: Operand) -> Operand:
+        """Folds, simplifies or adds an operation.
+
+        Args:
+            operator (str): The operator.
+            first (Operand): The first operand.
+            second (Operand): The second operand.
+
+        Returns:
+            Operand: The operation.
+        """
+        if first.constant is not None and second.constant is not None:
+            try:
+                return self.fold(first.start, self.evaluator.calculate(operator, first.constant,
+                                                                       second.constant))
+            except (ArithmeticError, ValueError, TypeError):
+                pass
+        elif self.identity(operator, first, second):
+            return Operand(first.start)
+        elif operator == "^" and second.constant in strength_reductions:
+            del self.output[second.start:]
+            self.output.append((FUNCTION, strength_reductions[second.constant]))
+            return Operand(first.start)
+        self.output.append((OPERATOR, operator))
+        return Operand(first.start)
+
+    def identity(self, name: str, first: Operand, second: Operand) -> bool:
+        """Removes an operation that gives back one of its operands.
+
+        Args:
+            name (str): The operator.
+            first (Operand): The first operand.
+            second (Operand): The second operand.
+
+        Returns:
+            bool: True if the operation was removed.
+        """
+        for constant, side in identities[name]:
+            number, other = (first, second) if side == 0 else (second, first)
+            if number.constant is None or number.constant != constant:
+                continue
+            del self.output[number.start]
+            if not other.is_float:
+                self.output.append((FUNCTION, "_float"))
+            return True
+        return False
+
+    def fold(self, start: int, value: float) -> Operand:
+        """Replaces the instructions from start on with a number.
+
+        Args:
+            start (int): The index of the first instruction of the folded subexpression.
+            value (float): The value of the subexpression.
+
+        Returns:
+            Operand: The number.
+        """
+        del self.output[start:]
+        self.output.append((NUMBER, value))
+        return Operand(start, value)
+
+
+def optimize(program: Program) -> Program:
+    """Simplifies a program without changing its results or errors.
+
+    Args:
+        program (Program): The program.
+
+    Returns:
+        Program: The optimized program.
+    """
+    return Optimizer(program).optimize()
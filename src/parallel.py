@@ -0,0 +1,269 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from multiprocessing import shared_memory
+import numpy as np
+from batch import evaluate_batch
+from calculator import Calculator
+from variable_store import VariableStore
+from vectorized import evaluate_many
+
+# the calculator of a worker process, created once by the pool initializer
+worker_calculator = None  # pylint: disable=invalid-name
+
+
+def start_worker(variables: VariableStore, cache_size: int):
+    """Creates the calculator of a worker process.
+
+    Args:
+        variables (VariableStore): The variables used by the expressions.
+        cache_size (int): The size of the compiled expression cache of the worker.
+    """
+    global worker_calculator  # pylint: disable=global-statement
+    worker_calculator = Calculator(cache_size=cache_size)
+    worker_calculator.variables = variables
+
+
+def evaluate_chunk(index: int, expressions: list):
+    """Evaluates a chunk of expressions in a worker process.
+
+    Args:
+        index (int): The position of the chunk in the input.
+        expressions (list): The expressions.
+
+    Returns:
+        tuple: The index of the chunk and the results as strings.
+    """
+    return index, evaluate_batch(worker_calculator, expressions)
+
+
+def evaluate_rows(program, columns: dict, output: tuple, start: int, end: int):
+    """Evaluates a program over a range of rows of columns in shared memory.
+
+    Args:
+        program (Program): The compiled program.
+        columns (dict): Variable name -> (shared memory name, number of rows).
+        output (tuple): The shared memory name and the number of rows of the results.
+        start (int): The first row of the range.
+        end (int): The end of the range (exclusive).
+
+    Returns:
+        dict: Row -> exception class, for the rows that failed.
+    """
+    blocks = []
+    try:
+        arrays = {}
+        for name, (block_name, rows) in columns.items():
+            block = shared_memory.SharedMemory(name=block_name)
+            blocks.append(block)
+            arrays[name] = np.ndarray((rows,), dtype=np.float64, buffer=block.buf)[start:end]
+        result = evaluate_many(program, arrays)
+        block = shared_memory.SharedMemory(name=output[0])
+        blocks.append(block)
+        values = np.ndarray((output[1],), dtype=np.float64, buffer=block.buf)
+        values[start:end] = result.values
+        del arrays, values
+        failed = np.flatnonzero(~result.ok)
+        return {start + int(row): result.errors[row] for row in failed}
+    finally:
+        for block in blocks:
+            block.close()
+
+
+def shared_block(size: int, blocks: list) -> shared_memory.SharedMemory:
+    """Creates a shared memory block.
+
+    Args:
+        size (int): The size in bytes. At least one byte is allocated.
+        blocks (list): The blocks created so far, which the new block is added to so that
+                       the caller can release all of them.
+
+    Returns:
+        SharedMemory: The block.
+    """
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    blocks.append(block)
+    return block
+
+
+def share_columns(arrays: dict, blocks: list) -> dict:
+    """Copies columns into shared memory.
+
+    Args:
+        arrays (dict): The variable names and their values as float arrays.
+        blocks (list): The blocks created so far, which the new blocks are added to.
+
+    Returns:
+        dict: Variable name -> (shared memory name, number of rows), as evaluate_rows
+              takes them.
+    """
+    shared = {}
+    for name, array in arrays.items():
+        block = shared_block(array.nbytes, blocks)
+        np.ndarray(array.shape, dtype=np.float64, buffer=block.buf)[:] = array
+        shared[name] = (block.name, len(array))
+    return shared
+
+
+class ParallelEvaluator:
+    """Spreads large batches of expressions over a pool of worker processes.
+
+    Attributes:
+        workers: The number of worker processes.
+        chunk_size: How many expressions or rows are sent to a worker at a time.
+        variables: The variables used by the expressions, as a VariableStore so that the
+                   workers evaluate expressions that read arrays like Calculator does.
+        cache_size: The size of the compiled expression cache of each worker.
+    """
+
+    def __init__(self, workers: int = None, chunk_size: int = 1000, variables=None,
+                 cache_size: int = 128):
+        """The constructor for the ParallelEvaluator class.
+
+        Args:
+            workers (int | None): The number of worker processes. Defaults to the CPU count.
+            chunk_size (int): The number of expressions or rows per chunk. Defaults to 1000.
+            variables (dict | None): The variables used by the expressions, numbers or arrays.
+            cache_size (int): The size of the compiled expression cache of each worker.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.variables = VariableStore(variables)
+        self.cache_size = cache_size
+
+    def executor(self) -> ProcessPoolExecutor:
+        """Creates the process pool.
+
+        Returns:
+            ProcessPoolExecutor: The pool, with a calculator in each worker.
+        """
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=start_worker,
+                                   initargs=(self.variables, self.cache_size))
+
+    def chunks(self, expressions):
+        """Splits the expressions into chunks without reading all of them at once.
+
+        Args:
+            expressions (iterable): The expressions.
+
+        Yields:
+            tuple: The index and the expressions of each chunk.
+        """
+        iterator = iter(expressions)
+        index = 0
+        while True:
+            chunk = list(islice(iterator, self.chunk_size))
+            if not chunk:
+                return
+            yield index, chunk
+            index += 1
+
+    def evaluate(self, expressions, ordered: bool = True):
+        """Evaluates expressions in the worker processes.
+
+        Only a few chunks per worker are in flight at a time, so the input can be a stream.
+
+        Args:
+            expressions (iterable): The expressions.
+            ordered (bool): If True the results come in input order, otherwise as soon as
+                            a chunk is done, each paired with the position of its expression.
+
+        Yields:
+            str | tuple: The result or the error message of each expression, or a tuple of
+                         the position and the result if ordered is False.
+        """
+        with self.executor() as executor:
+            chunks = self.chunks(expressions)
+            pending = set()
+            done_chunks = {}
+            next_index = 0
+            while True:
+                for index, chunk in islice(chunks, 2 * self.workers - len(pending)):
+                    pending.add(executor.submit(evaluate_chunk, index, chunk))
+                if not pending:
+                    return
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, results = future.result()
+                    if ordered:
+                        done_chunks[index] = results
+                    else:
+                        start = index * self.chunk_size
+                        yield from enumerate(results, start)
+                while next_index in done_chunks:
+                    yield from done_chunks.pop(next_index)
+                    next_index += 1
+
+    def evaluate_columns(self, program, columns: dict):
+        """Evaluates one program over many rows of variable values in the worker processes.
+
+        The columns and the results are kept in shared memory, so the workers only get the
+        names of the memory blocks and the range of rows to work on instead of the data.
+
+        Args:
+            program (Program): The compiled program.
+            columns (dict): The variable names and their values as arrays of equal length.
+
+        Raises:
+            ValueError: Raised when a column isn't a one-dimensional array or the columns
+                        have different lengths.
+
+        Returns:
+            tuple: The results as a float array (NaN for failed rows) and a dict of
+                   row -> exception class for the rows that failed.
+        """
+        # the compact form is sent to the workers as a few bytes instead of a list of tuples
+        program = program.compact()
+        rows = self.rows(columns)
+        arrays = {name: np.ascontiguousarray(value, dtype=np.float64)
+                  for name, value in columns.items()}
+        blocks = []
+        try:
+            shared = share_columns(arrays, blocks)
+            output = shared_block(rows * 8, blocks)
+            errors = {}
+            with self.executor() as executor:
+                futures = [executor.submit(evaluate_rows, program, shared, (output.name, rows),
+                                           start, end) for start, end in self.ranges(rows)]
+                for future in futures:
+                    errors.update(future.result())
+            values = np.ndarray((rows,), dtype=np.float64, buffer=output.buf).copy()
+            return values, errors
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    @staticmethod
+    def rows(columns: dict) -> int:
+        """Checks that the columns are arrays of the same length.
+
+        Args:
+            columns (dict): The variable names and their values.
+
+        Raises:
+            ValueError: Raised when a column isn't a one-dimensional array or the columns
+                        have different lengths.
+
+        Returns:
+            int: The number of rows, 1 if there are no columns.
+        """
+        for name, value in columns.items():
+            if np.ndim(value) != 1:
+                raise ValueError(f"column {name} isn't a one-dimensional array")
+        lengths = {len(value) for value in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("the columns have different lengths")
+        return lengths.pop() if lengths else 1
+
+    def ranges(self, rows: int):
+        """Splits rows into chunks.
+
+        Args:
+            rows (int): The number of rows.
+
+        Yields:
+            tuple: The first row and the end (exclusive) of each chunk.
+        """
+        for start in range(0, rows, self.chunk_size):
+            yield start, min(start + self.chunk_size, rows)
@@ -0,0 +1,390 @@
+import csv
+import os
+import re
+from contextlib import ExitStack
+from itertools import islice
+from time import perf_counter
+import numpy as np
+from optimizer import optimize
+from registry import functions
+from shunting_yard import ShuntingYard
+from vectorized import VectorEvaluator
+
+# how many rows are read and evaluated at a time
+DEFAULT_CHUNK_ROWS = 64 * 1024
+# the file name ending of a raw binary column: little-endian float64 values
+BINARY_SUFFIX = ".f64"
+BINARY_TYPE = np.dtype("<f8")
+
+# the stages that are timed
+stages = ("read", "evaluate", "write")
+
+
+def parse_formula(text: str) -> tuple:
+    """Splits a formula of the form 'name = expression'.
+
+    Args:
+        text (str): The formula.
+
+    Raises:
+        ValueError: Raised when the text isn't a formula or the name isn't valid.
+
+    Returns:
+        tuple: The name and the expression.
+    """
+    name, separator, expression = text.partition("=")
+    name = name.strip()
+    if not separator or not re.fullmatch("[a-z]+", name) or name in functions:
+        raise ValueError(f"invalid formula '{text}', expected 'name = expression' where the "
+                         "name consists of lowercase letters")
+    return name, expression.strip()
+
+
+class PipelineStats:
+    """Counts the rows and the time spent in each stage of a pipeline.
+
+    Attributes:
+        rows: The number of rows processed.
+        chunks: The number of chunks processed.
+        errors: A dict of formula name -> the number of rows where it failed.
+        seconds: A dict of stage -> the time spent in it.
+    """
+
+    def __init__(self):
+        """The constructor for the PipelineStats class."""
+        self.rows = 0
+        self.chunks = 0
+        self.errors = {}
+        self.seconds = dict.fromkeys(stages, 0.0)
+
+    def time(self, stage: str, seconds: float):
+        """Records time spent in a stage.
+
+        Args:
+            stage (str): read, evaluate or write.
+            seconds (float): The duration.
+        """
+        self.seconds[stage] += seconds
+
+    def stats(self) -> dict:
+        """Returns the counters and the throughput of each stage.
+
+        Returns:
+            dict: The statistics as plain dicts and numbers.
+        """
+        return {
+            "rows": self.rows,
+            "chunks": self.chunks,
+            "errors": dict(self.errors),
+            "stages": {stage: {"seconds": seconds,
+                               "rows_per_second": self.rows / seconds if seconds else None}
+                       for stage, seconds in self.seconds.items()}
+        }
+
+
+class Pipeline:
+    """Evaluates formulas over chunks of columns with VectorEvaluator.
+
+    Each formula is parsed and optimized once. A formula can use the input columns, the
+    scalar variables and the formulas before it, which it gets without rounding. A row
+    where a formula fails is also failed in the formulas that use its result.
+
+    Attributes:
+        formulas: A list of (name, program) pairs in evaluation order.
+        variables: The values of the scalar variables.
+        inputs: The input columns the formulas use.
+        stats: Where the rows, the errors and the stage times are counted.
+    """
+
+    def __init__(self, formulas: list, columns: list, variables=None, stats=None):
+        """The constructor for the Pipeline class.
+
+        Args:
+            formulas (list): The formulas as 'name = expression' strings or (name,
+                             expression) pairs.
+            columns (list): The names of the input columns.
+            variables (dict | None): Scalar variables. The columns hide variables with the
+                                     same name.
+            stats (PipelineStats | None): Where the statistics are counted. Defaults to a
+                                          new PipelineStats.
+
+        Raises:
+            ValueError: Raised when a formula is invalid or has the name of a column or of
+                        another formula.
+            InvalidInputError: Raised when an expression is not valid.
+            UnknownInputError: Raised when an expression uses an unknown name.
+        """
+        self.variables = {name: value for name, value in (variables or {}).items()
+                          if name not in columns}
+        self.stats = stats if stats is not None else PipelineStats()
+        names = {**dict.fromkeys(self.variables), **dict.fromkeys(columns)}
+        self.formulas = []
+        for formula in formulas:
+            name, expression = parse_formula(formula) if isinstance(formula, str) else formula
+            if name in columns or any(name == other for other, _ in self.formulas):
+                raise ValueError(f"the column {name} already exists")
+            self.formulas.append((name, optimize(ShuntingYard(expression, names).parse())))
+            self.stats.errors.setdefault(name, 0)
+            names[name] = None
+        self.inputs = [name for name in columns
+                       if any(name in program.names for _, program in self.formulas)]
+
+    def evaluate(self, chunk: dict, rows: int) -> dict:
+        """Evaluates every formula over a chunk of rows.
+
+        Args:
+            chunk (dict): The input columns the formulas use, as float arrays.
+            rows (int): The number of rows in the chunk.
+
+        Returns:
+            dict: The formula name -> (values, failed) pairs, where values are rounded like
+                  Evaluator.evaluate and failed is a boolean array of the failed rows. The
+                  rounding is only done here, the formulas use the exact values.
+        """
+        start = perf_counter()
+        columns = {**self.variables, **chunk}
+        failures = {}
+        results = {}
+        for name, program in self.formulas:
+            if rows == 0:
+                exact, failed = np.zeros(0), np.zeros(0, dtype=bool)
+            else:
+                evaluator = VectorEvaluator(program, columns)
+                exact = np.broadcast_to(evaluator.value(), (rows,))
+                failed = np.broadcast_to(evaluator.failed, (rows,)).copy()
+                for other in program.names & failures.keys():
+                    failed |= failures[other]
+            failures[name] = failed
+            columns[name] = exact
+            results[name] = (VectorEvaluator.round(exact), failed)
+            self.stats.errors[name] += int(np.count_nonzero(failed))
+        self.stats.rows += rows
+        self.stats.chunks += 1
+        self.stats.time("evaluate", perf_counter() - start)
+        return results
+
+
+def run_csv(formulas: list, source, output, variables=None, *,
+            chunk_rows: int = DEFAULT_CHUNK_ROWS, stats=None) -> PipelineStats:
+    """Appends computed columns to a CSV file, reading and writing it in chunks.
+
+    The first line of the input is the header. The output has the input columns as they
+    were and a column for each formula, empty in the rows where the formula failed.
+
+    Args:
+        formulas (list): The formulas, e.g. ["total = price*amount"].
+        source (TextIO): The input CSV file.
+        output (TextIO): Where the CSV with the computed columns is written.
+        variables (dict | None): Scalar variables the formulas can use.
+        chunk_rows (int): How many rows are held in memory at a time.
+        stats (PipelineStats | None): Where the statistics are counted.
+
+    Raises:
+        ValueError: Raised when a row has the wrong number of fields or a used column
+                    has a value that isn't a number.
+
+    Returns:
+        PipelineStats: The statistics.
+    """
+    reader = csv.reader(source)
+    writer = csv.writer(output, lineterminator="\n")
+    header = next(reader, [])
+    pipeline = Pipeline(formulas, header, variables, stats)
+    writer.writerow(header + [name for name, _ in pipeline.formulas])
+    for rows, chunk in csv_chunks(reader, header, pipeline, chunk_rows):
+        results = pipeline.evaluate(chunk, len(rows))
+        start = perf_counter()
+        writer.writerows(row + fields for row, fields in zip(rows, csv_fields(results)))
+        pipeline.stats.time("write", perf_counter() - start)
+    output.flush()
+    return pipeline.stats
+
+
+def csv_chunks(reader, header: list, pipeline: Pipeline, chunk_rows: int):
+    """Reads the rows of a CSV file in chunks and converts the used columns.
+
+    Args:
+        reader (csv.reader): The rows after the header.
+        header (list): The names of the columns.
+        pipeline (Pipeline): Tells the used columns and records the read time.
+        chunk_rows (int): How many rows are read at a time.
+
+    Yields:
+        tuple: The rows as lists of strings and the used columns as float arrays.
+    """
+    positions = {name: header.index(name) for name in pipeline.inputs}
+    line = 1
+    while True:
+        start = perf_counter()
+        rows = list(islice(reader, chunk_rows))
+        if not rows:
+            return
+        chunk = {name: column(rows, position, name, line) for name, position in positions.items()}
+        pipeline.stats.time("read", perf_counter() - start)
+        yield rows, chunk
+        line += len(rows)
+
+
+def csv_fields(results: dict) -> list:
+    """Formats the computed values of a chunk as CSV fields.
+
+    Args:
+        results (dict): The results of Pipeline.evaluate.
+
+    Returns:
+        list: The fields of each row, empty where a formula failed.
+    """
+    columns = [["" if failed else str(value) for value, failed
+                in zip(values.tolist(), failed.tolist())]
+               for values, failed in results.values()]
+    return [list(fields) for fields in zip(*columns)]
+
+
+def column(rows: list, position: int, name: str, line: int):
+    """Converts a field of every row into a float array.
+
+    Args:
+        rows (list): The rows as lists of strings.
+        position (int): The index of the field.
+        name (str): The name of the column, for the error message.
+        line (int): The line number of the row before the first one.
+
+    Raises:
+        ValueError: Raised when a row has too few fields or a value isn't a number.
+
+    Returns:
+        ndarray: The values.
+    """
+    try:
+        return np.array([row[position] for row in rows], dtype=np.float64)
+    except (IndexError, ValueError):
+        for number, row in enumerate(rows, start=line + 1):
+            if position >= len(row):
+                raise ValueError(f"line {number}: the row has no {name} column") from None
+            try:
+                float(row[position])
+            except ValueError:
+                raise ValueError(
+                    f"line {number}: {name} is not a number: '{row[position]}'") from None
+        raise
+
+
+def open_columns(directory: str, names: list) -> dict:
+    """Memory-maps the raw binary columns of a directory.
+
+    Args:
+        directory (str): The directory.
+        names (list): The columns to open.
+
+    Raises:
+        ValueError: Raised when the columns have different lengths or a file isn't a
+                    whole number of values.
+
+    Returns:
+        dict: The column name -> the values as a read-only array.
+    """
+    columns = {}
+    for name in names:
+        path = os.path.join(directory, name + BINARY_SUFFIX)
+        size = os.path.getsize(path)
+        if size % BINARY_TYPE.itemsize:
+            raise ValueError(f"{path}: the size isn't a multiple of {BINARY_TYPE.itemsize}")
+        columns[name] = (np.memmap(path, dtype=BINARY_TYPE, mode="r") if size
+                         else np.zeros(0, dtype=BINARY_TYPE))
+    if len({len(values) for values in columns.values()}) > 1:
+        raise ValueError(f"the columns in {directory} have different lengths")
+    return columns
+
+
+def binary_chunks(columns: dict, pipeline: Pipeline, chunk_rows: int):
+    """Reads the used columns of memory-mapped files in chunks.
+
+    Args:
+        columns (dict): The memory-mapped columns, all of the same length.
+        pipeline (Pipeline): Tells the used columns and records the read time.
+        chunk_rows (int): How many rows are read at a time.
+
+    Yields:
+        tuple: The used columns of the chunk as float arrays and the number of rows.
+    """
+    length = min((len(values) for values in columns.values()), default=0)
+    for start in range(0, length, chunk_rows):
+        begin = perf_counter()
+        chunk = {name: np.asarray(columns[name][start:start + chunk_rows], dtype=np.float64)
+                 for name in pipeline.inputs}
+        pipeline.stats.time("read", perf_counter() - begin)
+        yield chunk, min(chunk_rows, length - start)
+
+
+def run_binary(formulas: list, source: str, destination: str, variables=None, *,
+               chunk_rows: int = DEFAULT_CHUNK_ROWS, stats=None) -> PipelineStats:
+    """Writes computed columns for a directory of raw binary columns.
+
+    Each column of the input is a file named <column>.f64 with little-endian float64
+    values. The input files are memory-mapped, and a file <formula>.f64 is written to the
+    destination for each formula, with NaN in the rows where the formula failed. The
+    destination can be the source directory, which appends the columns to it.
+
+    Args:
+        formulas (list): The formulas, e.g. ["total = price*amount"].
+        source (str): The directory of the input columns.
+        destination (str): The directory where the computed columns are written.
+        variables (dict | None): Scalar variables the formulas can use.
+        chunk_rows (int): How many rows are evaluated at a time.
+        stats (PipelineStats | None): Where the statistics are counted.
+
+    Returns:
+        PipelineStats: The statistics.
+    """
+    names = sorted(entry[:-len(BINARY_SUFFIX)] for entry in os.listdir(source)
+                   if entry.endswith(BINARY_SUFFIX))
+    pipeline = Pipeline(formulas, names, variables, stats)
+    columns = open_columns(source, names)
+    os.makedirs(destination, exist_ok=True)
+    with ExitStack() as files:
+        outputs = {name: files.enter_context(open(os.path.join(destination, name + BINARY_SUFFIX),
+                                                  "wb"))
+                   for name, _ in pipeline.formulas}
+        for chunk, rows in binary_chunks(columns, pipeline, chunk_rows):
+            write_binary(outputs, pipeline.evaluate(chunk, rows), pipeline.stats)
+    return pipeline.stats
+
+
+def write_binary(outputs: dict, results: dict, stats: PipelineStats):
+    """Appends the computed values of a chunk to the column files.
+
+    Args:
+        outputs (dict): The formula name -> the binary file of its column.
+        results (dict): The results of Pipeline.evaluate.
+        stats (PipelineStats): Where the write time is recorded.
+    """
+    start = perf_counter()
+    for name, (values, failed) in results.items():
+        outputs[name].write(np.where(failed, np.nan, values).astype(BINARY_TYPE).tobytes())
+    stats.time("write", perf_counter() - start)
+
+
+def run_pipeline(formulas: list, source: str, destination: str, variables=None,
+                 chunk_rows: int = DEFAULT_CHUNK_ROWS) -> PipelineStats:
+    """Evaluates formulas over a data file and writes the computed columns.
+
+    A directory is read as raw binary columns with run_binary, anything else as CSV with
+    run_csv. For CSV, - means stdin or stdout.
+
+    Args:
+        formulas (list): The formulas, e.g. ["total = price*amount"].
+        source (str): The input file or directory.
+        destination (str): The output file or directory.
+        variables (dict | None): Scalar variables the formulas can use.
+        chunk_rows (int): How many rows are held in memory at a time.
+
+    Returns:
+        PipelineStats: The statistics.
+    """
+    if os.path.isdir(source):
+        return run_binary(formulas, source, destination, variables, chunk_rows=chunk_rows)
+    with (open(source, encoding="utf-8", newline="") if source != "-"
+          else open(0, encoding="utf-8", newline="", closefd=False)) as stream, \
+            (open(destination, "w", encoding="utf-8", newline="") if destination != "-"
+             else open(1, "w", encoding="utf-8", newline="", closefd=False)) as output:
+        return run_csv(formulas, stream, output, variables, chunk_rows=chunk_rows)
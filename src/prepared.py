@@ -0,0 +1,156 @@
+from autodiff import gradient as differentiate
+from lexer import IDENTIFIER, LEFT, Lexer
+from program import to_number
+from registry import functions
+from shunting_yard import ShuntingYard
+from evaluator import Evaluator
+from compiler import compile_program
+from graph import share_subexpressions
+from optimizer import optimize as optimize_program
+
+
+def free_variables(expression: str) -> list:
+    """Returns the names an expression reads as variables.
+
+    A name that is followed by "(" or is the name of a function isn't a variable, so
+    "ln+1" has no variables and fails to parse like it does in the calculator.
+
+    Args:
+        expression (str): The expression in infix notation.
+
+    Raises:
+        InvalidInputError: Raised when the expression has a character that isn't valid.
+
+    Returns:
+        list: The distinct names in the order they appear.
+    """
+    tokens = list(Lexer(expression.replace(" ", "")))
+    return list(dict.fromkeys(token.text for token, following in zip(tokens, tokens[1:] + [None])
+                              if token.kind == IDENTIFIER and token.text not in functions
+                              and (following is None or following.kind != LEFT)))
+
+
+class PreparedExpression:
+    """An expression that is parsed once and can be evaluated many times.
+
+    The variables are kept as references in the compiled program, so the expression
+    can be evaluated again with new values without running the parser again.
+
+    Attributes:
+        expression: The original expression in infix notation.
+        program: The compiled program in reverse Polish notation.
+        defaults: Default values for the variables, as numbers.
+        compiled: The program compiled into a Python function, or None to use Evaluator.
+    """
+
+    def __init__(self, expression: str, variables=None, compiled: bool = True,
+                 optimize: bool = True, *, strict: bool = False):
+        """The constructor for the PreparedExpression class.
+
+        Args:
+            expression (str): The expression in infix notation.
+            variables (dict | iterable | None): The names the expression may use. If a dict
+                                                is given, its values are used as defaults.
+                                                Defaults to the names the expression reads,
+                                                so that a misspelled name becomes a variable.
+            compiled (bool): Whether to compile the program into a Python function.
+                             Defaults to True.
+            optimize (bool): Whether to simplify the program with Optimizer and compute
+                             repeated subexpressions once. Defaults to True.
+            strict (bool): Whether the names have to be given, so that every name the
+                           expression uses that isn't given is reported. Defaults to False.
+
+        Raises:
+            ValueError: Raised when a name is the name of a function, or strict is True and
+                        no names are given.
+            UnknownInputError: Raised when the expression uses a name that isn't given.
+            InvalidInputError: Raised when the expression is not valid.
+        """
+        self.expression = expression
+        if variables is None:
+            if strict:
+                raise ValueError("the names of the variables must be given")
+            variables = free_variables(expression)
+        if not hasattr(variables, "items"):
+            variables = dict.fromkeys(variables)
+        for name in variables:
+            if name in functions:
+                raise ValueError(f"{name} is a function and can't be a variable")
+        self.defaults = {name: to_number(value) if isinstance(value, str) else value
+                         for name, value in variables.items() if value is not None}
+        self.program = ShuntingYard(expression, variables).parse()
+        if optimize:
+            self.program = share_subexpressions(optimize_program(self.program))
+        self.compiled = compile_program(self.program) if compiled else None
+
+    @property
+    def names(self) -> set:
+        """The names of the variables the expression uses."""
+        return self.program.names
+
+    def evaluate(self, **bindings) -> float:
+        """Evaluates the expression with the given variable values.
+
+        Args:
+            bindings: Values for the variables. These override the defaults.
+
+        Raises:
+            UnknownInputError: Raised when a variable used by the expression has no value.
+
+        Returns:
+            float: The result, rounded to three decimals.
+        """
+        if self.defaults:
+            bindings = {**self.defaults, **bindings}
+        if self.compiled is not None:
+            return self.compiled(bindings)
+        return Evaluator(self.program, bindings).evaluate()
+
+    def gradient(self, wrt=None, **bindings) -> tuple:
+        """Calculates the value and the partial derivatives with the given variable values.
+
+        Example: prepare("x*y", ("x", "y")).gradient(x=2, y=3) -> (6.0, {"x": 3.0, "y": 2.0})
+
+        Args:
+            wrt (iterable | None): The variables to differentiate with respect to.
+                                   Defaults to every variable of the expression.
+            bindings: Values for the variables. These override the defaults.
+
+        Raises:
+            UnknownInputError: Raised when a variable used by the expression has no value.
+            ValueError: Raised when the expression calls a function without a derivative.
+
+        Returns:
+            tuple: The value, not rounded, and a dict of variable name -> partial derivative.
+        """
+        if self.defaults:
+            bindings = {**self.defaults, **bindings}
+        return differentiate(self.program, bindings, wrt)
+
+    def __str__(self):
+        return str(self.program)
+
+
+def prepare(expression: str, variables=None, compiled: bool = True,
+            optimize: bool = True, *, strict: bool = False) -> PreparedExpression:
+    """Parses an expression once so that it can be evaluated with different values.
+
+    Example: prepare("a*x^2+b*x+c").evaluate(a=1, b=2, c=3, x=4)
+
+    Without the names every name the expression reads is a variable, so a misspelled name
+    is only reported when it has no value at evaluation. Give the names, or use strict, to
+    have it reported here.
+
+    Args:
+        expression (str): The expression in infix notation.
+        variables (dict | iterable | None): The names the expression may use, or a dict
+                                            of names and default values. Defaults to the
+                                            names the expression reads.
+        compiled (bool): Whether to compile the program into a Python function.
+        optimize (bool): Whether to simplify the program first.
+        strict (bool): Whether the names have to be given.
+
+    Returns:
+        PreparedExpression: The prepared expression.
+    """
+    return PreparedExpression(expression, variables, compiled, optimize, strict=strict)
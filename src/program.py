@@ -0,0 +1,512 @@
+import struct
+import sys
+from array import array
+from registry import functions, lookup, operators
+
+NUMBER = 0
+OPERATOR = 1
+FUNCTION = 2
+VARIABLE = 3
+# keeps a copy of the value on top of the stack in a slot, for common subexpressions
+STORE = 4
+# pushes the value of a slot
+RECALL = 5
+
+
+def to_number(text: str):
+    """Converts a numeric string into an int or a float.
+
+    Args:
+        text (str): The number as a string.
+
+    Raises:
+        ValueError: Raised when the string is not a number.
+
+    Returns:
+        int | float: An int if the string is an integer, otherwise a float.
+    """
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+class Program:
+    """A compiled expression in reverse Polish notation.
+
+    The program is a list of typed instructions, so that the evaluator doesn't have to
+    parse any text. Numbers have already been converted when the program is built.
+
+    Variables are kept as symbolic references and are only looked up when the program
+    is evaluated, so the same program can be evaluated with different variable values.
+
+    Attributes:
+        instructions: A list of (opcode, value) tuples. The value is a number for NUMBER,
+                      the slot number for STORE and RECALL, and the name of the operator,
+                      function or variable for the others.
+        names: The set of variable names the program refers to.
+    """
+
+    __slots__ = ("instructions", "names")
+
+    def __init__(self, instructions=None):
+        """The constructor for the Program class.
+
+        Args:
+            instructions (list | None): The instructions of the program. Defaults to empty.
+        """
+        self.instructions = instructions if instructions is not None else []
+        self.names = {value for opcode, value in self.instructions if opcode == VARIABLE}
+
+    @classmethod
+    def from_string(cls, rpn: str):
+        """Builds a program out of an expression in reverse Polish notation.
+
+        Args:
+            rpn (str): The tokens of the expression separated by spaces. A slot is
+                       stored with '=slot' and recalled with '@slot'.
+
+        Returns:
+            Program: The compiled program.
+        """
+        program = cls()
+        for token in rpn.split(" "):
+            if token in operators:
+                program.operator(token)
+            elif token in functions:
+                program.function(token)
+            elif token[0] == "=":
+                program.store(int(token[1:]))
+            elif token[0] == "@":
+                program.recall(int(token[1:]))
+            elif token[0].isalpha():
+                program.variable(token)
+            else:
+                program.number(to_number(token))
+        return program
+
+    def number(self, value):
+        """Adds a number to the program.
+
+        Args:
+            value (int | float): The number.
+        """
+        self.instructions.append((NUMBER, value))
+
+    def operator(self, name: str):
+        """Adds an operator to the program.
+
+        Args:
+            name (str): The operator.
+        """
+        self.instructions.append((OPERATOR, name))
+
+    def function(self, name: str):
+        """Adds a function call to the program.
+
+        Args:
+            name (str): The name of the function.
+        """
+        self.instructions.append((FUNCTION, name))
+
+    def variable(self, name: str):
+        """Adds a reference to a variable to the program.
+
+        Args:
+            name (str): The name of the variable.
+        """
+        self.instructions.append((VARIABLE, name))
+        self.names.add(name)
+
+    def store(self, slot: int):
+        """Adds an instruction that keeps the value on top of the stack in a slot.
+
+        Args:
+            slot (int): The number of the slot.
+        """
+        self.instructions.append((STORE, slot))
+
+    def recall(self, slot: int):
+        """Adds an instruction that pushes the value of a slot.
+
+        Args:
+            slot (int): The number of the slot.
+        """
+        self.instructions.append((RECALL, slot))
+
+    def compact(self):
+        """Returns the compact form of the program, for evaluating and serializing.
+
+        Returns:
+            CompactProgram: The program in arrays.
+        """
+        return CompactProgram(self)
+
+    def __iter__(self):
+        return iter(self.instructions)
+
+    def __len__(self):
+        return len(self.instructions)
+
+    def __eq__(self, other):
+        if isinstance(other, (Program, CompactProgram)):
+            return self.instructions == other.instructions
+        return NotImplemented
+
+    def __str__(self):
+        prefixes = {STORE: "=", RECALL: "@"}
+        return " ".join(prefixes.get(opcode, "") + str(value)
+                        for opcode, value in self.instructions)
+
+    def __repr__(self):
+        return f"Program({str(self)!r})"
+
+
+# the first bytes of a serialized program and the version of the format
+MAGIC = b"RPN"
+VERSION = 1
+header = struct.Struct("<3sBIIIIII")
+
+
+class CompactProgram:
+    """A program stored in arrays, with the stack depth it needs computed beforehand.
+
+    The opcodes are in a byte array and the argument of each instruction in an unsigned
+    int array. The argument is an index: into the constant pool for NUMBER, into the
+    variable table for VARIABLE, into the symbol table for OPERATOR and FUNCTION, and the
+    slot number for STORE and RECALL. Evaluator runs it with a preallocated stack.
+
+    It can be used wherever a Program is read, since iterating it gives the same
+    (opcode, value) pairs.
+
+    Attributes:
+        opcodes: The opcode of each instruction.
+        arguments: The argument of each instruction.
+        constants: The constant pool, each distinct number once.
+        variables: The variable table, each distinct variable name once.
+        symbols: The operators and functions the program calls.
+        names: The set of variable names the program refers to.
+        max_depth: The largest number of operands on the stack during evaluation.
+        slots: The number of slots used by STORE and RECALL.
+    """
+
+    __slots__ = ("opcodes", "arguments", "constants", "variables", "symbols", "names",
+                 "max_depth", "slots")
+
+    def __init__(self, program=None):
+        """The constructor for the CompactProgram class.
+
+        Args:
+            program (Program | None): The program to pack. Defaults to an empty program.
+        """
+        self.opcodes = array("B")
+        self.arguments = array("I")
+        self.constants = []
+        self.variables = []
+        self.symbols = []
+        self.max_depth = 0
+        self.slots = 0
+        tables = {NUMBER: {}, VARIABLE: {}, OPERATOR: {}}
+        pools = {NUMBER: self.constants, VARIABLE: self.variables, OPERATOR: self.symbols}
+        depth = 0
+        for opcode, value in program if program is not None else ():
+            if opcode in (STORE, RECALL):
+                argument = value
+                self.slots = max(self.slots, value + 1)
+            else:
+                pool = OPERATOR if opcode == FUNCTION else opcode
+                # repr() keeps 1, 1.0 and -0.0 apart
+                key = repr(value) if opcode == NUMBER else value
+                argument = tables[pool].get(key)
+                if argument is None:
+                    argument = tables[pool][key] = len(pools[pool])
+                    pools[pool].append(value)
+            if opcode in (NUMBER, VARIABLE, RECALL):
+                depth += 1
+                self.max_depth = max(self.max_depth, depth)
+            elif opcode in (OPERATOR, FUNCTION):
+                depth -= lookup(value).arity - 1
+            self.opcodes.append(opcode)
+            self.arguments.append(argument)
+        self.names = frozenset(self.variables)
+
+    def to_bytes(self) -> bytes:
+        """Serializes the program.
+
+        Returns:
+            bytes: The program in a portable format.
+        """
+        arguments = array("I", self.arguments)
+        if sys.byteorder == "big":
+            arguments.byteswap()
+        parts = [header.pack(MAGIC, VERSION, len(self.opcodes), len(self.constants),
+                             len(self.variables), len(self.symbols), self.max_depth,
+                             self.slots),
+                 self.opcodes.tobytes(), arguments.tobytes()]
+        for value in self.constants:
+            if isinstance(value, float):
+                parts.append(b"f" + struct.pack("<d", value))
+            else:
+                digits = str(value).encode("ascii")
+                parts.append(b"i" + struct.pack("<I", len(digits)) + digits)
+        for text in self.variables + self.symbols:
+            data = text.encode("utf-8")
+            parts.append(struct.pack("<H", len(data)) + data)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        """Reads a program serialized with to_bytes.
+
+        Args:
+            data (bytes): The serialized program.
+
+        Raises:
+            ValueError: Raised when the data is not a valid program.
+
+        Returns:
+            CompactProgram: The program.
+        """
+        try:
+            length, constants, variables, symbols, max_depth, slots = cls.read_header(data)
+            program = cls()
+            offset = header.size
+            program.opcodes.frombytes(data[offset:offset + length])
+            offset += length
+            program.arguments.frombytes(data[offset:offset + 4 * length])
+            offset += 4 * length
+            if sys.byteorder == "big":
+                program.arguments.byteswap()
+            strings, offset = program.read_pools(data, offset, constants, variables + symbols)
+        except (struct.error, UnicodeDecodeError) as error:
+            raise ValueError("truncated or corrupt program") from error
+        if (len(program.opcodes) != length or len(program.arguments) != length
+                or offset != len(data)):
+            raise ValueError("truncated or corrupt program")
+        program.variables = strings[:variables]
+        program.symbols = strings[variables:]
+        program.names = frozenset(program.variables)
+        program.slots = slots
+        if program.check() != max_depth:
+            raise ValueError("corrupt program")
+        return program
+
+    @staticmethod
+    def read_header(data: bytes) -> tuple:
+        """Reads the header of a serialized program.
+
+        Args:
+            data (bytes): The serialized program.
+
+        Raises:
+            ValueError: Raised when the data isn't a program of this version.
+            struct.error: Raised when the data is shorter than the header.
+
+        Returns:
+            tuple: The number of instructions, constants, variables and symbols, the
+                   maximum stack depth and the number of slots.
+        """
+        magic, version, *sizes = header.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a compiled program of this version")
+        return tuple(sizes)
+
+    def read_pools(self, data: bytes, offset: int, constants: int, strings: int) -> tuple:
+        """Reads the constant pool into the program and the names after it.
+
+        Args:
+            data (bytes): The serialized program.
+            offset (int): Where the constant pool starts.
+            constants (int): The number of constants.
+            strings (int): The number of variable and symbol names.
+
+        Raises:
+            struct.error: Raised when the data ends too early.
+            UnicodeDecodeError: Raised when a name isn't valid UTF-8.
+
+        Returns:
+            tuple: The names and the offset after them.
+        """
+        for _ in range(constants):
+            value, offset = self.read_constant(data, offset)
+            self.constants.append(value)
+        names = []
+        for _ in range(strings):
+            size = struct.unpack_from("<H", data, offset)[0]
+            names.append(data[offset + 2:offset + 2 + size].decode("utf-8"))
+            offset += 2 + size
+        return names, offset
+
+    @staticmethod
+    def read_constant(data: bytes, offset: int) -> tuple:
+        """Reads one number of the constant pool.
+
+        Args:
+            data (bytes): The serialized program.
+            offset (int): Where the number starts.
+
+        Raises:
+            ValueError: Raised when the number is not valid.
+
+        Returns:
+            tuple: The number and the offset after it.
+        """
+        tag = data[offset:offset + 1]
+        if tag == b"f":
+            return struct.unpack_from("<d", data, offset + 1)[0], offset + 9
+        if tag == b"i":
+            size = struct.unpack_from("<I", data, offset + 1)[0]
+            return int(data[offset + 5:offset + 5 + size]), offset + 5 + size
+        raise ValueError("unknown constant type")
+
+    def check(self) -> int:
+        """Checks that every argument is in range and that the stack never runs out.
+
+        Raises:
+            ValueError: Raised when the program is not valid or calls an operator or a
+                        function that isn't registered.
+
+        Returns:
+            int: The largest number of operands on the stack during evaluation.
+        """
+        sizes = {NUMBER: len(self.constants), VARIABLE: len(self.variables),
+                 OPERATOR: len(self.symbols), FUNCTION: len(self.symbols),
+                 STORE: self.slots, RECALL: self.slots}
+        depth = 0
+        deepest = 0
+        for opcode, argument in zip(self.opcodes, self.arguments):
+            if opcode not in sizes or argument >= sizes[opcode]:
+                raise ValueError("corrupt program")
+            if opcode in (NUMBER, VARIABLE, RECALL):
+                depth += 1
+                deepest = max(deepest, depth)
+                continue
+            if opcode == STORE:
+                operands = 1
+            else:
+                name = self.symbols[argument]
+                operation = (operators if opcode == OPERATOR else functions).get(name)
+                if operation is None:
+                    raise ValueError(f"unknown operation {name}")
+                operands = operation.arity
+            if depth < operands:
+                raise ValueError("corrupt program")
+            if opcode != STORE:
+                depth -= operands - 1
+        if depth != 1:
+            raise ValueError("corrupt program")
+        self.max_depth = deepest
+        return deepest
+
+    def value(self, index: int):
+        """Returns the value of an instruction in the form Program uses.
+
+        Args:
+            index (int): The position of the instruction.
+
+        Returns:
+            The number, name or slot number of the instruction.
+        """
+        opcode = self.opcodes[index]
+        argument = self.arguments[index]
+        if opcode == NUMBER:
+            return self.constants[argument]
+        if opcode == VARIABLE:
+            return self.variables[argument]
+        if opcode in (OPERATOR, FUNCTION):
+            return self.symbols[argument]
+        return argument
+
+    def compact(self):
+        """Returns the program itself, so both program types can be made compact.
+
+        Returns:
+            CompactProgram: This program.
+        """
+        return self
+
+    @property
+    def instructions(self) -> list:
+        """The instructions as (opcode, value) pairs, like Program.instructions."""
+        return list(self)
+
+    def __reduce__(self):
+        return (self.from_bytes, (self.to_bytes(),))
+
+    def __iter__(self):
+        for index, opcode in enumerate(self.opcodes):
+            yield opcode, self.value(index)
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def __eq__(self, other):
+        if isinstance(other, (Program, CompactProgram)):
+            return self.instructions == other.instructions
+        return NotImplemented
+
+    def __str__(self):
+        return str(Program(self.instructions))
+
+    def __repr__(self):
+        return f"CompactProgram({str(self)!r})"
+
+
+class StackMachineMixin:
+    """Runs the instructions of a program on an operand stack.
+
+    The evaluators and the compiler only differ in what an operand is: a number, an array
+    of rows or an AST node. A subclass has an operands list and defines number, variable,
+    function and calculate, which return the operand of an instruction. By default the
+    operands of common subexpressions are kept in a slots dict.
+    """
+
+    __slots__ = ()
+
+    def execute(self, program) -> object:
+        """Runs every instruction of a program.
+
+        Args:
+            program (Program | CompactProgram): The program.
+
+        Returns:
+            object: The operand the program leaves on the stack.
+        """
+        for opcode, value in program:
+            if opcode == NUMBER:
+                self.operands.append(self.number(value))
+            elif opcode == VARIABLE:
+                self.operands.append(self.variable(value))
+            elif opcode == FUNCTION:
+                arity = functions[value].arity
+                args = self.operands[len(self.operands) - arity:]
+                del self.operands[len(self.operands) - arity:]
+                self.operands.append(self.function(value, *args))
+            elif opcode == OPERATOR:
+                second = self.operands.pop()
+                first = self.operands.pop()
+                self.operands.append(self.calculate(value, first, second))
+            elif opcode == STORE:
+                self.store(value)
+            else:  # opcode == RECALL
+                self.operands.append(self.recall(value))
+        return self.operands.pop()
+
+    def store(self, slot: int):
+        """Keeps a copy of the operand on top of the stack in a slot.
+
+        Args:
+            slot (int): The slot number.
+        """
+        self.slots[slot] = self.operands[-1]
+
+    def recall(self, slot: int):
+        """Returns the operand kept in a slot.
+
+        Args:
+            slot (int): The slot number.
+
+        Returns:
+            object: The operand.
+        """
+        return self.slots[slot]
@@ -0,0 +1,245 @@
+import re
+from math import atan2, cos, exp, isinf, log, sin, sqrt, tan
+from operator import add, mul, pow, sub, truediv  # pylint: disable=redefined-builtin
+
+# the function names the lexer reads, so every registered function can be parsed
+name_pattern = re.compile(r"[a-z]+[0-9]*")
+
+
+def square(x):
+    """Calculates x^2 with one multiplication, raising the same errors as x ** 2.
+
+    Args:
+        x (int | float): The input.
+
+    Raises:
+        OverflowError: Raised when the result of a finite float is too large.
+
+    Returns:
+        int | float: The square.
+    """
+    result = x * x
+    if isinstance(result, float) and isinf(result) and not isinf(x):
+        raise OverflowError("Numerical result out of range")
+    return result
+
+
+def root(x):
+    """Calculates x^0.5 with sqrt() where that gives the same result.
+
+    Negative numbers are left to the power operator, which gives a complex number
+    (and then a TypeError in float()) instead of the ValueError of sqrt().
+
+    Args:
+        x (int | float): The input.
+
+    Returns:
+        int | float | complex: The square root.
+    """
+    if x < 0:
+        return x ** 0.5
+    return sqrt(x)
+
+
+def aggregate(x):
+    """Calculates the sum, mean, minimum or maximum of a single number, which is the number.
+
+    The evaluators that work on arrays reduce an array variable instead.
+
+    Args:
+        x (int | float): The input.
+
+    Returns:
+        int | float: The input.
+    """
+    return x
+
+
+class Operation:
+    """An operator or a function that expressions can use.
+
+    Attributes:
+        name: The operator symbol or the name of the function.
+        arity: The number of operands it takes.
+        implementation: Calculates the result from the operands. The evaluators wrap the
+                        result in float().
+        precedence: How tightly an operator binds. None for functions.
+        associativity: "Left" or "Right" for operators, None for functions.
+    """
+
+    __slots__ = ("name", "arity", "implementation", "precedence", "associativity")
+
+    def __init__(self, name: str, arity: int, implementation, precedence: int = None,
+                 associativity: str = None):
+        """The constructor for the Operation class.
+
+        Args:
+            name (str): The operator symbol or the name of the function.
+            arity (int): The number of operands.
+            implementation (callable): Calculates the result.
+            precedence (int | None): The precedence of an operator.
+            associativity (str | None): "Left" or "Right" for an operator.
+        """
+        self.name = name
+        self.arity = arity
+        self.implementation = implementation
+        self.precedence = precedence
+        self.associativity = associativity
+
+    def __repr__(self):
+        return f"Operation({self.name!r}, {self.arity})"
+
+
+# the binary operators by symbol
+operators = {
+    "+": Operation("+", 2, add, 2, "Left"),
+    "-": Operation("-", 2, sub, 2, "Left"),
+    "*": Operation("*", 2, mul, 3, "Left"),
+    "/": Operation("/", 2, truediv, 3, "Left"),
+    "^": Operation("^", 2, pow, 4, "Right")
+}
+
+# the functions by name. Names starting with "_" are the functions the optimizer adds and
+# the overloads below, which can't be written in an expression. sum, mean, dot and norm
+# reduce arrays, and on numbers they are the number, the product and the absolute value.
+functions = {operation.name: operation for operation in (
+    Operation("abs", 1, abs),
+    Operation("atan2", 2, atan2),
+    Operation("cos", 1, cos),
+    Operation("dot", 2, mul),
+    Operation("exp", 1, exp),
+    Operation("lb", 1, lambda x: log(x, 2)),
+    Operation("lg", 1, lambda x: log(x, 10)),
+    Operation("ln", 1, log),
+    Operation("log", 2, log),
+    Operation("max", 2, max),
+    Operation("mean", 1, aggregate),
+    Operation("min", 2, min),
+    Operation("norm", 1, abs),
+    Operation("sin", 1, sin),
+    Operation("sqrt", 1, sqrt),
+    Operation("sum", 1, aggregate),
+    Operation("tan", 1, tan),
+    Operation("_square", 1, square),
+    Operation("_sqrt", 1, root),
+    Operation("_min", 1, aggregate),
+    Operation("_max", 1, aggregate),
+    Operation("_float", 1, aggregate)
+)}
+
+# the functions that come with the calculator, which can't be unregistered
+builtin_functions = frozenset(functions)
+
+# how many times a function has been registered or unregistered
+_generation = 0  # pylint: disable=invalid-name
+
+# the function a call means when it has another number of arguments than the function of
+# its name: min(a, b) is the smaller number, min(x) the smallest element of an array
+overloads = {
+    ("min", 1): functions["_min"],
+    ("max", 1): functions["_max"]
+}
+
+# the functions of two arguments that also take more, as nested calls from the right:
+# min(a, b, c) is min(a, min(b, c))
+variadic = {"min", "max"}
+
+
+def lookup(name: str) -> Operation:
+    """Returns the operator or the function of a name.
+
+    Args:
+        name (str): The operator symbol or the name of the function.
+
+    Raises:
+        KeyError: Raised when nothing is registered with the name.
+
+    Returns:
+        Operation: The operation.
+    """
+    operation = operators.get(name)
+    if operation is None:
+        operation = functions[name]
+    return operation
+
+
+def generation() -> int:
+    """Returns how many times a function has been registered or unregistered.
+
+    The caches make it part of their keys, so that programs with calls of the old
+    functions folded into constants, and results calculated with them, aren't used after
+    a change.
+
+    Returns:
+        int: The number of changes.
+    """
+    return _generation
+
+
+def register_function(name: str, implementation, arity: int = 1, variables=()) -> Operation:
+    """Adds a function that expressions can call, e.g. hypot(x, y).
+
+    The function is used by every evaluator: Evaluator and the compiler call it for one
+    value at a time, and VectorEvaluator calls it for each row. Calls on numbers are
+    calculated by the optimizer before evaluation, so the implementation must only depend
+    on its arguments.
+
+    Args:
+        name (str): The name, lowercase letters, optionally followed by digits.
+        implementation (callable): Calculates the result from the arguments.
+        arity (int): The number of arguments. Defaults to 1.
+        variables (dict): Variables the name must not clash with, e.g. the variables of a
+                          calculator. Defaults to none.
+
+    Raises:
+        ValueError: Raised when the name is not valid or already in use, or the arity is
+                    less than one.
+
+    Returns:
+        Operation: The registered function.
+    """
+    if not name_pattern.fullmatch(name):
+        raise ValueError(f"invalid function name '{name}'")
+    if name in functions:
+        raise ValueError(f"function {name} is already defined")
+    if name in variables:
+        raise ValueError(f"{name} is already a variable")
+    if arity < 1:
+        raise ValueError("a function must take at least one argument")
+    global _generation  # pylint: disable=global-statement,invalid-name
+    _generation += 1
+    operation = functions[name] = Operation(name, arity, implementation)
+    return operation
+
+
+def unregister_function(name: str):
+    """Removes a function added with register_function.
+
+    The cached programs and results that may depend on the function aren't used after
+    this, see generation().
+
+    Args:
+        name (str): The name of the function.
+
+    Raises:
+        ValueError: Raised when the function is built in.
+        KeyError: Raised when there is no such function.
+    """
+    if name in builtin_functions:
+        raise ValueError(f"function {name} is built in")
+    del functions[name]
+    global _generation  # pylint: disable=global-statement,invalid-name
+    _generation += 1
+
+
+def public_functions(arity: int = None) -> list:
+    """Returns the names of the functions that can be written in an expression.
+
+    Args:
+        arity (int | None): Only the functions with this many arguments. Defaults to all.
+
+    Returns:
+        list: The names in alphabetical order.
+    """
+    return sorted(name for name, operation in functions.items()
+                  if not name.startswith("_") and arity in (None, operation.arity))
@@ -0,0 +1,152 @@
+import sys
+from collections import OrderedDict
+from cache import ExpressionCache
+from lexer import IDENTIFIER, Lexer
+
+
+class ResultCache:
+    """A size-bounded cache of the results of expressions with LRU eviction.
+
+    An entry is keyed by the normalized expression and remembers the version of each name
+    the expression reads in the VariableStore it was calculated with. A lookup only hits
+    when none of those names has changed since, so setting or deleting a variable can never
+    return a stale result, and the entries of other expressions stay valid. When the store
+    hasn't changed at all, a hit doesn't even compare the names. An array result is kept
+    as a tuple and every hit returns a new list, so changing a returned list doesn't change
+    the cache.
+
+    Results depend on the functions too, so like in ExpressionCache the keys include the
+    generation of the registry, and the results calculated before a function was
+    registered or unregistered are never found again.
+
+    Attributes:
+        capacity: The maximum number of results kept in the cache.
+        entries: An ordered dict of key -> (store version, versions of
+                 the names, result), oldest first.
+        hits: The number of lookups that found a valid result.
+        misses: The number of lookups that didn't.
+        stale: The number of misses where the expression was cached but a variable it
+               reads had changed.
+        evictions: The number of entries dropped because the cache was full.
+    """
+
+    def __init__(self, capacity: int = 256):
+        """The constructor for the ResultCache class.
+
+        Args:
+            capacity (int): The maximum number of entries. 0 disables caching.
+        """
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    @staticmethod
+    def names(expression: str) -> tuple:
+        """Returns the names an expression reads.
+
+        Function names are included too. They are never variables, so their version stays
+        0 and doesn't affect the entry.
+
+        Args:
+            expression (str): The normalized expression. It must have been calculated
+                              successfully, so it consists of valid tokens.
+
+        Returns:
+            tuple: The distinct names in the order they appear.
+        """
+        return tuple(dict.fromkeys(token.text for token in Lexer(expression)
+                                   if token.kind == IDENTIFIER))
+
+    def get(self, expression: str, variables):
+        """Returns the cached result of an expression if the variables it reads are unchanged.
+
+        Args:
+            expression (str): The expression in infix notation.
+            variables (VariableStore): The variables currently stored.
+
+        Returns:
+            int | float | list | None: The result, or None on a miss.
+        """
+        key = ExpressionCache.key(expression)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        version, versions, result = entry
+        if version != variables.version:
+            if any(variables.version_of(name) != name_version
+                   for name, name_version in versions):
+                del self.entries[key]
+                self.misses += 1
+                self.stale += 1
+                return None
+            self.entries[key] = (variables.version, versions, result)
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return list(result) if isinstance(result, tuple) else result
+
+    def add(self, expression: str, result, variables):
+        """Stores the result of an expression, evicting the least recently used entry if needed.
+
+        Args:
+            expression (str): The expression in infix notation.
+            result (int | float | list): The result calculated with the current variables.
+            variables (VariableStore): The variables the result was calculated with.
+        """
+        if self.capacity <= 0:
+            return
+        key = ExpressionCache.key(expression)
+        versions = tuple((name, variables.version_of(name)) for name in self.names(key[1]))
+        if isinstance(result, list):
+            result = tuple(result)
+        self.entries[key] = (variables.version, versions, result)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Empties the cache. The counters are kept."""
+        self.entries.clear()
+
+    def memory(self) -> int:
+        """Estimates the memory used by the entries.
+
+        Returns:
+            int: The size in bytes of the entries and the keys, not counting the names,
+                 which are shared with the variables.
+        """
+        size = sys.getsizeof(self.entries)
+        for key, entry in self.entries.items():
+            size += sys.getsizeof(key) + sys.getsizeof(key[1]) + sys.getsizeof(entry)
+            size += sys.getsizeof(entry[1])
+            size += sum(sys.getsizeof(pair) for pair in entry[1]) + sys.getsizeof(entry[2])
+        return size
+
+    def stats(self) -> dict:
+        """Returns the size, the counters and the memory use of the cache.
+
+        Returns:
+            dict: The number of entries, capacity, hits, misses, stale entries, evictions,
+                  hit rate and estimated bytes.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes": self.memory()
+        }
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, expression: str):
+        return ExpressionCache.key(expression) in self.entries
@@ -0,0 +1,244 @@
+import asyncio
+import json
+from analysis import DEFAULT_BUDGET, find_operations
+from arrays import array_names
+from cache import ExpressionCache
+from calculator import Calculator, error_message, handled_errors
+from calculator_io import BufferedIO
+from errors import InvalidInputError
+from lexer import IDENTIFIER, Lexer
+from variable_store import to_plain
+
+
+def expected_cost(expression: str, variables) -> int:
+    """Estimates how many instructions calculating an expression evaluates.
+
+    A solve, integrate or sum call, also inside a longer expression, may evaluate its
+    expression up to its budget of times. Otherwise each token is about one instruction,
+    done once for each element of the largest array the expression reads.
+
+    Args:
+        expression (str): The expression in infix notation.
+        variables (dict): The variables of the session.
+
+    Returns:
+        int: The estimate.
+    """
+    if any(find_operations(expression)):
+        return DEFAULT_BUDGET
+    arrays = array_names(variables)
+    try:
+        tokens = list(Lexer(expression))
+    except InvalidInputError:
+        return len(expression)
+    elements = max((variables[token.text].size for token in tokens
+                    if token.kind == IDENTIFIER and token.text in arrays), default=1)
+    return len(tokens) * elements
+
+
+class CalculatorServer:
+    """An asyncio server that hosts many calculator sessions in one event loop.
+
+    Each session is a Calculator with its own variables and BufferedIO, and all the
+    sessions share one compiled expression cache.
+
+    Each line a client sends is a request. A plain line is an expression and the reply
+    is the result or the error message. A line starting with '{' is a JSON request:
+
+        {"op": "eval", "expr": "1+a"}       -> {"result": 3.0} or {"error": "..."}
+        {"op": "set", "name": "a", "value": "2"}
+        {"op": "del", "name": "a"}
+        {"op": "list"}                      -> {"variables": {"a": 2}}
+        {"op": "stats"}                     -> {"cache": {...}, "sessions": 1}
+
+    Expressions whose expected_cost() is at least offload_cost are calculated in the
+    executor, so that a solve call or an operation on a large array doesn't stall the
+    event loop. The executor runs the session's Calculator, so it has to be a thread pool
+    (the default executor is one). The threads only keep the event loop responding: the
+    calculation still holds the GIL most of the time, so it slows down the other sessions,
+    and a calculation that never ends can't be stopped.
+
+    Attributes:
+        cache: The compiled expression cache shared by all sessions.
+        executor: The thread pool for expensive expressions, or None for the default
+                  executor.
+        offload_cost: The expected cost from which expressions are calculated in the
+                      executor.
+        sessions: The number of open sessions.
+    """
+
+    def __init__(self, cache_size: int = 1024, executor=None, offload_cost: int = 1000):
+        """The constructor for the CalculatorServer class.
+
+        Args:
+            cache_size (int): The size of the shared cache. Defaults to 1024.
+            executor (ThreadPoolExecutor | None): Where expensive expressions are calculated.
+            offload_cost (int): The expected cost from which the executor is used.
+        """
+        self.cache = ExpressionCache(cache_size)
+        self.executor = executor
+        self.offload_cost = offload_cost
+        self.sessions = 0
+
+    async def calculate(self, session: Calculator, expression: str) -> float:
+        """Evaluates an expression for a session.
+
+        Args:
+            session (Calculator): The calculator of the session.
+            expression (str): The expression.
+
+        Returns:
+            float: The result.
+        """
+        if expected_cost(expression, session.variables) < self.offload_cost:
+            return session.calculate(expression)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, session.calculate, expression)
+
+    async def handle_json(self, session: Calculator, line: str) -> str:
+        """Handles a JSON request.
+
+        Args:
+            session (Calculator): The calculator of the session.
+            line (str): The request.
+
+        Returns:
+            str: The JSON reply.
+        """
+        try:
+            request = json.loads(line)
+            operation = request["op"]
+        except (ValueError, KeyError, TypeError):
+            return json.dumps({"error": "invalid request"})
+        try:
+            if operation == "eval":
+                reply = await self.evaluate(session, request["expr"])
+            elif operation == "set":
+                reply = self.set_variable(session, request["name"], str(request["value"]))
+            elif operation == "del":
+                session.del_variable(request["name"])
+                messages = session.io.take()
+                reply = {"error": messages[0]} if messages else {"ok": True}
+            elif operation == "list":
+                reply = {"variables": {name: to_plain(value)
+                                       for name, value in session.variables.items()}}
+            elif operation == "stats":
+                reply = {"cache": self.cache.stats(), "results": session.results.stats(),
+                         "sessions": self.sessions}
+            else:
+                reply = {"error": f"unknown op '{operation}'"}
+        except handled_errors as error:
+            reply = {"error": error_message(error)}
+        except (KeyError, AttributeError):
+            reply = {"error": "invalid request"}
+        return json.dumps(reply)
+
+    async def evaluate(self, session: Calculator, expression) -> dict:
+        """Handles an eval request.
+
+        Args:
+            session (Calculator): The calculator of the session.
+            expression (str): The expr field of the request.
+
+        Returns:
+            dict: The reply.
+        """
+        if not isinstance(expression, str):
+            return {"error": "invalid request: expr must be a string"}
+        return {"result": await self.calculate(session, expression)}
+
+    @staticmethod
+    def set_variable(session: Calculator, name: str, value: str) -> dict:
+        """Stores a variable of a session.
+
+        Args:
+            session (Calculator): The calculator of the session.
+            name (str): The name of the variable.
+            value (str): The value of the variable.
+
+        Returns:
+            dict: The reply.
+        """
+        try:
+            session.assign(name, value)
+        except ValueError as error:
+            return {"error": str(error)}
+        return {"ok": True}
+
+    async def handle_line(self, session: Calculator, line: str) -> str:
+        """Handles one request line.
+
+        Args:
+            session (Calculator): The calculator of the session.
+            line (str): The request.
+
+        Returns:
+            str: The reply.
+        """
+        if line.startswith("{"):
+            return await self.handle_json(session, line)
+        try:
+            return str(await self.calculate(session, line))
+        except handled_errors as error:
+            return error_message(error)
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serves one client until it disconnects.
+
+        Waiting for a slow client only suspends this coroutine, the other sessions keep going.
+
+        Args:
+            reader (StreamReader): The input of the connection.
+            writer (StreamWriter): The output of the connection.
+        """
+        session = Calculator(BufferedIO(), cache=self.cache)
+        self.sessions += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:  # the line is longer than the reader's limit
+                    writer.write(b"ERROR: line too long\n")
+                    break
+                if not line:
+                    break
+                try:
+                    text = line.decode("utf-8")
+                except UnicodeDecodeError:
+                    reply = json.dumps({"error": "invalid request: not UTF-8"})
+                else:
+                    reply = await self.handle_line(session, text.strip())
+                writer.write(reply.encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions -= 1
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765, path: str = None,
+                    limit: int = 2 ** 20):
+        """Starts listening on a TCP port or a Unix socket.
+
+        Args:
+            host (str): The host for TCP. Defaults to 127.0.0.1.
+            port (int): The port for TCP. Defaults to 8765.
+            path (str | None): The path of a Unix socket. If given, TCP isn't used.
+            limit (int): The maximum length of a request line in bytes.
+
+        Returns:
+            asyncio.AbstractServer: The running server.
+        """
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle_client, path=path, limit=limit)
+        return await asyncio.start_server(self.handle_client, host, port, limit=limit)
+
+    async def serve(self, **kwargs):
+        """Starts the server and serves until cancelled.
+
+        Args:
+            kwargs: The arguments of start().
+        """
+        server = await self.start(**kwargs)
+        async with server:
+            await server.serve_forever()
@@ -1,69 +1,69 @@
+from math import isfinite
+from time import perf_counter
+from errors import InvalidInputError, MismatchedParenthesesError, UnknownInputError
+from lexer import COMMA, IDENTIFIER, LEFT, NUMBER, OPERATOR, Lexer
+from program import Program, to_number
+from registry import functions, operators, overloads, variadic
 
-from string import ascii_lowercase
 
+class Call:
+    """A function call on the operator stack, right below the left parenthesis of its arguments.
 
-operators = ["+", "-", "*", "/", "^"]
-functions = ["abs", "cos", "exp", "lb", "lg", "ln", "sin", "sqrt", "tan"]
-precedence = {
-    "+": 2,
-    "-": 2,
-    "*": 3,
-    "/": 3,
-    "^": 4
-}
-
-associativity = {
-    "+": "Left",
-    "-": "Left",
-    "*": "Left",
-    "/": "Left",
-    "^": "Right"
-}
-
-
-class InvalidInputError(Exception):
-    pass
-
-
-class UnknownInputError(Exception):
-    pass
+    Attributes:
+        function: The called function.
+        arguments: The number of arguments read so far.
+    """
 
+    __slots__ = ("function", "arguments")
 
-class MismatchedParenthesesError(Exception):
-    pass
+    def __init__(self, function):
+        self.function = function
+        self.arguments = 1
 
 
 class ShuntingYard:
     """This class is used to parse an expression using the Shunting-yard algorithm.
 
-    Infix notation -> RPN.
+    Infix notation -> RPN. The expression is split into tokens by Lexer, and each token
+    is handled once, so the parsing takes linear time.
 
     Attributes:
         expression: The expression which will be parsed.
         variables: The variables that have been set.
-        output: A list that for storing the output as the algorithm parses the input.
-        opstack: A list that is used to store operators.
-        funcstack: A list that is used to store functions.
-        previous: A string containing the previous character(s).
+        output: The compiled program that is built as the algorithm parses the input.
+        opstack: A list that is used to store operators, function calls and left parentheses.
+        expect_operand: True when the next token has to be a number, variable or function.
+        negate: True when the previous token was a minus sign that negates the next number.
+        misplaced: A left parenthesis that follows an operand, reported if the parentheses
+                   are otherwise balanced.
+        metrics: Where the parse time and sizes are recorded, or None.
     """
 
-    def __init__(self, expression: str, variables: dict):
+    def __init__(self, expression: str, variables: dict, metrics=None):
         """The constructor for the ShuntingYard class.
 
         This constructor prepares the class for the parsing by creating empty lists and dict.
 
         Args:
             expression (str): The expression in infix notation.
-            variables (dict): Variables currently stored.
+            variables (dict): Variables currently stored. Only the names are used, since
+                              the values are looked up when the program is evaluated.
+            metrics (Metrics | None): Turns on the instrumentation. Defaults to None.
         """
         self.expression = expression.replace(" ", "")
         self.variables = variables
-        self.output = []
+        self.metrics = metrics
+        self.reset()
+
+    def reset(self):
+        """Empties the output and the stacks, so that the expression can be parsed again."""
+        self.output = Program()
         self.opstack = []
-        self.funcstack = []
-        self.previous = ""
+        self.expect_operand = True
+        self.negate = False
+        self.misplaced = None
 
-    def parse(self) -> str:
+    def parse(self) -> Program:
         """Method that is in charge of parsing the expression and returning the final output.
 
         This method will go through each token in the expression, check its type and
@@ -74,159 +74,245 @@ class ShuntingYard:
             InvalidInputError: Raised when the expression contains an unsuitable character.
 
         Returns:
-            str: The expression in postfix (reverse Polish) notation.
+            Program: The expression in postfix (reverse Polish) notation.
         """
+        if self.metrics is None:
+            return self.shunt()
+        start = perf_counter()
+        program = self.shunt()
+        self.metrics.parsed(self.expression, program, perf_counter() - start)
+        return program
 
-        for index, token in enumerate(self.expression):
+    def shunt(self, tokens=None, output=None):
+        """Runs the Shunting-yard algorithm over the tokens of the expression.
 
-            next_token = None if index == len(
-                self.expression)-1 else self.expression[index+1]
-            previous_token = None if index == 0 else self.expression[index-1]
+        Each token is handled when the token after it is known, because functions and
+        negative numbers depend on the next token. The instructions are given to the
+        output as soon as they are known, so only the operator stack grows with the
+        nesting depth of the expression.
 
-            self.check_adjacent_operators(token, next_token)
+        Args:
+            tokens (iterator | None): The tokens to parse instead of the expression.
+            output (Program | None): What the instructions are added to, anything with the
+                                     number, variable, operator and function methods of
+                                     Program. Defaults to a new Program.
 
-            if token in "0123456789":
+        Returns:
+            Program: The output, with the expression in postfix (reverse Polish) notation.
+        """
+        self.reset()
+        if output is not None:
+            self.output = output
+        if tokens is None:
+            tokens = Lexer(self.expression).tokens()
+        token = next(tokens, None)
+        while token is not None:
+            next_token = next(tokens, None)
+            if token.kind == NUMBER:
                 self.number(token, next_token)
-
-            elif token == "-":  # special case of "-"" because it can also mean a negative number
-                self.minus(token, previous_token, next_token)
-
-            elif token == ".":
-                self.period(token, next_token, index)
-
-            elif token in operators:
+            elif token.kind == IDENTIFIER:
+                self.identifier(token, next_token)
+            elif token.kind == OPERATOR:
                 self.operator(token)
-
-            elif token in ("(", ")"):
+            elif token.kind == COMMA:
+                self.comma(token)
+            else:
                 self.parentheses(token)
+            token = next_token
 
-            elif token in ascii_lowercase:
-                self.letter(token, next_token, previous_token)
+        self.finish()
 
-            else:
-                raise InvalidInputError
+        return self.output
 
-        self.finish()
+    def operand(self, token):
+        """Checks that an operand is allowed at the position of the token.
 
-        return " ".join(self.output)
+        Args:
+            token (Token): A number, variable or function.
+
+        Raises:
+            InvalidInputError: Raised when the operand follows another operand, e.g. "3a".
+        """
+        if not self.expect_operand:
+            raise InvalidInputError(f"unexpected '{token.text}' at position {token.position}")
 
-    # can't define the type of next_token here because it fails the CI build
-    def number(self, token: str, next_token):
+    def number(self, token, next_token=None):
         """A method for handling a number token.
 
-        The number will be stored if the next token is also a number,
-        otherwise it will be added to the output.
+        A negation binds looser than "^" like it does before a variable, so -2^2 is -4.
+        Otherwise the number itself is made negative.
+
+        Args:
+            token (Token): The number.
+            next_token (Token | None): The next token.
+        """
+        self.operand(token)
+        if next_token is not None and next_token.text == "^":
+            self.unary_minus()
+        value = self.literal(token.text)
+        if self.negate:
+            value = -value
+            self.negate = False
+        self.output.number(value)
+        self.expect_operand = False
+
+    def identifier(self, token, next_token):
+        """Handles a variable or a function name.
 
         Args:
-            token (str): Current token, a number.
-            next_token(str | None): The next token.
+            token (Token): The identifier.
+            next_token (Token | None): The next token.
+
+        Raises:
+            UnknownInputError: When a variable with a certain name hasn't been set.
+            InvalidInputError: The identifier follows a number or a variable.
+            InvalidInputError: A function is not followed by a left parenthesis.
         """
-        if not next_token:
-            self.output.append(self.previous + token)
-        elif next_token in ".0123456789":
-            self.previous += token
+        self.operand(token)
+        self.unary_minus()
+        name = token.text
+        if name in self.variables:
+            self.output.variable(name)
+            self.expect_operand = False
+        elif name in functions:
+            if next_token is None or next_token.kind != LEFT:  # "ln3" or "ln+"
+                raise InvalidInputError(
+                    f"function {name} at position {token.position} must be followed by '('")
+            self.opstack.append(Call(functions[name]))
         else:
-            self.output.append(self.previous + token)
-            self.previous = ""
+            raise UnknownInputError(f"unknown name '{name}' at position {token.position}")
 
-    def period(self, token: str, next_token, index: int):
-        """A method for handling a period token.
+    def operator(self, token):
+        """A method for handling an operator token.
 
-        Will either raise an error or store the token in the case the next token is a number.
+        A minus sign at the start or after a left parenthesis is a negation. Before a
+        number that isn't raised to a power it makes the number negative, otherwise it is
+        handled as 0 minus the operand, with the precedence of a binary minus.
 
         Args:
-            token (str): Current token, a period.
-            next_token (str | None): The next token.
-            index (int): The index of the current token.
+            token (Token): The operator.
 
         Raises:
-            InvalidInputError: Will be raised if the expression starts with a period.
-            InvalidInputError: Will be raised if next_token isn't a number.
+            InvalidInputError: Raised when the operator is missing its first operand.
         """
-        if index == 0:
-            raise InvalidInputError
-        if not next_token or next_token not in "0123456789":
-            raise InvalidInputError
-        self.previous += token
+        if self.expect_operand:
+            # the operator stack is empty or has "(" on top only at the start of the
+            # expression or right after a left parenthesis
+            after_left = not self.opstack or self.opstack[-1] == "("
+            if token.text != "-" or not after_left or self.negate:
+                raise InvalidInputError(
+                    f"unexpected '{token.text}' at position {token.position}")
+            self.negate = True
+            return
+        self.push_operator(token.text)
+        self.expect_operand = True
+
+    def push_operator(self, name: str):
+        """Moves the operators that bind tighter to the output and pushes the operator.
 
-    def operator(self, token: str):
-        """A method for handling an operator token.
+        Args:
+            name (str): The operator.
+        """
+        operator = operators[name]
+        while self.opstack and self.opstack[-1] != "(":
+            top = operators[self.opstack[-1]]
+            if (top.precedence < operator.precedence
+                    or (top.precedence == operator.precedence
+                        and operator.associativity != "Left")):
+                break
+            self.output.operator(self.opstack.pop())
+        self.opstack.append(name)
+
+    def comma(self, token):
+        """Ends an argument of a function call.
 
         Args:
-            token (str): The operator.
+            token (Token): The comma.
+
+        Raises:
+            InvalidInputError: Raised when the comma isn't between two arguments of a call.
         """
-        if not self.opstack:
-            self.opstack.append(token)
-        else:
-            while (self.opstack[-1] != "("
-                   and ((precedence[self.opstack[-1]] > precedence[token])
-                        or (precedence[self.opstack[-1]] == precedence[token]
-                            and associativity[token] == "Left"))):
-                self.output.append(self.opstack.pop())
-                if len(self.opstack) == 0:
-                    break
-            self.opstack.append(token)
-
-    def parentheses(self, token: str):
+        if not self.expect_operand:
+            self.close_parenthesis()
+            if len(self.opstack) > 1 and isinstance(self.opstack[-2], Call):
+                self.opstack[-2].arguments += 1
+                self.expect_operand = True
+                return
+        raise InvalidInputError(f"unexpected ',' at position {token.position}")
+
+    def close_parenthesis(self):
+        """Moves the operators inside the innermost parentheses to the output.
+
+        The left parenthesis is left on the stack. Without one the stack is emptied.
+        """
+        while self.opstack and self.opstack[-1] != "(":
+            self.output.operator(self.opstack.pop())
+
+    def parentheses(self, token):
         """A method for handling a parenthesis token.
 
         All left parentheses will be added to the operator stack, while a right parenthesis will
         cause the iteration of the operator stack. If the top operator is a left parentheses, it
         will just be popped from the stack. While the top operator is something else, it is added
-        to the output. If the stack is empty, an IndexError will be raised.
+        to the output. If the stack is empty, an IndexError will be raised. A function call
+        right below the left parenthesis is then added to the output.
 
         Args:
-            token (str): The left or right parenthesis.
+            token (Token): The left or right parenthesis.
 
         Raises:
             IndexError: Error raised when running out of operators looking for a left parenthesis.
+            InvalidInputError: Raised when a right parenthesis follows an operator or "(", or
+                               closes a function call with the wrong number of arguments.
         """
-        if token == "(":
-            self.opstack.append(token)
-        else:  # token == ")"
-            while True:
-                if not self.opstack:
-                    raise IndexError
-                top = self.opstack.pop()
-                if top != "(":
-                    self.output.append(top)
-                    continue
-                break
-            if self.funcstack:
-                self.output.append(self.funcstack.pop())
-
-    def check_adjacent_operators(self, token: str, next_token):
-        """A method for checking whether an operator is followed by another one.
-
-        Returns None if token is a parenthesis.
+        if token.kind == LEFT:
+            self.unary_minus()
+            if not self.expect_operand and self.misplaced is None:
+                self.misplaced = token
+            self.opstack.append("(")
+            self.expect_operand = True
+        else:  # token.kind == RIGHT
+            if self.expect_operand:
+                raise InvalidInputError(f"unexpected ')' at position {token.position}")
+            self.close_parenthesis()
+            if not self.opstack:
+                raise IndexError(f"unmatched ')' at position {token.position}")
+            self.opstack.pop()
+            if self.opstack and isinstance(self.opstack[-1], Call):
+                self.close_call(self.opstack.pop(), token.position)
+
+    def close_call(self, call, position: int):
+        """Adds a function call to the output once its arguments are in the output.
+
+        A call with another number of arguments than the function takes is the overload
+        for that number, or nested calls of a variadic function like min and max.
 
         Args:
-            token (str): The current token.
-            next_token (str | None): The next token.
+            call (Call): The function call.
+            position (int): The position of the right parenthesis, for the error message.
 
         Raises:
-            InvalidInputError: Error raised when token and next_token are both operators.
+            InvalidInputError: Raised when the function can't take that many arguments.
         """
-        if token in operators and next_token in operators:  # adjacent operators cause an error
-            raise InvalidInputError
-
-    def minus(self, token: str, previous_token, next_token):
-        """A method for handling a minus token.
-
-        This method will check the type of the previous token to determine whether the
-        minus sign is an operator or a negation.
-
-        Args:
-            token (str): The current token, a minus sign.
-            previous_token (str | None): The previous token.
-        """
-        if previous_token is None and next_token == "(":
-            self.output.append("0")
-            self.operator(token)
-        elif previous_token is None or previous_token not in "0123456789)":
-            self.previous += token
-        else:
-            self.operator(token)
+        function = call.function
+        calls = 1
+        if call.arguments > function.arity and function.name in variadic:
+            calls = call.arguments - function.arity + 1
+        elif call.arguments != function.arity:
+            function = overloads.get((function.name, call.arguments))
+        if function is None:
+            raise InvalidInputError(
+                f"function {call.function.name} takes {call.function.arity} "
+                f"argument(s), got {call.arguments} at position {position}")
+        for _ in range(calls):
+            self.output.function(function.name)
+
+    def unary_minus(self):
+        """Turns a pending negation into 0 minus the operand that follows it."""
+        if self.negate:
+            self.negate = False
+            self.output.number(0)
+            self.push_operator("-")
 
     def finish(self):
         """A method for the final step of the Shunting-yard algorithm.
@@ -236,64 +322,36 @@ class ShuntingYard:
 
         Raises:
             MismatchedParenthesesError: Raised when there is a parenthesis left in the stack.
+            InvalidInputError: Raised when the expression is empty or ends with an operator,
+                               or has a left parenthesis right after an operand.
         """
         while self.opstack:
-            if "(" in self.opstack or ")" in self.opstack:
-                raise MismatchedParenthesesError
-            self.output.append(self.opstack.pop())
-
-    def letter(self, token: str, next_token, previous_token):
-        """Handles a letter based on what kind the preceding and following tokens are of.
+            top = self.opstack.pop()
+            if top == "(":
+                raise MismatchedParenthesesError("a '(' is not closed")
+            self.output.operator(top)
+        if self.misplaced is not None:
+            raise InvalidInputError(f"unexpected '(' at position {self.misplaced.position}")
+        if self.expect_operand:
+            raise InvalidInputError("the expression is incomplete")
+
+    def literal(self, text: str):
+        """Converts the text of a number into an int or a float.
 
         Args:
-            token (str): The current token (a letter)
-            next_token (str | None): The next token.
-            previous_token (str | None): The previous token.
+            text (str): The number as a string.
 
         Raises:
-            UnknownInputError: When a variable with a certain name hasn't been set.
-            InvalidInputError: A number precedes or follows a one-letter var.
-            InvalidInputError: A number precedes a variable/function.
-            InvalidInputError: A number follows a variable/function.
-            InvalidInputError: The preceding or following token is not of one of the allowed types.
-            UnknownInputError: _description_
-        """
-        # "+a+" (has to be a variable, no functions of length 1)
-        if str(previous_token) not in ascii_lowercase and str(next_token) not in ascii_lowercase:
-            if token not in self.variables:
-                raise UnknownInputError
-            if ((previous_token is not None and previous_token not in "+-*/^()")
-                    or (next_token is not None and next_token not in "+-*/^()")):  # "3a"
-                raise InvalidInputError
-            value = self.variables[token]
-            self.output.append(value)
-
-        # "+ab"
-        elif str(previous_token) not in ascii_lowercase and str(next_token) in ascii_lowercase:
-            if previous_token is not None and previous_token not in "+-*/^()":
-                raise InvalidInputError
-            self.previous += token
-
-        # "ab+"
-        elif str(previous_token) in ascii_lowercase and str(next_token) not in ascii_lowercase:
-            full_str = self.previous + token
-            self.previous = ""
-            if full_str in self.variables:
-                if next_token is not None and next_token not in "+-*/^()":  # "ab3"
-                    raise InvalidInputError
-                value = self.variables[full_str]
-                self.output.append(value)
-            elif full_str in functions:
-                if next_token != "(":  # "ln3" or "ln+"
-                    raise InvalidInputError
-                self.funcstack.append(full_str)
-            else:
-                raise UnknownInputError
-
-        # "abc"
-        # str(previous_token) in ascii_lowercase and str(next_token) in ascii_lowercase:
-        else:
-            self.previous += token
+            InvalidInputError: Raised when the text is not a valid number, or it is too
+                               large to be a float, e.g. 1e400.
 
-
-# if __name__ == "__main__":
+        Returns:
+            int | float: The number.
+        """
+        try:
+            value = to_number(text)
+        except ValueError as error:
+            raise InvalidInputError from error
+        if isinstance(value, float) and not isfinite(value):
+            raise InvalidInputError(f"the number {text} is too large")
+        return value
@@ -0,0 +1,87 @@
+from lexer import StreamLexer
+from shunting_yard import ShuntingYard
+
+# how much of a file is read at a time
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def read_chunks(stream, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Yields the contents of a file in pieces of a fixed size.
+
+    Args:
+        stream (IO): A text or binary file.
+        chunk_size (int): The size of a piece. Defaults to 64 KiB.
+
+    Yields:
+        str | bytes: One piece at a time.
+    """
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+class RPNWriter:
+    """An output for the parser that writes the RPN to a file as it is produced.
+
+    The tokens are separated by spaces, the same as str(Program).
+
+    Attributes:
+        stream: The text file the RPN is written to.
+        count: The number of tokens written.
+    """
+
+    def __init__(self, stream):
+        """The constructor for the RPNWriter class.
+
+        Args:
+            stream (TextIO): Where the RPN is written.
+        """
+        self.stream = stream
+        self.count = 0
+
+    def write(self, token):
+        """Writes one token.
+
+        Args:
+            token (int | float | str): The number or the name.
+        """
+        if self.count:
+            self.stream.write(" ")
+        self.stream.write(str(token))
+        self.count += 1
+
+    number = write
+    variable = write
+    operator = write
+    function = write
+
+
+def parse_stream(source, variables, output=None):
+    """Parses an expression that is read in chunks, giving the instructions to an output.
+
+    The input is never held in memory as a whole: only the operator stack of the parser
+    and the part of a token that is split between two chunks are kept. With an output
+    such as RPNWriter the memory use therefore depends on the nesting depth of the
+    expression and not on its length. Errors tell the position in the stream, in bytes
+    for binary input. Unlike in the other parsers, whitespace separates tokens, so
+    "1 2" is an error instead of 12.
+
+    Args:
+        source (IO | iterable): A file, or an iterable of str or bytes chunks.
+        variables (dict): The variables that have been set. Only the names are used.
+        output (Program | None): What the instructions are added to, e.g. an RPNWriter.
+                                 Defaults to a new Program.
+
+    Raises:
+        InvalidInputError: Raised when the expression is not valid.
+        UnknownInputError: Raised when the expression uses an unknown name.
+        MismatchedParenthesesError: Raised when a parenthesis is not closed.
+        IndexError: Raised when a right parenthesis has no left parenthesis.
+
+    Returns:
+        Program: The output.
+    """
+    chunks = read_chunks(source) if hasattr(source, "read") else source
+    return ShuntingYard("", variables).shunt(StreamLexer(chunks).tokens(), output)
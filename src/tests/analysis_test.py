@@ -0,0 +1,156 @@
+import math
+import unittest
+from analysis import Sampler, integrate, run_operation, solve, split_operation, summation
+from calculator import Calculator
+from calculator_io import BufferedIO
+from errors import BudgetExceededError, InvalidInputError, UnknownInputError
+from variable_store import VariableStore
+
+
+class TestSolve(unittest.TestCase):
+    def test_root(self):
+        self.assertAlmostEqual(solve("x^2-2", "x", 0, 2), math.sqrt(2), 9)
+
+    def test_first_root_in_interval(self):
+        self.assertAlmostEqual(solve("sin(x)", "x", 1, 10), math.pi, 9)
+
+    def test_bounds_in_any_order(self):
+        self.assertAlmostEqual(solve("x-1/3", "x", 1, -1), 1 / 3, 9)
+
+    def test_exact_zero(self):
+        self.assertEqual(solve("x-0.5", "x", 0, 1), 0.5)
+
+    def test_other_variables(self):
+        self.assertAlmostEqual(solve("a*x-b", "x", 0, 10, {"a": "2", "b": 3}), 1.5, 9)
+
+    def test_tolerance(self):
+        root = solve("x^3-x-1", "x", 1, 2, tolerance=1e-3)
+
+        self.assertAlmostEqual(root, 1.324717957, 3)
+
+    def test_no_sign_change(self):
+        with self.assertRaises(ValueError):
+            solve("x^2+1", "x", -1, 1)
+
+    def test_budget(self):
+        with self.assertRaises(BudgetExceededError):
+            solve("x^2-2", "x", 0, 2, budget=100)
+
+
+class TestIntegrate(unittest.TestCase):
+    def test_polynomial(self):
+        self.assertAlmostEqual(integrate("3*x^2", "x", 0, 2), 8, 12)
+
+    def test_adaptive(self):
+        self.assertAlmostEqual(integrate("sqrt(x)", "x", 0, 1), 2 / 3, 9)
+        self.assertAlmostEqual(integrate("1/x", "x", 1, 1000), math.log(1000), 9)
+
+    def test_reversed_and_empty_limits(self):
+        self.assertAlmostEqual(integrate("x", "x", 1, 0), -0.5, 12)
+        self.assertEqual(integrate("x", "x", 1, 1), 0)
+
+    def test_errors_of_points(self):
+        with self.assertRaises(ValueError):
+            integrate("ln(x)", "x", -1, 1)
+
+    def test_infinite_limit(self):
+        with self.assertRaises(ValueError):
+            integrate("x", "x", 0, math.inf)
+
+    def test_budget(self):
+        with self.assertRaises(BudgetExceededError):
+            integrate("sin(1/x)", "x", 0.001, 1, tolerance=1e-12, budget=1000)
+
+
+class TestSummation(unittest.TestCase):
+    def test_sum(self):
+        self.assertEqual(summation("k", "k", 1, 100), 5050)
+
+    def test_many_terms(self):
+        self.assertAlmostEqual(summation("1/k^2", "k", 1, 200000), math.pi ** 2 / 6, 5)
+
+    def test_empty_sum(self):
+        self.assertEqual(summation("k", "k", 5, 4), 0)
+
+    def test_bounds_must_be_integers(self):
+        with self.assertRaises(ValueError):
+            summation("k", "k", 1, 2.5)
+
+    def test_budget(self):
+        with self.assertRaises(BudgetExceededError):
+            summation("k", "k", 1, 101, budget=100)
+
+
+class TestSampler(unittest.TestCase):
+    def test_compiles_once_and_counts(self):
+        sample = Sampler("x*2", "x", {}, 10)
+
+        self.assertEqual(list(sample([1, 2, 3])), [2, 4, 6])
+        self.assertEqual(sample.evaluations, 3)
+
+    def test_unknown_variable(self):
+        with self.assertRaises(UnknownInputError):
+            Sampler("x*y", "x", {}, 10)
+
+
+class TestOperations(unittest.TestCase):
+    def test_split_operation(self):
+        self.assertEqual(split_operation("sum(max(k, 2), k, 1, 3)"),
+                         ("sum", ["max(k, 2)", "k", "1", "3"]))
+        self.assertIsNone(split_operation("sum(k,k,1,2)+sum(k,k,1,2)"))
+        self.assertIsNone(split_operation("1+2"))
+
+    def test_bounds_are_expressions(self):
+        result = run_operation("integrate", ["a*x", "x", "0", "b+1"], {"a": "2", "b": "2"})
+
+        self.assertAlmostEqual(result, 9)
+
+    def test_optional_arguments(self):
+        with self.assertRaises(BudgetExceededError):
+            run_operation("sum", ["k", "k", "1", "10", "5"], {})
+        with self.assertRaises(InvalidInputError):
+            run_operation("sum", ["k", "k", "1", "10", "1e-9", "5"], {})
+
+    def test_invalid_variable(self):
+        with self.assertRaises(InvalidInputError):
+            run_operation("solve", ["x", "sin", "0", "1"], {})
+        with self.assertRaises(InvalidInputError):
+            run_operation("solve", ["x", "x+1", "0", "1"], {})
+
+    def test_calculator(self):
+        io = BufferedIO(["var", "set", "a", "2", "", "solve(x^2-a, x, 0, a)",
+                         "integrate(sin(x), x, 0, 3.14159265)", "sum(k, k, 1, 10)",
+                         "sum(k, k, 1, 10, 5)", "solve(x^2+1, x, -1, 1)", "sum(k, k, 1)"])
+        Calculator(io).start()
+
+        self.assertEqual(io.outputs[-7:-1], [1.414, 2.0, 55.0, "ERROR: evaluation budget exceeded",
+                                             "ERROR: math error", "ERROR: invalid input"])
+
+    def test_operations_inside_expressions(self):
+        io = BufferedIO(["2*integrate(x, x, 0, 1)", "1+solve(x-1, x, 0, 2)",
+                         "sum(k, k, 1, sum(j, j, 1, 2))^2", "sum(k, k, 1, 3)-sum(k, k, 1, 2)",
+                         "1+sum(k, k, 1)"])
+        Calculator(io).start()
+
+        self.assertEqual(io.outputs[-6:-1], [1.0, 2.0, 36.0, 3.0, "ERROR: invalid input"])
+
+    def test_array_variables(self):
+        io = BufferedIO(["var", "set", "a", "[1, 2]", "", "integrate(x, x, 0, a)",
+                         "solve(x-a, x, 0, 3)", "1+sum(k, k, a, 3)"])
+        Calculator(io).start()
+
+        self.assertEqual(io.outputs[-4:-1], ["ERROR: invalid input"] * 3)
+        variables = VariableStore({"a": [1, 2]})
+        with self.assertRaisesRegex(InvalidInputError, "bounds"):
+            run_operation("sum", ["k", "k", "1", "a"], variables)
+        with self.assertRaisesRegex(InvalidInputError, "expression"):
+            run_operation("integrate", ["a*x", "x", "0", "1"], variables)
+
+    def test_calculate_many(self):
+        calculator = Calculator(BufferedIO())
+
+        self.assertEqual(calculator.calculate_many(["1+2", "sum(k, k, 1, 3)"]), [3, 6])
+
+
+if __name__ == "__main__":
+    unittest.main()
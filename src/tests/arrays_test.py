@@ -0,0 +1,129 @@
+import io
+import math
+import unittest
+import numpy as np
+from arrays import ArrayEvaluator, evaluate_program, reads_arrays
+from calculator import Calculator
+from calculator_io import BufferedIO
+from errors import InvalidInputError, UnknownInputError
+from registry import register_function, unregister_function
+from shunting_yard import ShuntingYard
+from variable_store import VariableStore, to_text
+
+
+class TestArrayEvaluator(unittest.TestCase):
+    def setUp(self):
+        self.variables = VariableStore({"x": [1, 2, 3], "y": "[4, 5, 6]", "k": 2})
+
+    def evaluate(self, expression):
+        program = ShuntingYard(expression, self.variables).parse()
+        return ArrayEvaluator(program, self.variables).evaluate()
+
+    def test_aggregates(self):
+        cases = {"sum(x)": 6, "mean(x)": 2, "min(x)": 1, "max(x)": 3, "dot(x, y)": 32,
+                 "norm(x)": round(math.sqrt(14), 3), "max(x)-min(x)+sum(k)": 4}
+        for expression, expected in cases.items():
+            self.assertEqual(self.evaluate(expression), expected, expression)
+
+    def test_element_wise(self):
+        self.assertEqual(self.evaluate("x*k+y"), [6, 9, 12])
+        self.assertEqual(self.evaluate("-x^2"), [-1, -4, -9])
+        self.assertEqual(self.evaluate("min(x, k)"), [1, 2, 2])
+        self.assertEqual(self.evaluate("sqrt(x)"), [1, 1.414, 1.732])
+
+    def test_reduced_array_combines_with_other_lengths(self):
+        self.variables["z"] = [1, 2]
+
+        self.assertEqual(self.evaluate("sum(x)*sum(z)"), 18)
+        with self.assertRaises(InvalidInputError):
+            self.evaluate("x+z")
+
+    def test_element_errors_fail_the_expression(self):
+        for expression, error in (("1/(x-2)", ZeroDivisionError), ("ln(x-1)", ValueError),
+                                  ("(0-x)^0.5", TypeError), ("10^(x*200)", OverflowError)):
+            with self.assertRaises(error, msg=expression):
+                self.evaluate(expression)
+
+    def test_unknown_variable(self):
+        program = ShuntingYard("x+q", {"x": None, "q": None}).parse()
+
+        with self.assertRaises(UnknownInputError):
+            ArrayEvaluator(program, self.variables).evaluate()
+
+    def test_registered_function(self):
+        register_function("double", lambda x: 2 * x)
+        try:
+            self.assertEqual(self.evaluate("double(x)"), [2, 4, 6])
+        finally:
+            unregister_function("double")
+
+    def test_scalar_programs_use_evaluator(self):
+        program = ShuntingYard("sum(k)+dot(k, 3)+norm(0-k)", self.variables).parse()
+
+        self.assertFalse(reads_arrays(program, self.variables))
+        self.assertEqual(evaluate_program(program, self.variables), 10)
+
+
+class TestArrayVariables(unittest.TestCase):
+    def test_store(self):
+        store = VariableStore({"x": [1, 2]})
+        store.load({"y": 1, "z": (3, 4)})
+        store["x"] = 5
+
+        self.assertEqual(store.arrays, {"z"})
+        self.assertFalse(store["z"].flags.writeable)
+        self.assertEqual(to_text(store["z"]), "[3.0, 4.0]")
+        del store["z"]
+        self.assertEqual(store.arrays, set())
+
+    def test_json(self):
+        store = VariableStore({"x": [1, 2.5]})
+        stream = io.StringIO()
+        store.dump_json(stream)
+        stream.seek(0)
+
+        self.assertEqual(VariableStore().load_json(stream), 1)
+        with self.assertRaises(ValueError):
+            store.dump_binary(io.BytesIO())
+
+    def test_calculator(self):
+        io_ = BufferedIO(["var", "set", "x", "[1, 2,3]", "set", "y", "[1, 2", "[2, 2, 2]",
+                          "set", "total", "dot(x, y)", "list", "", "x*2", "sum(ans)", "sum(x)",
+                          "sum(k, k, 1, 3)"])
+        calculator = Calculator(io_)
+
+        calculator.start()
+
+        self.assertEqual(io_.outputs[1:4], ["x = [1.0, 2.0, 3.0]", "y = [2.0, 2.0, 2.0]",
+                                            "total = dot(x, y)"])
+        self.assertEqual(io_.outputs[4:-1], [[2, 4, 6], 12, 6, 6])
+        self.assertEqual(calculator.variables["total"], 12)
+        self.assertEqual(calculator.snapshot()["variables"]["x"], [1, 2, 3])
+
+    def test_calculate_many(self):
+        calculator = Calculator(BufferedIO())
+        calculator.assign("x", [1, 2])
+
+        self.assertEqual(calculator.calculate_many(["mean(x)", "1+1", "x/2"]),
+                         [1.5, 2, [0.5, 1]])
+
+    def test_min_and_max_take_any_number_of_arguments(self):
+        calculator = Calculator(BufferedIO())
+        calculator.assign("x", [1, 5])
+
+        self.assertEqual(calculator.calculate("min(3)+max(1, 2)"), 5)
+        self.assertEqual(calculator.calculate("min(4, 2, 3)+max(1, 7, 2, 3)"), 9)
+        self.assertEqual(calculator.calculate("max(x, 2, 3)"), [3, 5])
+        with self.assertRaises(InvalidInputError):
+            calculator.calculate("sin(1, 2)")
+
+    def test_formula_of_array(self):
+        calculator = Calculator(BufferedIO())
+        calculator.assign("x", "[1, 4]")
+        calculator.assign("root", "sqrt(x)")
+
+        np.testing.assert_array_equal(calculator.variables["root"], [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import math
+import unittest
+import numpy as np
+from autodiff import gradient, gradient_many
+from errors import UnknownInputError
+from prepared import prepare
+from registry import register_function, unregister_function
+from shunting_yard import ShuntingYard
+
+
+class TestGradient(unittest.TestCase):
+    def setUp(self):
+        self.variables = {"x": "2", "y": 0.5}
+
+    def parse(self, expression):
+        return ShuntingYard(expression, self.variables).parse()
+
+    def numeric(self, expression, name, step=1e-6):
+        program = self.parse(expression)
+        below = {**self.variables, name: float(self.variables[name]) - step}
+        above = {**self.variables, name: float(self.variables[name]) + step}
+        return (gradient(program, above)[0] - gradient(program, below)[0]) / (2 * step)
+
+    def test_polynomial(self):
+        value, partials = gradient(self.parse("x^3+2*x*y-y"), self.variables)
+
+        self.assertAlmostEqual(value, 9.5)
+        self.assertAlmostEqual(partials["x"], 13)
+        self.assertAlmostEqual(partials["y"], 3)
+
+    def test_matches_finite_differences(self):
+        expressions = ["sin(x)*cos(y)", "tan(y)/x", "exp(x*y)", "ln(x)+lg(x)+lb(y)",
+                       "sqrt(x+y)", "abs(y-x)", "x^y", "y^x", "atan2(y,x)", "log(x,y)",
+                       "max(x,y)", "min(x,y)"]
+        for expression in expressions:
+            _, partials = gradient(self.parse(expression), self.variables)
+            for name in ("x", "y"):
+                self.assertAlmostEqual(partials[name], self.numeric(expression, name), 5,
+                                       msg=f"{expression} d{name}")
+
+    def test_value_is_not_rounded(self):
+        value, _ = gradient(self.parse("x/3"), self.variables)
+
+        self.assertEqual(value, 2 / 3)
+
+    def test_chosen_variables(self):
+        _, partials = gradient(self.parse("x*y"), self.variables, ["y"])
+
+        self.assertEqual(partials, {"y": 2})
+
+    def test_variable_not_in_expression(self):
+        _, partials = gradient(self.parse("x*x"), {**self.variables, "z": 1}, ["x", "z"])
+
+        self.assertEqual(partials, {"x": 4, "z": 0})
+
+    def test_negative_base_with_constant_exponent(self):
+        _, partials = gradient(self.parse("x^2"), {"x": -3})
+
+        self.assertEqual(partials["x"], -6)
+
+    def test_optimized_program(self):
+        prepared = prepare("(x+y)^2+(x+y)^0.5", self.variables)
+        value, partials = prepared.gradient()
+
+        self.assertAlmostEqual(value, 6.25 + math.sqrt(2.5))
+        self.assertAlmostEqual(partials["x"], 5 + 0.5 / math.sqrt(2.5))
+        self.assertEqual(partials["x"], partials["y"])
+
+    def test_prepared_bindings(self):
+        value, partials = prepare("x*y", "xy").gradient(["x"], x=2, y=3)
+
+        self.assertEqual(value, 6)
+        self.assertEqual(partials, {"x": 3})
+
+    def test_errors_are_the_same_as_evaluation(self):
+        with self.assertRaises(ZeroDivisionError):
+            gradient(self.parse("x/(y-0.5)"), self.variables)
+        with self.assertRaises(ValueError):
+            gradient(self.parse("sqrt(y-x)"), self.variables)
+        with self.assertRaises(UnknownInputError):
+            gradient(self.parse("x+y"), {"x": 1})
+
+    def test_function_without_derivative(self):
+        register_function("twice", lambda x: 2 * x)
+        try:
+            program = ShuntingYard("twice(x)", self.variables).parse()
+            with self.assertRaises(ValueError):
+                gradient(program, self.variables)
+            with self.assertRaises(ValueError):
+                gradient_many(program, {"x": [1, 2]})
+        finally:
+            unregister_function("twice")
+
+
+class TestGradientMany(unittest.TestCase):
+    def test_same_as_scalar(self):
+        expression = "sin(x)*y^2+sqrt(abs(x))/y"
+        program = ShuntingYard(expression, {"x": 1, "y": 1}).parse()
+        xs = np.linspace(-2, 2, 8)
+        result = gradient_many(program, {"x": xs, "y": 1.5})
+
+        self.assertTrue(result.ok.all())
+        for row, x in enumerate(xs):
+            value, partials = gradient(program, {"x": x, "y": 1.5})
+            self.assertAlmostEqual(result.values[row], value)
+            self.assertAlmostEqual(result.partials["x"][row], partials["x"])
+            self.assertAlmostEqual(result.partials["y"][row], partials["y"])
+
+    def test_failed_rows(self):
+        program = ShuntingYard("ln(x)/y", {"x": 1, "y": 1}).parse()
+        result = gradient_many(program, {"x": [1, -1, 1], "y": [2, 2, 0]})
+
+        self.assertEqual(list(result.ok), [True, False, False])
+        self.assertEqual(list(result.errors), [None, ValueError, ZeroDivisionError])
+        self.assertEqual(result.partials["x"][0], 0.5)
+        self.assertTrue(np.isnan(result.partials["x"][1:]).all())
+        self.assertTrue(np.isnan(result.values[1:]).all())
+
+    def test_unknown_column(self):
+        program = ShuntingYard("x+y", {"x": 1, "y": 1}).parse()
+
+        with self.assertRaises(UnknownInputError):
+            gradient_many(program, {"x": [1, 2]})
+
+
+if __name__ == "__main__":
+    unittest.main()
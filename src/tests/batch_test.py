@@ -0,0 +1,58 @@
+import io
+import unittest
+from batch import evaluate_batch, evaluate_lines, load_variables, run_batch
+from calculator import Calculator
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.calc = Calculator()
+
+    def test_one_result_per_line(self):
+        output = io.StringIO()
+
+        run_batch(self.calc, io.StringIO("1+2\n3*(4+1)\n"), output)
+
+        self.assertEqual(output.getvalue(), "3.0\n15.0\n")
+
+    def test_bad_line_does_not_abort(self):
+        results = list(evaluate_lines(self.calc, ["1/0", "1,2", "sqrt(-1)", "2^3"]))
+
+        self.assertEqual(results, ["ERROR: division by zero", "ERROR: invalid input",
+                                   "ERROR: math error", "8.0"])
+
+    def test_empty_line_keeps_alignment(self):
+        results = list(evaluate_lines(self.calc, ["1", "", "2"]))
+
+        self.assertEqual(results, ["1", "", "2"])
+
+    def test_results_are_streamed(self):
+        lines = iter(["1+1", "2+2"])
+        results = evaluate_lines(self.calc, lines)
+
+        self.assertEqual(next(results), "2.0")
+        self.assertEqual(next(lines), "2+2")
+
+    def test_batch_matches_lines(self):
+        self.calc.assign("a", "2")
+        lines = ["sin(a)+1", "", "sin(a)*2", "1/(a-2)", "(1", "sin(a)+1"]
+
+        self.assertEqual(evaluate_batch(self.calc, lines), list(evaluate_lines(self.calc, lines)))
+
+    def test_run_batch_chunks(self):
+        output = io.StringIO()
+
+        run_batch(self.calc, io.StringIO("1+2\n\n1/0\n2*3\n"), output, chunk_size=2)
+
+        self.assertEqual(output.getvalue(), "3.0\n\nERROR: division by zero\n6.0\n")
+
+    def test_load_variables(self):
+        load_variables(self.calc, io.StringIO("# constants\na = 5\n\nbeta=-1.5\n"))
+
+        self.assertEqual(self.calc.variables, {"a": 5, "beta": -1.5})
+        self.assertEqual(list(evaluate_lines(self.calc, ["a*beta"])), ["-7.5"])
+
+    def test_load_invalid_variables(self):
+        for text in ("a 5\n", "a1 = 5\n", "a = 5x\n", "ln = 2\n"):
+            with self.assertRaises(ValueError):
+                load_variables(self.calc, io.StringIO(text))
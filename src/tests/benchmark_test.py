@@ -0,0 +1,36 @@
+import unittest
+from benchmark import compare, generate_expressions, run, scenarios
+from shunting_yard import ShuntingYard
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_generated_expressions_parse(self):
+        for settings in scenarios.values():
+            expressions, variables = generate_expressions(settings, 5)
+            for expression in expressions:
+                ShuntingYard(expression, variables).parse()
+            self.assertEqual(len(variables), settings["variables"])
+
+    def test_generation_is_deterministic(self):
+        self.assertEqual(generate_expressions(scenarios["medium"], 3),
+                         generate_expressions(scenarios["medium"], 3))
+
+    def test_run(self):
+        results = run(5, ["small"])
+
+        self.assertEqual(set(results["small"]), {"parse", "evaluate", "calculator"})
+        self.assertGreater(results["small"]["parse"]["ops_per_sec"], 0)
+        self.assertLessEqual(results["small"]["calculator"]["p50_us"],
+                             results["small"]["calculator"]["p95_us"])
+
+    def test_run_parallel(self):
+        results = run(2, ["parallel"])
+
+        self.assertEqual(set(results["parallel"]), {"batch", "columns"})
+        self.assertGreater(results["parallel"]["columns"]["ops_per_sec"], 0)
+
+    def test_compare(self):
+        baseline = {"small": {"parse": {"ops_per_sec": 100}, "evaluate": {"ops_per_sec": 100}}}
+        results = {"small": {"parse": {"ops_per_sec": 85}, "evaluate": {"ops_per_sec": 95}}}
+
+        self.assertEqual(compare(results, baseline, 0.1), [("small", "parse", 100, 85)])
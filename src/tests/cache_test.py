@@ -0,0 +1,62 @@
+import unittest
+from cache import ExpressionCache
+from shunting_yard import UnknownInputError
+
+
+class TestExpressionCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = ExpressionCache(2)
+        self.variables = {"a": "1", "b": "2"}
+
+    def test_hit_and_miss(self):
+        first = self.cache.compile("a + 1", self.variables)
+        second = self.cache.compile("a+1", self.variables)
+
+        self.assertIs(first, second)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_lru_eviction(self):
+        self.cache.compile("1+1", self.variables)
+        self.cache.compile("2+2", self.variables)
+        self.cache.compile("1+1", self.variables)
+        self.cache.compile("3+3", self.variables)
+
+        self.assertIn("1+1", self.cache)
+        self.assertNotIn("2+2", self.cache)
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_invalidate(self):
+        self.cache.compile("a+1", self.variables)
+        self.cache.compile("b+1", self.variables)
+
+        self.cache.invalidate("a")
+
+        self.assertNotIn("a+1", self.cache)
+        self.assertIn("b+1", self.cache)
+        self.assertNotIn("a", self.cache.dependents)
+
+    def test_hit_checks_names(self):
+        self.cache.compile("a+1", self.variables)
+
+        with self.assertRaises(UnknownInputError):
+            self.cache.compile("a+1", {})
+
+    def test_zero_capacity(self):
+        cache = ExpressionCache(0)
+
+        cache.compile("1+1", self.variables)
+
+        self.assertEqual(len(cache), 0)
+
+    def test_stats(self):
+        self.cache.compile("1+1", self.variables)
+
+        self.assertEqual(self.cache.stats(), {"size": 1, "capacity": 2, "hits": 0,
+                                              "misses": 1, "evictions": 0, "eliminated": 2})
+
+    def test_optimize(self):
+        program = self.cache.compile("a*2^2", self.variables)
+
+        self.assertEqual(str(program), "a 4.0 *")
+        self.assertEqual(str(ExpressionCache(2, optimize=False).compile("a*2^2", self.variables)),
+                         "a 2 2 ^ *")
@@ -46,7 +46,7 @@ class TestCalculator(unittest.TestCase):
 
         self.calc.start()
 
-        self.assertEqual(self.calc.variables, {"a": "5"})
+        self.assertEqual(self.calc.variables, {"a": 5})
 
     def test_list_variables(self):
         self.io.set_inputs(["var", "set", "a", "5", "list"])
@@ -61,7 +61,7 @@ class TestCalculator(unittest.TestCase):
 
         self.calc.start()
 
-        self.assertEqual(self.calc.variables, {"a": "3"})
+        self.assertEqual(self.calc.variables, {"a": 3})
 
     def test_empty_name_or_value_does_nothing(self):
         self.io.set_inputs(["var", "set", "", ""])
@@ -75,7 +75,7 @@ class TestCalculator(unittest.TestCase):
 
         self.calc.start()
 
-        self.assertEqual(self.calc.variables, {"a": "-5"})
+        self.assertEqual(self.calc.variables, {"a": -5})
 
     def test_del_var_correct_name(self):
         self.io.set_inputs(["var", "del", "a"])
@@ -148,11 +148,67 @@ class TestCalculator(unittest.TestCase):
 
         self.calc.start()
 
-        self.assertEqual(self.calc.variables, {"a": "3.1"})
+        self.assertEqual(self.calc.variables, {"a": 3.1})
 
     def test_invalid_float_var(self):
         self.io.set_inputs(["var", "set", "a", ".3", "3.3.3", "3.", "3.1"])
 
         self.calc.start()
 
-        self.assertEqual(self.calc.variables, {"a": "3.1"})
+        self.assertEqual(self.calc.variables, {"a": 3.1})
+
+    def test_function_name_is_not_a_valid_var_name(self):
+        self.io.set_inputs(["var", "set", "ln", "a", "3"])
+
+        self.calc.start()
+
+        self.assertEqual(self.calc.variables, {"a": 3})
+
+    def test_repeated_expression_uses_cache(self):
+        self.calc = Calculator(self.io, result_cache_size=0)
+        self.io.set_inputs(["1+2", "1 + 2", "1+2", "2*3"])
+
+        self.calc.start()
+
+        # the first input is evaluated without compiling, the second time it is cached
+        self.assertEqual(self.io.outputs[0:4], [3, 3, 3, 6])
+        self.assertEqual(self.calc.cache.hits, 1)
+        self.assertEqual(self.calc.cache.misses, 1)
+        self.assertNotIn("2*3", self.calc.cache)
+
+    def test_cached_expression_sees_new_value(self):
+        self.io.set_inputs(["a+1", "var", "set", "a", "5", "", "a+1"])
+        self.calc.variables = {"a": "1"}
+
+        self.calc.start()
+
+        self.assertEqual(self.io.outputs[0], 2.0)
+        self.assertEqual(self.io.outputs[1], 6.0)
+
+    def test_deleted_variable_invalidates_cache(self):
+        self.io.set_inputs(["a+1", "var", "del", "a", "", "a+1"])
+        self.calc.variables = {"a": "1"}
+
+        self.calc.start()
+
+        self.assertNotIn("a+1", self.calc.cache)
+        self.assertEqual(self.io.outputs[1], "ERROR: unknown input")
+
+    def test_calculate(self):
+        self.calc.variables = {"x": "4"}
+
+        self.assertEqual(self.calc.calculate("sqrt(x)*2"), 4.0)
+
+    def test_math_error(self):
+        self.io.set_inputs(["sqrt(0-1)"])
+
+        self.calc.start()
+
+        self.assertEqual(self.io.outputs[0], "ERROR: math error")
+
+    def test_assign(self):
+        self.calc.assign("a", "2")
+
+        with self.assertRaises(ValueError):
+            self.calc.assign("a", "two")
+        self.assertEqual(self.calc.variables, {"a": 2})
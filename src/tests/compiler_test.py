@@ -0,0 +1,76 @@
+import random
+import unittest
+from compiler import Compiler, compile_program
+from evaluator import Evaluator
+from program import Program
+from registry import public_functions
+from shunting_yard import ShuntingYard, UnknownInputError
+
+errors = (ZeroDivisionError, ValueError, TypeError, OverflowError, UnknownInputError)
+
+
+def random_expression(rng: random.Random, depth: int) -> str:
+    if depth == 0 or rng.random() < 0.2:
+        return rng.choice(["x", "y", "0", "1", "2", "0.5", "3.25", "10", "-1", "-2.5"])
+    if rng.random() < 0.3:
+        return f"{rng.choice(public_functions(1))}({random_expression(rng, depth - 1)})"
+    operator = rng.choice("+-*/^")
+    return f"({random_expression(rng, depth - 1)}){operator}({random_expression(rng, depth - 1)})"
+
+
+class TestCompiler(unittest.TestCase):
+    def assert_same(self, program, variables):
+        try:
+            expected = Evaluator(program, variables).evaluate()
+        except errors as error:
+            with self.assertRaises(type(error), msg=str(program)):
+                compile_program(program)(variables)
+        else:
+            self.assertEqual(compile_program(program)(variables), expected, str(program))
+
+    def test_basic_operations(self):
+        self.assertEqual(compile_program(Program.from_string("2 2 * 4 2 / - 3 +"))(), 5.0)
+
+    def test_functions(self):
+        for name in public_functions(1):
+            self.assert_same(Program.from_string(f"2 {name} 3 *"), {})
+
+    def test_variables(self):
+        program = ShuntingYard("a*x^2+b*x+c", ["a", "b", "c", "x"]).parse()
+
+        result = compile_program(program)({"a": "1", "b": 2, "c": 3, "x": 4.0})
+
+        self.assertEqual(result, 27.0)
+
+    def test_single_number(self):
+        self.assertEqual(compile_program(Program.from_string("3"))(), 3)
+
+    def test_zero_division(self):
+        with self.assertRaises(ZeroDivisionError):
+            compile_program(Program.from_string("3 1 1 - /"))()
+
+    def test_domain_error(self):
+        with self.assertRaises(ValueError):
+            compile_program(Program.from_string("-1 sqrt"))()
+
+    def test_error_order(self):
+        program = Program.from_string("1 0 / a +")
+
+        with self.assertRaises(ZeroDivisionError):
+            compile_program(program)({})
+
+    def test_unknown_variable(self):
+        with self.assertRaises(UnknownInputError):
+            compile_program(Program.from_string("a 1 +"))({})
+
+    def test_deep_expression_falls_back(self):
+        program = ShuntingYard("(" * 5000 + "1" + "+1)" * 5000, {}).parse()
+
+        self.assertEqual(Compiler(program).compile()(), 5001)
+
+    def test_differential_random_expressions(self):
+        rng = random.Random(2022)
+        for _ in range(500):
+            program = ShuntingYard(random_expression(rng, 4), {"x": None, "y": None}).parse()
+            for x in (-2, -0.5, 0, 1, 3.5):
+                self.assert_same(program, {"x": x, "y": 2})
@@ -0,0 +1,142 @@
+import os
+import tempfile
+import unittest
+from calculator import Calculator
+from calculator_io import BufferedIO
+from disk_cache import DiskCache, write_atomic
+from errors import UnknownInputError
+from program import Program
+
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.temporary = tempfile.TemporaryDirectory()
+        self.directory = self.temporary.name
+        self.store = DiskCache(self.directory)
+
+    def tearDown(self):
+        self.temporary.cleanup()
+
+    def test_round_trip(self):
+        program = Program.from_string("x 2 ^ 1 +")
+
+        self.store.save("x^2+1", program)
+        loaded = self.store.load("x^2+1")
+
+        self.assertEqual(str(loaded), str(program))
+        self.assertEqual(self.store.stats(), {"hits": 1, "misses": 0, "errors": 0})
+
+    def test_missing_entry(self):
+        self.assertIsNone(self.store.load("1+2"))
+        self.assertEqual(self.store.stats(), {"hits": 0, "misses": 1, "errors": 0})
+
+    def test_corrupt_entries_are_ignored(self):
+        self.store.save("1+2", Program.from_string("1 2 +"))
+        path = self.store.path("1+2")
+        with open(path, "rb") as file:
+            data = file.read()
+
+        for broken in (data[:-3], b"RPNC" + data[4:20], b"XXXX" + data[4:], b""):
+            write_atomic(path, broken)
+            self.assertIsNone(self.store.load("1+2"))
+
+        self.assertEqual(self.store.hits, 0)
+        self.assertEqual(self.store.errors, 3)
+
+    def test_stale_version_is_ignored(self):
+        self.store.save("1+2", Program.from_string("1 2 +"))
+        path = self.store.path("1+2")
+        with open(path, "rb") as file:
+            data = bytearray(file.read())
+        data[4] += 1
+        write_atomic(path, bytes(data))
+
+        self.assertIsNone(self.store.load("1+2"))
+        self.assertEqual(self.store.errors, 1)
+
+    def test_entry_of_another_expression(self):
+        self.store.save("1+2", Program.from_string("1 2 +"))
+        os.makedirs(os.path.dirname(self.store.path("2+2")), exist_ok=True)
+        os.replace(self.store.path("1+2"), self.store.path("2+2"))
+
+        self.assertIsNone(self.store.load("2+2"))
+        self.assertEqual(self.store.errors, 1)
+
+    def test_atomic_write_leaves_no_temporary_files(self):
+        path = os.path.join(self.directory, "file")
+
+        write_atomic(path, b"old")
+        write_atomic(path, b"new")
+
+        with open(path, "rb") as file:
+            self.assertEqual(file.read(), b"new")
+        self.assertEqual(sorted(os.listdir(self.directory)), ["expressions", "file"])
+
+    def test_state(self):
+        self.assertIsNone(self.store.load_state())
+
+        self.store.save_state({"variables": {"x": "2"}, "formulas": []})
+
+        self.assertEqual(self.store.load_state()["variables"], {"x": "2"})
+
+    def test_state_of_another_version(self):
+        write_atomic(os.path.join(self.directory, "variables.json"), b'{"version": 0}')
+
+        self.assertIsNone(self.store.load_state())
+
+
+class TestCalculatorDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.temporary = tempfile.TemporaryDirectory()
+        self.directory = self.temporary.name
+
+    def tearDown(self):
+        self.temporary.cleanup()
+
+    def test_second_run_loads_from_disk(self):
+        first = Calculator(BufferedIO(), cache_dir=self.directory)
+        self.assertEqual(first.calculate("(1+2)*3"), 9.0)
+
+        second = Calculator(BufferedIO(), cache_dir=self.directory)
+        self.assertEqual(second.calculate("(1+2)*3"), 9.0)
+
+        self.assertEqual(second.cache.stats()["disk"]["hits"], 1)
+
+    def test_disk_entry_checks_names(self):
+        first = Calculator(BufferedIO(), cache_dir=self.directory)
+        first.assign("x", "2")
+        first.calculate("x+1")
+
+        second = Calculator(BufferedIO(), cache_dir=self.directory)
+
+        with self.assertRaises(UnknownInputError):
+            second.calculate("x+1")
+
+    def test_variables_are_restored(self):
+        io = BufferedIO()
+        first = Calculator(io, cache_dir=self.directory)
+        first.assign("w", "2")
+        first.assign("area", "w*3")
+        io.feed("")
+        first.start()
+
+        second = Calculator(BufferedIO(), cache_dir=self.directory)
+        second.assign("w", "4")
+
+        self.assertEqual(second.calculate("area"), 12.0)
+        self.assertEqual(second.formulas.expressions["area"], "w*3")
+
+    def test_corrupt_state_is_ignored(self):
+        write_atomic(os.path.join(self.directory, "variables.json"),
+                     b'{"version": 1, "variables": {"x": "a"}, "formulas": 5}')
+
+        calc = Calculator(BufferedIO(), cache_dir=self.directory)
+
+        self.assertEqual(calc.variables, {})
+
+    def test_invalid_formulas_are_skipped(self):
+        calc = Calculator(BufferedIO())
+
+        calc.restore({"variables": {"x": 2}, "formulas": [["b"], "c", ["d", "x*2"]]})
+
+        self.assertEqual(calc.variables, {"x": 2, "d": 4})
@@ -0,0 +1,131 @@
+import unittest
+from calculator import Calculator
+from calculator_io import BufferedIO
+from errors import UnknownInputError
+from formulas import FormulaGraph
+from program import Program
+
+
+class TestFormulaGraph(unittest.TestCase):
+    def setUp(self):
+        self.graph = FormulaGraph()
+        self.variables = {"w": "2", "h": "3", "rate": "1.5"}
+        self.define("area", "w h *")
+        self.define("cost", "area rate *")
+        self.define("perimeter", "w h + 2 *")
+
+    def define(self, name, rpn):
+        self.graph.define(name, rpn, Program.from_string(rpn))
+        self.graph.update(name, self.variables)
+
+    def test_values(self):
+        self.assertEqual(self.variables["area"], 6.0)
+        self.assertEqual(self.variables["cost"], 9.0)
+        self.assertEqual(self.variables["perimeter"], 10.0)
+
+    def test_only_downstream_is_recomputed(self):
+        self.variables["rate"] = "2"
+
+        self.assertEqual(self.graph.update("rate", self.variables), ["cost"])
+        self.assertEqual(self.variables["cost"], 12.0)
+
+    def test_topological_order(self):
+        self.variables["w"] = "4"
+
+        updated = self.graph.update("w", self.variables)
+
+        self.assertLess(updated.index("area"), updated.index("cost"))
+        self.assertEqual(set(updated), {"area", "cost", "perimeter"})
+        self.assertEqual(self.variables["cost"], 18.0)
+
+    def test_cycle_is_refused(self):
+        with self.assertRaises(ValueError):
+            self.graph.define("w", "cost 2 *", Program.from_string("cost 2 *"))
+        with self.assertRaises(ValueError):
+            self.graph.define("area", "area 1 +", Program.from_string("area 1 +"))
+
+        self.assertEqual(self.graph.expressions["area"], "w h *")
+
+    def test_redefine_drops_old_dependencies(self):
+        self.define("area", "rate 2 *")
+
+        self.assertEqual(self.graph.update("w", self.variables), ["perimeter"])
+        self.assertEqual(self.variables["cost"], 4.5)
+
+    def test_failing_formula(self):
+        self.variables["h"] = "0"
+        self.define("ratio", "w h /")
+
+        self.assertNotIn("ratio", self.variables)
+        self.assertIsInstance(self.graph.errors["ratio"], ZeroDivisionError)
+
+        self.variables["h"] = "4"
+        self.graph.update("h", self.variables)
+
+        self.assertEqual(self.variables["ratio"], 0.5)
+        self.assertNotIn("ratio", self.graph.errors)
+
+    def test_long_chain(self):
+        self.define("c0", "w 1 +")
+        for index in range(1, 3000):
+            self.define(f"c{index}", f"c{index - 1} 1 +")
+
+        self.variables["w"] = "0"
+        updated = self.graph.update("w", self.variables)
+
+        self.assertEqual(len(updated), 3003)
+        self.assertEqual(self.variables["c2999"], 3000.0)
+
+
+class TestCalculatorFormulas(unittest.TestCase):
+    def setUp(self):
+        self.io = BufferedIO()
+        self.calc = Calculator(self.io)
+        self.calc.assign("w", "2")
+        self.calc.assign("h", "3")
+
+    def test_assign_formula(self):
+        self.calc.assign("area", "w*h")
+        self.calc.assign("w", "5")
+
+        self.assertEqual(self.calc.calculate("area+1"), 16.0)
+
+    def test_formula_through_menu(self):
+        self.io.feed("var", "set", "area", "w*h", "list", "", "")
+
+        self.calc.start()
+
+        self.assertIn("area = w*h", self.io.outputs)
+        self.assertEqual(self.calc.variables["area"], 6.0)
+
+    def test_cycle_through_menu(self):
+        self.calc.assign("area", "w*h")
+        self.io.feed("var", "set", "w", "area", "4", "", "")
+
+        self.calc.start()
+
+        self.assertIn("formula for w would depend on itself", self.io.outputs)
+        self.assertEqual(self.calc.variables["area"], 12.0)
+
+    def test_invalid_formula(self):
+        with self.assertRaises(ValueError):
+            self.calc.assign("area", "w*")
+        with self.assertRaises(ValueError):
+            self.calc.assign("area", "w*depth")
+
+    def test_literal_replaces_formula(self):
+        self.calc.assign("area", "w*h")
+        self.calc.assign("area", "7")
+        self.calc.assign("w", "10")
+
+        self.assertEqual(self.calc.variables["area"], 7)
+
+    def test_delete_input(self):
+        self.calc.assign("area", "w*h")
+
+        self.calc.del_variable("w")
+
+        self.assertNotIn("area", self.calc.variables)
+        self.assertIsInstance(self.calc.formulas.errors["area"], UnknownInputError)
+        self.calc.assign("w", "1")
+        self.assertEqual(self.calc.variables["area"], 3.0)
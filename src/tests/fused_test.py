@@ -0,0 +1,95 @@
+import random
+import unittest
+from calculator import Calculator
+from calculator_io import BufferedIO
+from errors import InvalidInputError, MismatchedParenthesesError, UnknownInputError
+from evaluator import Evaluator
+from fused import evaluate_fused
+from registry import public_functions
+from shunting_yard import ShuntingYard
+
+errors = (ArithmeticError, ValueError, TypeError, InvalidInputError, IndexError,
+          MismatchedParenthesesError, UnknownInputError)
+
+
+def random_expression(rng: random.Random, depth: int) -> str:
+    if depth == 0 or rng.random() < 0.2:
+        return rng.choice(["x", "y", "0", "1", "2", "0.5", "3.25", "10", "-1", "-2.5"])
+    if rng.random() < 0.3:
+        name = rng.choice(public_functions())
+        if name in public_functions(2):
+            first, second = random_expression(rng, depth - 1), random_expression(rng, depth - 1)
+            return f"{name}({first},{second})"
+        return f"{name}({random_expression(rng, depth - 1)})"
+    operator = rng.choice("+-*/^")
+    return f"({random_expression(rng, depth - 1)}){operator}({random_expression(rng, depth - 1)})"
+
+
+class TestFused(unittest.TestCase):
+    def setUp(self):
+        self.variables = {"x": "2", "y": -0.5}
+
+    def two_stage(self, expression):
+        program = ShuntingYard(expression, self.variables).parse()
+        return Evaluator(program, self.variables).evaluate()
+
+    def assert_same(self, expression):
+        try:
+            expected = self.two_stage(expression)
+        except errors as error:
+            with self.assertRaises(type(error), msg=expression):
+                evaluate_fused(expression, self.variables)
+        else:
+            self.assertEqual(evaluate_fused(expression, self.variables), expected, expression)
+
+    def test_random_expressions(self):
+        rng = random.Random(19)
+        for _ in range(500):
+            self.assert_same(random_expression(rng, 4))
+
+    def test_parse_error_wins_over_evaluation_error(self):
+        for expression in ("1/0+(", "1/0+", "ln(0)*z", "1/0)", "(1/0)2", "min(1/0)"):
+            self.assert_same(expression)
+
+    def test_first_evaluation_error_wins(self):
+        with self.assertRaises(ValueError):
+            evaluate_fused("ln(0)+1/0", self.variables)
+        with self.assertRaises(ZeroDivisionError):
+            evaluate_fused("1/0+ln(0)", self.variables)
+
+    def test_malformed_variable_value(self):
+        self.variables["z"] = "abc"
+
+        self.assert_same("1/0+z")
+        self.assert_same("z+1/0")
+
+
+class TestCalculatorFused(unittest.TestCase):
+    def setUp(self):
+        self.io = BufferedIO()
+        self.calc = Calculator(self.io)
+
+    def test_one_off_input_is_not_compiled(self):
+        self.io.feed("2*(3+4)", "1/0")
+
+        self.calc.start()
+
+        self.assertEqual(self.io.outputs[0:2], [14, "ERROR: division by zero"])
+        self.assertEqual(len(self.calc.cache), 0)
+        self.assertEqual(self.calc.cache.misses, 0)
+
+    def test_repeated_input_is_cached(self):
+        self.calc = Calculator(self.io, result_cache_size=0)
+        for _ in range(3):
+            self.assertEqual(self.calc.calculate_input("2^10"), 1024.0)
+
+        self.assertIn("2^10", self.calc.cache)
+        self.assertEqual(self.calc.cache.hits, 1)
+
+    def test_cache_disabled(self):
+        calc = Calculator(BufferedIO(), cache_size=0)
+
+        for _ in range(2):
+            self.assertEqual(calc.calculate_input("1+1"), 2.0)
+
+        self.assertEqual(calc.cache.misses, 0)
@@ -0,0 +1,111 @@
+import random
+import unittest
+import numpy as np
+from compiler import compile_program
+from evaluator import Evaluator
+from graph import ExpressionGraph, evaluate_shared, share_subexpressions
+from program import Program
+from shunting_yard import ShuntingYard, UnknownInputError
+from tests.compiler_test import random_expression
+from vectorized import evaluate_many
+
+errors = (ZeroDivisionError, ValueError, TypeError, OverflowError, UnknownInputError)
+
+
+def repeating_expression(rng: random.Random) -> str:
+    pieces = [random_expression(rng, 2) for _ in range(3)]
+    return "+".join(f"({rng.choice(pieces)})*({rng.choice(pieces)})" for _ in range(4))
+
+
+class TestExpressionGraph(unittest.TestCase):
+    def parse(self, expression):
+        return ShuntingYard(expression, {"a": None, "b": None, "c": None, "x": None,
+                                         "y": None}).parse()
+
+    def outcome(self, evaluate):
+        try:
+            return evaluate()
+        except errors as error:
+            return type(error)
+
+    def test_repeated_subexpression_uses_slot(self):
+        program = share_subexpressions(self.parse("sin(a*b+c)+2*sin(a*b+c)"))
+        variables = {"a": 1, "b": 2, "c": 3}
+
+        self.assertEqual(str(program), "a b * c + sin =0 2 @0 * +")
+        self.assertEqual(Evaluator(program, variables).evaluate(),
+                         Evaluator(self.parse("sin(a*b+c)*3"), variables).evaluate())
+
+    def test_nothing_to_share(self):
+        program = self.parse("a*b+c")
+
+        self.assertIs(share_subexpressions(program), program)
+
+    def test_numbers_are_told_apart(self):
+        graph = ExpressionGraph([Program.from_string("1 sin 1.0 sin +")])
+
+        self.assertEqual(len(graph), 5)
+
+    def test_from_string(self):
+        program = Program.from_string("a sin =0 @0 +")
+
+        self.assertEqual(str(program), "a sin =0 @0 +")
+        self.assertEqual(Evaluator(program, {"a": 0}).evaluate(), 0)
+
+    def test_error_is_kept(self):
+        program = share_subexpressions(self.parse("1/(a-a)+1/(a-a)"))
+
+        with self.assertRaises(ZeroDivisionError):
+            Evaluator(program, {"a": 1}).evaluate()
+
+    def test_graph_of_graph_program(self):
+        program = share_subexpressions(self.parse("(a+b)^(a+b)"))
+
+        self.assertEqual(share_subexpressions(program).instructions, program.instructions)
+
+    def test_deep_program(self):
+        program = self.parse("(a+1)*" * 20000 + "(a+1)")
+
+        shared = share_subexpressions(program)
+
+        self.assertEqual(Evaluator(shared, {"a": 0}).evaluate(), 1.0)
+        self.assertLess(len(shared), len(program))
+
+    def test_differential_random_expressions(self):
+        rng = random.Random(2024)
+        for _ in range(300):
+            program = self.parse(repeating_expression(rng))
+            shared = share_subexpressions(program)
+            compiled = compile_program(shared)
+            xs = [-2, -0.5, 0, 1, 3.5]
+            vectorized = evaluate_many(shared, {"x": np.array(xs, dtype=float), "y": 2})
+            for index, x in enumerate(xs):
+                variables = {"x": x, "y": 2}
+                expected = self.outcome(Evaluator(program, variables).evaluate)
+                self.assertEqual(self.outcome(Evaluator(shared, variables).evaluate), expected)
+                self.assertEqual(self.outcome(lambda: compiled(variables)), expected)
+                if isinstance(expected, type):
+                    self.assertIs(vectorized.errors[index], expected)
+                else:
+                    self.assertEqual(vectorized.values[index], expected)
+
+    def test_evaluate_shared(self):
+        rng = random.Random(2025)
+        programs = [self.parse(repeating_expression(rng)) for _ in range(50)]
+        programs.append(self.parse("x+a"))
+        variables = {"x": 1.5, "y": 2}
+
+        results = evaluate_shared(programs, variables)
+
+        for program, result in zip(programs, results):
+            expected = self.outcome(lambda: Evaluator(program, variables).evaluate())
+            if isinstance(expected, type):
+                self.assertIsInstance(result, expected)
+            else:
+                self.assertEqual(result, expected)
+        self.assertIsInstance(results[-1], UnknownInputError)
+
+    def test_batch_shares_nodes(self):
+        graph = ExpressionGraph([self.parse("sin(a*b)+1"), self.parse("sin(a*b)+2")])
+
+        self.assertEqual(len(graph), 8)
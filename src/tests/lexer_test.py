@@ -0,0 +1,32 @@
+import unittest
+from errors import InvalidInputError
+from lexer import IDENTIFIER, LEFT, NUMBER, OPERATOR, RIGHT, Lexer, Token
+
+
+class TestLexer(unittest.TestCase):
+    def test_tokens(self):
+        tokens = list(Lexer("2.5*sqrt(ab)-1"))
+
+        self.assertEqual(tokens, [Token(NUMBER, "2.5", 0), Token(OPERATOR, "*", 3),
+                                  Token(IDENTIFIER, "sqrt", 4), Token(LEFT, "(", 8),
+                                  Token(IDENTIFIER, "ab", 9), Token(RIGHT, ")", 11),
+                                  Token(OPERATOR, "-", 12), Token(NUMBER, "1", 13)])
+
+    def test_scientific_notation(self):
+        texts = [token.text for token in Lexer("1.5e-3+2E10")]
+
+        self.assertEqual(texts, ["1.5e-3", "+", "2E10"])
+
+    def test_invalid_character(self):
+        with self.assertRaises(InvalidInputError):
+            list(Lexer("1;2"))
+
+    def test_period_must_be_followed_by_digits(self):
+        for expression in ("6.+4", ".6", "1.2.3"):
+            with self.assertRaises(InvalidInputError):
+                list(Lexer(expression))
+
+    def test_tokens_are_lazy(self):
+        tokens = Lexer("1+2;").tokens()
+
+        self.assertEqual(next(tokens).text, "1")
@@ -0,0 +1,59 @@
+import unittest
+from calculator import Calculator
+from calculator_io import BufferedIO
+from evaluator import Evaluator
+from metrics import Metrics
+from program import Program
+from shunting_yard import ShuntingYard
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+
+    def test_parse(self):
+        ShuntingYard("1+sqrt(4)", {}, self.metrics).parse()
+
+        self.assertEqual(self.metrics.timings["parse"].count, 1)
+        self.assertEqual(self.metrics.characters, 9)
+        self.assertEqual(self.metrics.instructions, 4)
+
+    def test_evaluate(self):
+        Evaluator(Program.from_string("1 2 3 * + sin"), {}, self.metrics).evaluate()
+
+        self.assertEqual(self.metrics.max_stack_depth, 3)
+        self.assertEqual(dict(self.metrics.opcodes), {"number": 3, "operator": 2, "function": 1})
+        self.assertEqual(dict(self.metrics.calls), {"*": 1, "+": 1, "sin": 1})
+
+    def test_calculator(self):
+        io = BufferedIO(["1+2", "1+2", "1/0", "2+q", "(1", ""])
+        calculator = Calculator(io, metrics=self.metrics)
+
+        calculator.start()
+
+        stats = calculator.stats()
+        self.assertEqual(stats["timings"]["calculate"]["count"], 5)
+        self.assertEqual(stats["timings"]["parse"]["count"], 2)
+        self.assertEqual(stats["timings"]["io"]["count"], 11)
+        self.assertEqual(stats["errors"], {"ZeroDivisionError": 1, "UnknownInputError": 1,
+                                           "MismatchedParenthesesError": 1})
+        self.assertEqual(stats["cache"]["hits"], 1)
+
+    def test_off_by_default(self):
+        calculator = Calculator(BufferedIO())
+
+        calculator.calculate("1+2")
+
+        self.assertEqual(calculator.stats(), {"cache": calculator.cache.stats(),
+                                              "results": calculator.results.stats()})
+
+    def test_prometheus(self):
+        ShuntingYard("1+2", {}, self.metrics).parse()
+        self.metrics.error(ZeroDivisionError())
+
+        text = self.metrics.prometheus()
+
+        self.assertIn('calculator_phase_seconds_count{phase="parse"} 1', text)
+        self.assertIn('calculator_phase_seconds_bucket{phase="parse",le="+Inf"} 1', text)
+        self.assertIn('calculator_errors_total{type="ZeroDivisionError"} 1', text)
+        self.assertIn("calculator_characters_total 3", text)
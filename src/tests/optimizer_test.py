@@ -0,0 +1,99 @@
+import random
+import unittest
+import numpy as np
+from compiler import compile_program
+from evaluator import Evaluator
+from optimizer import Optimizer, optimize
+from program import Program
+from shunting_yard import ShuntingYard, UnknownInputError
+from tests.compiler_test import random_expression
+from vectorized import evaluate_many
+
+errors = (ZeroDivisionError, ValueError, TypeError, OverflowError, UnknownInputError)
+
+
+class TestOptimizer(unittest.TestCase):
+    def optimize(self, expression):
+        return optimize(ShuntingYard(expression, {"x": None, "y": None}).parse())
+
+    def assert_same(self, program, variables):
+        optimized = optimize(program)
+        try:
+            expected = Evaluator(program, variables).evaluate()
+        except errors as error:
+            with self.assertRaises(type(error), msg=str(program)):
+                Evaluator(optimized, variables).evaluate()
+        else:
+            self.assertEqual(Evaluator(optimized, variables).evaluate(), expected,
+                             (str(program), variables))
+
+    def test_constant_folding(self):
+        self.assertEqual(str(self.optimize("2*3.5/5*x")), "1.4 x *")
+
+    def test_function_folding(self):
+        self.assertEqual(str(self.optimize("sqrt(16)+x")), "4.0 x +")
+
+    def test_identities(self):
+        self.assertEqual(str(self.optimize("sin(x)*1+0")), "x sin")
+        self.assertEqual(str(self.optimize("1*(x+y)/1")), "x y +")
+        self.assertEqual(str(self.optimize("(x-y)^1-0")), "x y -")
+
+    def test_identity_keeps_float_conversion(self):
+        self.assertEqual(str(self.optimize("x*1")), "x _float")
+        self.assertEqual(str(self.optimize("1*x+0-0")), "x _float")
+        self.assertIsInstance(Evaluator(self.optimize("x^1"), {"x": 3}).value(), float)
+        with self.assertRaises(OverflowError):
+            Evaluator(self.optimize("x/1"), {"x": 10 ** 400}).evaluate()
+
+    def test_strength_reduction(self):
+        self.assertEqual(str(self.optimize("x^2+y^0.5")), "x _square y _sqrt +")
+
+    def test_zero_division_is_not_folded(self):
+        program = self.optimize("1/0+x")
+
+        self.assertEqual(str(program), "1 0 / x +")
+        with self.assertRaises(ZeroDivisionError):
+            Evaluator(program, {"x": 1}).evaluate()
+
+    def test_overflow_is_kept(self):
+        for x in (1e200, -1e200):
+            with self.assertRaises(OverflowError):
+                Evaluator(self.optimize("x^2"), {"x": x}).evaluate()
+
+    def test_negative_root_is_kept(self):
+        with self.assertRaises(TypeError):
+            Evaluator(self.optimize("x^0.5"), {"x": -4}).evaluate()
+
+    def test_variable_is_not_removed(self):
+        with self.assertRaises(UnknownInputError):
+            Evaluator(self.optimize("sin(y)*1"), {}).evaluate()
+
+    def test_eliminated(self):
+        optimizer = Optimizer(Program.from_string("2 3 * x * 1 *"))
+
+        optimizer.optimize()
+
+        self.assertEqual(optimizer.eliminated, 4)
+
+    def test_compiled_and_vectorized(self):
+        program = self.optimize("x^2-x^0.5")
+        xs = [-1, 0, 2.25, 1e200]
+
+        result = evaluate_many(program, {"x": np.array(xs, dtype=float)})
+        for index, x in enumerate(xs):
+            try:
+                expected = Evaluator(program, {"x": x}).evaluate()
+            except errors as error:
+                self.assertIs(result.errors[index], type(error))
+                with self.assertRaises(type(error)):
+                    compile_program(program)({"x": x})
+            else:
+                self.assertEqual(result.values[index], expected)
+                self.assertEqual(compile_program(program)({"x": x}), expected)
+
+    def test_differential_random_expressions(self):
+        rng = random.Random(2023)
+        for _ in range(500):
+            program = ShuntingYard(random_expression(rng, 4), {"x": None, "y": None}).parse()
+            for x in (-2, -0.5, 0, 1, 3.5, 1e200):
+                self.assert_same(program, {"x": x, "y": 2})
@@ -0,0 +1,55 @@
+import unittest
+import numpy as np
+from batch import evaluate_batch
+from calculator import Calculator
+from parallel import ParallelEvaluator
+from shunting_yard import ShuntingYard
+
+
+class TestParallelEvaluator(unittest.TestCase):
+    def setUp(self):
+        self.evaluator = ParallelEvaluator(workers=2, chunk_size=3, variables={"a": "2"})
+
+    def test_ordered_results(self):
+        expressions = [f"{n}*a" for n in range(20)] + ["1/0"]
+
+        results = list(self.evaluator.evaluate(expressions))
+
+        self.assertEqual(results, [str(float(2 * n)) for n in range(20)]
+                         + ["ERROR: division by zero"])
+
+    def test_unordered_results(self):
+        expressions = (f"{n}+1" for n in range(10))
+
+        results = sorted(self.evaluator.evaluate(expressions, ordered=False))
+
+        self.assertEqual(results, [(n, str(float(n + 1))) for n in range(10)])
+
+    def test_arrays_give_the_same_results_as_serial(self):
+        calculator = Calculator()
+        calculator.assign("x", [1, 2, 3])
+        expressions = ["sum(x)", "x*2", "1+1", "x+[1]"]
+        evaluator = ParallelEvaluator(workers=2, chunk_size=2, variables=calculator.variables)
+
+        results = list(evaluator.evaluate(expressions))
+
+        self.assertEqual(results, evaluate_batch(calculator, expressions))
+        self.assertEqual(results[:3], ["6.0", "[2.0, 4.0, 6.0]", "2.0"])
+
+    def test_evaluate_columns(self):
+        program = ShuntingYard("1/x+y", {"x": None, "y": None}).parse()
+        columns = {"x": np.array([1, 2, 0, 4, 5, 0, 8.0]), "y": np.arange(7.0)}
+
+        values, errors = self.evaluator.evaluate_columns(program, columns)
+
+        self.assertEqual(list(values[[0, 1, 3, 4, 6]]), [1.0, 1.5, 3.25, 4.2, 6.125])
+        self.assertEqual(errors, {2: ZeroDivisionError, 5: ZeroDivisionError})
+        self.assertTrue(np.isnan(values[2]))
+
+    def test_columns_must_match(self):
+        program = ShuntingYard("x+y", {"x": None, "y": None}).parse()
+
+        with self.assertRaisesRegex(ValueError, "column y"):
+            self.evaluator.evaluate_columns(program, {"x": [1.0, 2.0], "y": 3.0})
+        with self.assertRaisesRegex(ValueError, "different lengths"):
+            self.evaluator.evaluate_columns(program, {"x": [1.0, 2.0], "y": [1.0, 2.0, 3.0]})
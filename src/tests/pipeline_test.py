@@ -0,0 +1,120 @@
+import io
+import os
+import tempfile
+import unittest
+import numpy as np
+from errors import UnknownInputError
+from pipeline import Pipeline, parse_formula, run_binary, run_csv, run_pipeline
+
+
+class TestPipeline(unittest.TestCase):
+    def test_parse_formula(self):
+        self.assertEqual(parse_formula(" total = a * b "), ("total", "a * b"))
+        for text in ("total", "Total = 1", "ln = 2", "= 1"):
+            with self.assertRaises(ValueError):
+                parse_formula(text)
+
+    def test_formulas_use_earlier_formulas(self):
+        pipeline = Pipeline(["b = a*2", "c = b+k"], ["a", "unused"], {"k": "1"})
+        results = pipeline.evaluate({"a": np.array([1.0, 2.0])}, 2)
+
+        self.assertEqual(pipeline.inputs, ["a"])
+        self.assertEqual(results["c"][0].tolist(), [3, 5])
+
+    def test_later_formulas_use_exact_values(self):
+        pipeline = Pipeline(["b = a/3", "c = b*3000"], ["a"])
+        results = pipeline.evaluate({"a": np.array([1.0])}, 1)
+
+        self.assertEqual(results["b"][0].tolist(), [0.333])
+        self.assertEqual(results["c"][0].tolist(), [1000])
+
+    def test_failures_propagate(self):
+        pipeline = Pipeline(["b = 1/a", "c = b+1", "d = a+1"], ["a"])
+        results = pipeline.evaluate({"a": np.array([0.0, 1.0])}, 2)
+
+        self.assertEqual(results["c"][1].tolist(), [True, False])
+        self.assertEqual(results["d"][1].tolist(), [False, False])
+        self.assertEqual(pipeline.stats.errors, {"b": 1, "c": 1, "d": 0})
+
+    def test_invalid_formulas(self):
+        with self.assertRaises(ValueError):
+            Pipeline(["a = 1"], ["a"])
+        with self.assertRaises(ValueError):
+            Pipeline(["b = 1", "b = 2"], ["a"])
+        with self.assertRaises(UnknownInputError):
+            Pipeline(["b = c"], ["a"])
+
+
+class TestCSV(unittest.TestCase):
+    def test_appends_columns_in_chunks(self):
+        source = io.StringIO("name,price,qty\na,1.5,2\nb,2,0\nc,3,4\n")
+        output = io.StringIO()
+
+        stats = run_csv(["total = price*qty", "unit = price/qty", "two = 2"], source, output,
+                        chunk_rows=2)
+
+        self.assertEqual(output.getvalue(), "name,price,qty,total,unit,two\n"
+                                            "a,1.5,2,3.0,0.75,2.0\n"
+                                            "b,2,0,0.0,,2.0\n"
+                                            "c,3,4,12.0,0.75,2.0\n")
+        self.assertEqual((stats.rows, stats.chunks), (3, 2))
+        self.assertEqual(stats.errors["unit"], 1)
+        self.assertEqual(set(stats.stats()["stages"]), {"read", "evaluate", "write"})
+
+    def test_invalid_number(self):
+        with self.assertRaisesRegex(ValueError, "line 3"):
+            run_csv(["b = a+1"], io.StringIO("a\n1\nx\n"), io.StringIO())
+
+    def test_missing_field(self):
+        with self.assertRaisesRegex(ValueError, "line 2"):
+            run_csv(["c = b+1"], io.StringIO("a,b\n1\n"), io.StringIO())
+
+    def test_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source, destination = (os.path.join(directory, name) for name in ("in", "out"))
+            with open(source, "w", encoding="utf-8") as stream:
+                stream.write("x\n4\n9\n")
+
+            run_pipeline(["root = sqrt(x)"], source, destination)
+
+            with open(destination, encoding="utf-8") as stream:
+                self.assertEqual(stream.read(), "x,root\n4,2.0\n9,3.0\n")
+
+
+class TestBinary(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.path = self.directory.name
+        np.arange(10, dtype="<f8").tofile(os.path.join(self.path, "x.f64"))
+        np.full(10, 2.0).astype("<f8").tofile(os.path.join(self.path, "y.f64"))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read(self, name):
+        return np.fromfile(os.path.join(self.path, name + ".f64"), dtype="<f8")
+
+    def test_appends_columns(self):
+        stats = run_pipeline(["z = x^y", "w = ln(x)"], self.path, self.path, chunk_rows=3)
+
+        self.assertEqual(self.read("z").tolist(), [x ** 2 for x in range(10)])
+        self.assertTrue(np.isnan(self.read("w")[0]))
+        self.assertEqual(self.read("w")[1], 0)
+        self.assertEqual((stats.rows, stats.chunks, stats.errors["w"]), (10, 4, 1))
+
+    def test_other_destination_and_constant(self):
+        destination = os.path.join(self.path, "out")
+
+        run_binary(["one = 1"], self.path, destination)
+
+        self.assertEqual(np.fromfile(os.path.join(destination, "one.f64")).tolist(), [1] * 10)
+
+    def test_different_lengths(self):
+        np.zeros(3).tofile(os.path.join(self.path, "y.f64"))
+
+        with self.assertRaises(ValueError):
+            run_binary(["z = x+y"], self.path, self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from prepared import prepare
+from shunting_yard import InvalidInputError, UnknownInputError
+
+
+class TestPreparedExpression(unittest.TestCase):
+    def setUp(self):
+        self.quadratic = prepare("a*x^2+b*x+c", ["a", "b", "c", "x"])
+
+    def test_evaluate_with_bindings(self):
+        self.assertEqual(self.quadratic.evaluate(a=1, b=2, c=3, x=4), 27)
+
+    def test_reevaluate_without_parsing(self):
+        program = self.quadratic.program
+
+        results = [self.quadratic.evaluate(a=1, b=0, c=0, x=x) for x in range(4)]
+
+        self.assertEqual(results, [0, 1, 4, 9])
+        self.assertIs(self.quadratic.program, program)
+
+    def test_names(self):
+        self.assertEqual(self.quadratic.names, {"a", "b", "c", "x"})
+
+    def test_names_are_inferred(self):
+        prepared = prepare("a*x^2+b*x+c-sin(x)+max(x, 1)")
+
+        self.assertEqual(prepared.names, {"a", "b", "c", "x"})
+        self.assertEqual(prepare("a*x^2+b*x+c").evaluate(a=1, b=2, c=3, x=4), 27)
+        self.assertEqual(prepare("1+2").evaluate(), 3)
+
+    def test_function_names_arent_variables(self):
+        with self.assertRaises(InvalidInputError):
+            prepare("ln+1")
+        with self.assertRaises(ValueError):
+            prepare("ln+1", ["ln"])
+
+    def test_strict(self):
+        with self.assertRaises(ValueError):
+            prepare("a*x", strict=True)
+        with self.assertRaises(UnknownInputError):
+            prepare("a*xx", ["a", "x"], strict=True)
+
+    def test_defaults(self):
+        prepared = prepare("a+b", {"a": "2.5", "b": "1"})
+
+        self.assertEqual(prepared.evaluate(), 3.5)
+        self.assertEqual(prepared.evaluate(b=2), 4.5)
+
+    def test_unbound_name_at_prepare_time(self):
+        with self.assertRaises(UnknownInputError):
+            prepare("a*y", ["a"])
+
+    def test_missing_binding(self):
+        with self.assertRaises(UnknownInputError):
+            self.quadratic.evaluate(a=1)
@@ -0,0 +1,84 @@
+import pickle
+import random
+import unittest
+from evaluator import Evaluator
+from program import FUNCTION, NUMBER, OPERATOR, CompactProgram, Program, to_number
+from shunting_yard import ShuntingYard, UnknownInputError
+from tests.compiler_test import random_expression
+
+
+class TestProgram(unittest.TestCase):
+    def test_to_number(self):
+        self.assertEqual(type(to_number("3")), int)
+        self.assertEqual(type(to_number("-3.5")), float)
+
+    def test_parse_returns_typed_instructions(self):
+        program = ShuntingYard("2.5*sqrt(4)", {}).parse()
+
+        self.assertEqual(program.instructions,
+                         [(NUMBER, 2.5), (NUMBER, 4), (FUNCTION, "sqrt"), (OPERATOR, "*")])
+
+    def test_from_string(self):
+        program = Program.from_string("-3 abs 4 +")
+
+        self.assertEqual(program.instructions,
+                         [(NUMBER, -3), (FUNCTION, "abs"), (NUMBER, 4), (OPERATOR, "+")])
+
+    def test_string_form(self):
+        program = ShuntingYard("3*(4+6)", {}).parse()
+
+        self.assertEqual(str(program), "3 4 6 + *")
+        self.assertEqual(Program.from_string(str(program)), program)
+
+
+class TestCompactProgram(unittest.TestCase):
+    def test_tables(self):
+        program = Program.from_string("a 2 * a 2.0 * + sin =0 @0 +").compact()
+
+        self.assertEqual(program.constants, [2, 2.0])
+        self.assertEqual(program.variables, ["a"])
+        self.assertEqual(program.symbols, ["*", "+", "sin"])
+        self.assertEqual(program.names, {"a"})
+        self.assertEqual((program.max_depth, program.slots), (3, 1))
+
+    def test_same_instructions(self):
+        program = Program.from_string("-3 abs 4 + x ^")
+
+        self.assertEqual(program.compact().instructions, program.instructions)
+        self.assertEqual(str(program.compact()), str(program))
+
+    def test_bytes_round_trip(self):
+        program = Program.from_string("12345678901234567890 0.1 -0.0 + * y sqrt =0 @0 / -")
+        compact = program.compact()
+
+        loaded = CompactProgram.from_bytes(compact.to_bytes())
+
+        self.assertEqual(loaded, program)
+        self.assertEqual(repr(loaded.constants), repr(compact.constants))
+        self.assertEqual(loaded.max_depth, compact.max_depth)
+
+    def test_pickle(self):
+        compact = Program.from_string("a 1 +").compact()
+
+        self.assertEqual(pickle.loads(pickle.dumps(compact)), compact)
+
+    def test_corrupt_bytes(self):
+        data = Program.from_string("a 1 + 2 *").compact().to_bytes()
+
+        for broken in (data[:10], data[:-1], b"XYZ" + data[3:], data[:30] + b"\x09" + data[31:]):
+            with self.assertRaises(ValueError):
+                CompactProgram.from_bytes(broken)
+
+    def test_evaluates_like_program(self):
+        rng = random.Random(15)
+        for _ in range(300):
+            program = ShuntingYard(random_expression(rng, 4), {"x": None, "y": None}).parse()
+            compact = CompactProgram.from_bytes(program.compact().to_bytes())
+            for variables in ({"x": -2, "y": 2}, {"x": 3.5, "y": "0.5"}, {"x": 1}):
+                try:
+                    expected = Evaluator(program, variables).evaluate()
+                except (ArithmeticError, ValueError, TypeError, UnknownInputError) as error:
+                    with self.assertRaises(type(error)):
+                        Evaluator(compact, variables).evaluate()
+                else:
+                    self.assertEqual(Evaluator(compact, variables).evaluate(), expected)
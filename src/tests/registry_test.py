@@ -0,0 +1,108 @@
+import unittest
+from math import hypot
+from tempfile import TemporaryDirectory
+from calculator import Calculator
+from calculator_io import BufferedIO
+from compiler import compile_program
+from evaluator import Evaluator
+from program import CompactProgram, Program
+from registry import functions, lookup, public_functions, register_function, \
+    unregister_function
+from shunting_yard import ShuntingYard
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        register_function("hypot", hypot, arity=2)
+        register_function("double", lambda x: 2 * x)
+
+    def tearDown(self):
+        unregister_function("hypot")
+        unregister_function("double")
+
+    def test_lookup(self):
+        self.assertEqual(lookup("^").precedence, 4)
+        self.assertEqual(lookup("^").associativity, "Right")
+        self.assertEqual(lookup("atan2").arity, 2)
+        with self.assertRaises(KeyError):
+            lookup("unknown")
+
+    def test_public_functions(self):
+        self.assertIn("hypot", public_functions(2))
+        self.assertNotIn("hypot", public_functions(1))
+        self.assertNotIn("_square", public_functions())
+
+    def test_invalid_registrations(self):
+        for name, arity in (("sin", 1), ("Big", 1), ("_hidden", 1), ("x2y", 1), ("f", 0)):
+            with self.assertRaises(ValueError, msg=name):
+                register_function(name, abs, arity)
+
+    def test_name_of_a_variable(self):
+        calc = Calculator(BufferedIO())
+        calc.assign("area", "3")
+
+        with self.assertRaises(ValueError):
+            register_function("area", abs, variables=calc.variables)
+        self.assertNotIn("area", functions)
+
+    def test_redefined_function_isnt_cached(self):
+        with TemporaryDirectory() as directory:
+            calc = Calculator(BufferedIO(), cache_dir=directory)
+            self.assertEqual(calc.calculate("double(2)+1"), 5.0)
+            self.assertEqual(calc.calculate("double(2)+1"), 5.0)
+            unregister_function("double")
+            register_function("double", lambda x: 3 * x)
+
+            self.assertEqual(calc.calculate("double(2)+1"), 7.0)
+            self.assertEqual(Calculator(BufferedIO(), cache_dir=directory)
+                             .calculate("double(2)+1"), 7.0)
+
+    def test_builtin_functions_cant_be_unregistered(self):
+        for name in ("sin", "min", "_square"):
+            with self.assertRaises(ValueError, msg=name):
+                unregister_function(name)
+        self.assertIn("sin", functions)
+        with self.assertRaises(KeyError):
+            unregister_function("unknown")
+
+    def test_registered_function_in_every_evaluator(self):
+        program = ShuntingYard("hypot(x,4)+double(x)", {"x": None}).parse()
+
+        self.assertEqual(Evaluator(program, {"x": 3}).evaluate(), 11.0)
+        self.assertEqual(Evaluator(program.compact(), {"x": 3}).evaluate(), 11.0)
+        self.assertEqual(compile_program(program)({"x": 3}), 11.0)
+
+    def test_calculator(self):
+        calc = Calculator(BufferedIO())
+        calc.assign("x", "3")
+
+        self.assertEqual(calc.calculate("hypot(x, 4) * double(2)"), 20.0)
+        self.assertEqual(calc.calculate("min(x, 2) + max(x, 2)"), 5.0)
+        self.assertEqual(calc.calculate("log(8, 2)"), 3.0)
+        self.assertEqual(calc.calculate("atan2(1, 1) * 4"), 3.142)
+        self.assertFalse(calc.check_var_name("hypot"))
+
+    def test_folding(self):
+        calc = Calculator(BufferedIO())
+
+        self.assertEqual(calc.calculate("hypot(3, 4)"), 5.0)
+        self.assertEqual(str(calc.rpn), "5.0")
+
+    def test_compact_program_stack_depth(self):
+        program = Program.from_string("1 2 3 hypot hypot")
+        compact = program.compact()
+
+        self.assertEqual(compact.max_depth, 3)
+        self.assertEqual(CompactProgram.from_bytes(compact.to_bytes()), program)
+        with self.assertRaises(ValueError):
+            CompactProgram.from_bytes(Program.from_string("1 hypot").compact().to_bytes())
+
+    def test_unregistered_function_is_refused_when_loading(self):
+        data = Program.from_string("1 double").compact().to_bytes()
+        unregister_function("double")
+        try:
+            with self.assertRaises(ValueError):
+                CompactProgram.from_bytes(data)
+        finally:
+            register_function("double", lambda x: 2 * x)
+        self.assertIn("double", functions)
@@ -0,0 +1,126 @@
+import unittest
+from calculator import Calculator
+from calculator_io import BufferedIO
+from result_cache import ResultCache
+from variable_store import VariableStore
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = ResultCache(2)
+        self.variables = VariableStore({"a": 1, "b": 2})
+
+    def test_hit(self):
+        self.cache.add("a + b", 3, self.variables)
+
+        self.assertEqual(self.cache.get("a+b", self.variables), 3)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 0))
+
+    def test_changed_variable_is_a_miss(self):
+        self.cache.add("a+1", 2, self.variables)
+        self.variables["a"] = 1
+
+        self.assertIsNone(self.cache.get("a+1", self.variables))
+        self.assertEqual(self.cache.stale, 1)
+        self.assertNotIn("a+1", self.cache)
+
+    def test_deleted_variable_is_a_miss(self):
+        self.cache.add("a+1", 2, self.variables)
+        del self.variables["a"]
+
+        self.assertIsNone(self.cache.get("a+1", self.variables))
+
+    def test_other_variables_dont_matter(self):
+        self.cache.add("sqrt(a)+c", 1, VariableStore({"a": 1}))
+        self.cache.add("sqrt(a)", 1, self.variables)
+        self.variables["b"] = 5
+        self.variables.load({"x": 1}, "tbl")
+
+        self.assertEqual(self.cache.get("sqrt(a)", self.variables), 1)
+
+    def test_name_that_wasnt_set(self):
+        self.cache.add("sum(k,k,1,a)", 1, self.variables)
+        self.variables["k"] = 5
+
+        self.assertIsNone(self.cache.get("sum(k,k,1,a)", self.variables))
+
+    def test_array_result_is_copied(self):
+        self.cache.add("x*2", [2, 4], self.variables)
+
+        self.cache.get("x*2", self.variables).append(6)
+
+        self.assertEqual(self.cache.get("x*2", self.variables), [2, 4])
+
+    def test_eviction(self):
+        for expression in ("1", "2", "3"):
+            self.cache.add(expression, int(expression), self.variables)
+
+        self.assertNotIn("1", self.cache)
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_disabled(self):
+        cache = ResultCache(0)
+        cache.add("1", 1, self.variables)
+
+        self.assertEqual(len(cache), 0)
+
+    def test_stats(self):
+        self.cache.add("a", 1, self.variables)
+        self.cache.get("a", self.variables)
+        self.cache.get("b", self.variables)
+
+        stats = self.cache.stats()
+
+        self.assertEqual((stats["hits"], stats["misses"], stats["hit_rate"]), (1, 1, 0.5))
+        self.assertGreater(stats["bytes"], 0)
+
+
+class TestCalculatorResults(unittest.TestCase):
+    def test_repeated_expression_isnt_evaluated_again(self):
+        calculator = Calculator(BufferedIO())
+
+        calculator.calculate("2^10")
+        calculator.calculate_input("2 ^ 10")
+
+        self.assertEqual(calculator.results.hits, 1)
+        self.assertEqual(calculator.cache.misses, 1)
+
+    def test_never_stale(self):
+        io = BufferedIO(["var", "set", "a", "2", "set", "b", "a*3", "", "b+1", "b+1",
+                         "var", "set", "a", "1", "", "b+1", "var", "del", "a", "", "b+1"])
+        calculator = Calculator(io)
+
+        calculator.start()
+
+        self.assertEqual(io.outputs[-5:-1], [7, 7, 4, "ERROR: unknown input"])
+
+    def test_changing_an_array_result(self):
+        calculator = Calculator(BufferedIO())
+        calculator.assign("x", [1, 2])
+
+        calculator.calculate("x*2")[0] = 5
+
+        self.assertEqual(calculator.calculate("x*2"), [2, 4])
+        self.assertEqual(calculator.results.hits, 1)
+
+    def test_ans(self):
+        io = BufferedIO(["2*3", "ans+1", "ans*2", "1/0", "ans", "var", "set", "ans", "", "",
+                         "list", ""])
+        calculator = Calculator(io)
+
+        calculator.start()
+
+        self.assertEqual(io.outputs[0:5], [6, 7, 14, "ERROR: division by zero", 14])
+        self.assertNotIn("ans", calculator.snapshot()["variables"])
+        self.assertEqual(io.outputs[5:-1], [])
+
+    def test_formula_cant_use_ans(self):
+        calculator = Calculator(BufferedIO(["1", ""]))
+        calculator.start()
+
+        with self.assertRaises(ValueError):
+            calculator.assign("b", "ans*2")
+
+
+if __name__ == "__main__":
+    unittest.main()
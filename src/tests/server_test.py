@@ -0,0 +1,129 @@
+import asyncio
+import json
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from server import CalculatorServer, expected_cost
+from variable_store import VariableStore
+
+
+class TestExpectedCost(unittest.TestCase):
+    def test_cost(self):
+        variables = VariableStore({"x": list(range(1000)), "y": 2})
+
+        self.assertEqual(expected_cost("y*2", variables), 3)
+        self.assertEqual(expected_cost("x*y", variables), 3000)
+        self.assertGreater(expected_cost("integrate(y, y, 0, 1)", variables), 3000)
+        self.assertEqual(expected_cost("y $ 2", variables), 5)
+
+
+class TestCalculatorServer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.executor = ThreadPoolExecutor(1)
+        self.server = CalculatorServer(executor=self.executor, offload_cost=50)
+        self.listener = await self.server.start(port=0)
+        self.port = self.listener.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.listener.close()
+        await self.listener.wait_closed()
+        self.executor.shutdown()
+
+    async def connect(self):
+        return await asyncio.open_connection("127.0.0.1", self.port)
+
+    async def request(self, connection, line: str) -> str:
+        reader, writer = connection
+        writer.write(line.encode() + b"\n")
+        await writer.drain()
+        return (await reader.readline()).decode().strip()
+
+    async def close(self, connection):
+        connection[1].close()
+        await connection[1].wait_closed()
+
+    async def test_plain_expression(self):
+        connection = await self.connect()
+
+        self.assertEqual(await self.request(connection, "1+2"), "3.0")
+        self.assertEqual(await self.request(connection, "1/0"), "ERROR: division by zero")
+        await self.close(connection)
+
+    async def test_sessions_have_own_variables(self):
+        first = await self.connect()
+        second = await self.connect()
+
+        await self.request(first, '{"op": "set", "name": "a", "value": "2"}')
+        await self.request(second, '{"op": "set", "name": "a", "value": "5"}')
+
+        self.assertEqual(await self.request(first, '{"op": "eval", "expr": "a*3"}'),
+                         '{"result": 6.0}')
+        self.assertEqual(await self.request(second, '{"op": "eval", "expr": "a*3"}'),
+                         '{"result": 15.0}')
+        stats = json.loads(await self.request(first, '{"op": "stats"}'))
+        self.assertEqual(stats["cache"]["hits"], 1)
+        self.assertEqual(stats["sessions"], 2)
+        await self.close(first)
+        await self.close(second)
+
+    async def test_variable_requests(self):
+        connection = await self.connect()
+
+        self.assertEqual(await self.request(connection, '{"op": "set", "name": "a1", "value": "2"}'),
+                         '{"error": "invalid variable name \'a1\'"}')
+        await self.request(connection, '{"op": "set", "name": "b", "value": 4}')
+        self.assertEqual(await self.request(connection, '{"op": "list"}'),
+                         '{"variables": {"b": 4}}')
+        self.assertEqual(await self.request(connection, '{"op": "del", "name": "c"}'),
+                         '{"error": "Variable c not found"}')
+        self.assertEqual(await self.request(connection, '{"op": "del", "name": "b"}'),
+                         '{"ok": true}')
+        await self.close(connection)
+
+    async def test_invalid_requests(self):
+        connection = await self.connect()
+
+        self.assertEqual(await self.request(connection, '{"op": '),
+                         '{"error": "invalid request"}')
+        self.assertEqual(await self.request(connection, '{"op": "eval"}'),
+                         '{"error": "invalid request"}')
+        self.assertEqual(await self.request(connection, '{"op": "nope"}'),
+                         '{"error": "unknown op \'nope\'"}')
+        await self.close(connection)
+
+    async def test_invalid_bytes_keep_the_session(self):
+        connection = await self.connect()
+
+        connection[1].write(b"1+\xff\n")
+        await connection[1].drain()
+
+        self.assertEqual((await connection[0].readline()).decode().strip(),
+                         '{"error": "invalid request: not UTF-8"}')
+        self.assertEqual(await self.request(connection, '{"op": "eval", "expr": 1}'),
+                         '{"error": "invalid request: expr must be a string"}')
+        self.assertEqual(await self.request(connection, "1+1"), "2.0")
+        await self.close(connection)
+
+    async def test_long_expression_uses_executor(self):
+        connection = await self.connect()
+
+        with patch.object(self.executor, "submit", wraps=self.executor.submit) as submit:
+            self.assertEqual(await self.request(connection, "+".join(["1"] * 100)), "100.0")
+            self.assertEqual(await self.request(connection, "1+1"), "2.0")
+
+        self.assertEqual(submit.call_count, 1)
+        await self.close(connection)
+
+    async def test_expensive_expressions_use_the_session(self):
+        connection = await self.connect()
+        await self.request(connection, '{"op": "set", "name": "x", "value": "[1, 2, 3]"}')
+
+        with patch.object(self.executor, "submit", wraps=self.executor.submit) as submit:
+            self.assertEqual(await self.request(connection, "sum(k, k, 1, 10)"), "55.0")
+            self.assertEqual(await self.request(connection, "solve(x^2-4, x, 0, 5)"), "2.0")
+            self.assertEqual(await self.request(connection, "sum(x)"), "6.0")
+
+        self.assertEqual(submit.call_count, 2)
+        self.server.offload_cost = 1
+        self.assertEqual(await self.request(connection, "x*2"), "[2.0, 4.0, 6.0]")
+        await self.close(connection)
@@ -1,4 +1,5 @@
 import unittest
+from evaluator import Evaluator
 from shunting_yard import InvalidInputError, MismatchedParenthesesError, ShuntingYard, UnknownInputError
 
 
@@ -11,35 +12,35 @@ class TestShuntingYard(unittest.TestCase):
 
         result = self.shunting_yard.parse()
 
-        self.assertEqual(result, "1 2 +")
+        self.assertEqual(str(result), "1 2 +")
 
     def test_minus(self):
         self.shunting_yard.expression = "1-2"
 
         result = self.shunting_yard.parse()
 
-        self.assertEqual(result, "1 2 -")
+        self.assertEqual(str(result), "1 2 -")
 
     def test_decimal(self):
         self.shunting_yard.expression = "1.235+4"
 
         result = self.shunting_yard.parse()
 
-        self.assertEqual(result, "1.235 4 +")
+        self.assertEqual(str(result), "1.235 4 +")
 
     def test_division(self):
         self.shunting_yard.expression = "2/3"
 
         result = self.shunting_yard.parse()
 
-        self.assertEqual(result, "2 3 /")
+        self.assertEqual(str(result), "2 3 /")
 
     def test_parentheses(self):
         self.shunting_yard.expression = "3*(4+6)^3-(2+1)*4"
 
         result = self.shunting_yard.parse()
 
-        self.assertEqual(result, "3 4 6 + 3 ^ * 2 1 + 4 * -")
+        self.assertEqual(str(result), "3 4 6 + 3 ^ * 2 1 + 4 * -")
 
     def test_short_variable(self):
         self.shunting_yard.expression = "a+3"
@@ -47,7 +48,7 @@ class TestShuntingYard(unittest.TestCase):
 
         result = self.shunting_yard.parse()
 
-        self.assertEqual(result, "5 3 +")
+        self.assertEqual(str(result), "a 3 +")
 
     def test_invalid_input(self):
         self.shunting_yard.expression = "1,2+3"
@@ -84,7 +85,7 @@ class TestShuntingYard(unittest.TestCase):
 
         result = self.shunting_yard.parse()
 
-        self.assertEqual(result, "-5 -6 +")
+        self.assertEqual(str(result), "-5 -6 +")
 
     def test_parentheses_left_in_opstack(self):
         self.shunting_yard.expression = "3*(4+8)("
@@ -110,7 +111,7 @@ class TestShuntingYard(unittest.TestCase):
 
         result = self.shunting_yard.parse()
 
-        self.assertEqual(result, "4 9 sqrt +")
+        self.assertEqual(str(result), "4 9 sqrt +")
 
     def test_invalid_precedes_var(self):
         self.shunting_yard.expression = "3ab+4"
@@ -124,7 +125,7 @@ class TestShuntingYard(unittest.TestCase):
 
         result = self.shunting_yard.parse()
 
-        self.assertEqual(result, "3 3 * 4 +")
+        self.assertEqual(str(result), "3 alpha * 4 +")
 
     def test_var_followed_by_invalid(self):
         self.shunting_yard.expression = "alpha3-4"
@@ -133,6 +134,42 @@ class TestShuntingYard(unittest.TestCase):
         with self.assertRaises(InvalidInputError):
             self.shunting_yard.parse()
 
+    def test_function_arguments(self):
+        self.shunting_yard.expression = "max(1+2,-3)*log(8,2^1)"
+
+        result = self.shunting_yard.parse()
+
+        self.assertEqual(str(result), "1 2 + -3 max 8 2 1 ^ log *")
+
+    def test_nested_function_arguments(self):
+        self.shunting_yard.expression = "min(atan2(1,2),(3,4)"
+
+        with self.assertRaises(InvalidInputError):
+            self.shunting_yard.parse()
+
+        self.shunting_yard.expression = "min(atan2(1,2),abs(3))"
+
+        self.assertEqual(str(self.shunting_yard.parse()), "1 2 atan2 3 abs min")
+
+    def test_wrong_number_of_arguments(self):
+        for expression in ("atan2(1)", "abs(1,2)", "log(1,2,3)"):
+            self.shunting_yard.expression = expression
+
+            with self.assertRaises(InvalidInputError):
+                self.shunting_yard.parse()
+
+    def test_variadic_function(self):
+        self.shunting_yard.expression = "min(1,2,3)"
+
+        self.assertEqual(str(self.shunting_yard.parse()), "1 2 3 min min")
+
+    def test_misplaced_comma(self):
+        for expression in ("1,2", "(1,2)", "min(,2)", "min(1,)", "min(1,2),3", "min(1-,2)"):
+            self.shunting_yard.expression = expression
+
+            with self.assertRaises(InvalidInputError, msg=expression):
+                self.shunting_yard.parse()
+
     def test_function_missing_parentheses(self):
         self.shunting_yard.expression = "2+lb3"
 
@@ -150,4 +187,65 @@ class TestShuntingYard(unittest.TestCase):
 
         result = self.shunting_yard.parse()
 
-        self.assertEqual(result, "0 2 1 + -")
+        self.assertEqual(str(result), "0 2 1 + -")
+
+    def test_scientific_notation(self):
+        self.shunting_yard.expression = "1.5e-3*2e2"
+
+        result = self.shunting_yard.parse()
+
+        self.assertEqual(str(result), "0.0015 200.0 *")
+
+    def test_minus_after_variable(self):
+        self.shunting_yard.expression = "a-sqrt(4)"
+        self.shunting_yard.variables = {"a": "5"}
+
+        result = self.shunting_yard.parse()
+
+        self.assertEqual(str(result), "a 4 sqrt -")
+
+    def test_negated_variable(self):
+        self.shunting_yard.expression = "-a^2"
+        self.shunting_yard.variables = {"a": "5"}
+
+        result = self.shunting_yard.parse()
+
+        self.assertEqual(str(result), "0 a 2 ^ -")
+
+    def test_negation_binds_looser_than_power(self):
+        for expression in ("-2^2", "-a^2", "-(2)^2", "-(a)^2"):
+            self.shunting_yard.expression = expression
+            self.shunting_yard.variables = {"a": 2}
+
+            program = self.shunting_yard.parse()
+
+            self.assertEqual(Evaluator(program, {"a": 2}).evaluate(), -4, expression)
+        self.shunting_yard.expression = "-2*3+(-2)^2"
+        self.assertEqual(str(self.shunting_yard.parse()), "-2 3 * -2 2 ^ +")
+
+    def test_number_too_large(self):
+        for expression in ("1e400", "1e400-1e400"):
+            self.shunting_yard.expression = expression
+
+            with self.assertRaises(InvalidInputError):
+                self.shunting_yard.parse()
+
+    def test_function_with_nested_parentheses(self):
+        self.shunting_yard.expression = "sqrt((1)+3)"
+
+        result = self.shunting_yard.parse()
+
+        self.assertEqual(str(result), "1 3 + sqrt")
+
+    def test_incomplete_expression(self):
+        for expression in ("1+", "", "(1+)", "3(4)"):
+            self.shunting_yard.expression = expression
+            with self.assertRaises(InvalidInputError):
+                self.shunting_yard.parse()
+
+    def test_long_expression(self):
+        self.shunting_yard.expression = "+".join(["sin(1.5)-2"] * 100000)
+
+        result = self.shunting_yard.parse()
+
+        self.assertEqual(len(result), 100000 * 4 + 99999)
@@ -0,0 +1,116 @@
+import io
+import tracemalloc
+import unittest
+from itertools import repeat
+from errors import InvalidInputError, MismatchedParenthesesError, UnknownInputError
+from lexer import MAX_TOKEN_LENGTH, StreamLexer
+from program import Program
+from shunting_yard import ShuntingYard
+from streaming import RPNWriter, parse_stream, read_chunks
+
+
+class NullWriter:
+    def write(self, text):
+        pass
+
+
+class TestStreamLexer(unittest.TestCase):
+    def test_tokens_split_between_chunks(self):
+        expression = "atan2(-1.5e-3,x)+max(alpha,22)*(3.25^2)"
+        expected = [(token.kind, token.text, token.position)
+                    for token in StreamLexer([expression])]
+        for size in range(1, len(expression) + 1):
+            chunks = [expression[start:start + size]
+                      for start in range(0, len(expression), size)]
+
+            tokens = [(token.kind, token.text, token.position) for token in StreamLexer(chunks)]
+
+            self.assertEqual(tokens, expected, size)
+
+    def test_whitespace_separates_tokens(self):
+        texts = [token.text for token in StreamLexer(["1 +\n", "x\t* atan2 ", " (y,z)"])]
+
+        self.assertEqual(texts, ["1", "+", "x", "*", "atan2", "(", "y", ",", "z", ")"])
+
+    def test_whitespace_split_between_chunks(self):
+        expression = "atan2 (x2, 1)  +  log2\n( 8 ) - 1e-3 *x"
+        expected = [(token.kind, token.text, token.position)
+                    for token in StreamLexer([expression])]
+        for size in range(1, len(expression) + 1):
+            chunks = [expression[start:start + size]
+                      for start in range(0, len(expression), size)]
+
+            tokens = [(token.kind, token.text, token.position) for token in StreamLexer(chunks)]
+
+            self.assertEqual(tokens, expected, size)
+
+    def test_whitespace_is_a_boundary(self):
+        # an endless stream of tokens separated only by whitespace is tokenized lazily
+        for chunk, text in (("ab ", "ab"), ("12 ", "12"), (" x2\t", "x")):
+            self.assertEqual(next(StreamLexer(repeat(chunk)).tokens()).text, text, chunk)
+        with self.assertRaisesRegex(InvalidInputError, "longer than"):
+            next(StreamLexer(repeat("x")).tokens())
+
+    def test_long_token(self):
+        with self.assertRaisesRegex(InvalidInputError, "position 2 is longer"):
+            list(StreamLexer(["1+", *repeat("2", MAX_TOKEN_LENGTH + 1), "+3"]))
+        tokens = list(StreamLexer(["1+", *repeat("2", MAX_TOKEN_LENGTH), "+3"]))
+        self.assertEqual(len(tokens[2].text), MAX_TOKEN_LENGTH)
+
+    def test_byte_offsets(self):
+        with self.assertRaisesRegex(InvalidInputError, "position 6"):
+            list(StreamLexer([b"1+2*", "(3".encode(), "π)".encode("utf-8")]))
+
+
+class TestParseStream(unittest.TestCase):
+    def setUp(self):
+        self.variables = {"x": "2", "alpha": "3"}
+
+    def test_same_program_as_shunting_yard(self):
+        for expression in ("1+2*3", "-(x+1)^2^0.5", "max(alpha,-1)*sin(x)/lb(8)",
+                           "log(100,10)-atan2(x,alpha)"):
+            expected = ShuntingYard(expression, self.variables).parse()
+            for size in (1, 2, 5, 64):
+                program = parse_stream(io.StringIO(expression), self.variables)
+                self.assertEqual(program, expected)
+                chunks = read_chunks(io.BytesIO(expression.encode()), size)
+                self.assertEqual(parse_stream(chunks, self.variables), expected)
+
+    def test_output(self):
+        output = io.StringIO()
+
+        writer = parse_stream(["2*(x", "+1)"], self.variables, RPNWriter(output))
+
+        self.assertEqual(output.getvalue(), "2 x 1 + *")
+        self.assertEqual(writer.count, 5)
+        self.assertEqual(output.getvalue(), str(Program.from_string("2 x 1 + *")))
+
+    def test_errors_tell_the_offset(self):
+        cases = [([b"1+", b"2 3"], InvalidInputError, "position 4"),
+                 ([b"1+(2", b"*y)"], UnknownInputError, "position 5"),
+                 ([b"(1+2))"], IndexError, "position 5"),
+                 ([b"abs(1", b",2)"], InvalidInputError, "position 7"),
+                 ([b"1,2"], InvalidInputError, "position 1")]
+        for chunks, error, message in cases:
+            with self.assertRaisesRegex(error, message, msg=chunks):
+                parse_stream(chunks, self.variables)
+        with self.assertRaises(MismatchedParenthesesError):
+            parse_stream(["(1"], self.variables)
+        with self.assertRaises(InvalidInputError):
+            parse_stream([""], self.variables)
+
+    def test_memory_does_not_grow_with_the_input(self):
+        def chunks():
+            for _ in range(500):
+                yield "x*2+(1-x)/3+" * 20
+            yield "1"
+
+        tracemalloc.start()
+        try:
+            writer = parse_stream(chunks(), self.variables, RPNWriter(NullWriter()))
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(writer.count, 500 * 20 * 10 + 1)
+        self.assertLess(peak, 200_000)
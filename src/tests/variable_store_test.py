@@ -0,0 +1,134 @@
+import io
+import pickle
+import unittest
+from calculator import Calculator
+from calculator_io import BufferedIO
+from lexer import Lexer
+from shunting_yard import ShuntingYard
+from variable_store import VariableStore, flatten, to_value
+
+
+class TestVariableStore(unittest.TestCase):
+    def setUp(self):
+        self.store = VariableStore({"a": "2", "b": 1.5})
+
+    def test_values_are_numbers(self):
+        self.store["c"] = "-3.25"
+
+        self.assertEqual(self.store, {"a": 2, "b": 1.5, "c": -3.25})
+        self.assertIsInstance(self.store["a"], int)
+
+    def test_invalid_values(self):
+        for value in ("x", True, None, [], [True], [[1]], "[1,]"):
+            with self.assertRaises(ValueError):
+                to_value(value)
+        with self.assertRaises(ValueError):
+            self.store["c"] = "1+1"
+
+    def test_versions(self):
+        version = self.store.version
+        self.store["a"] = 3
+
+        self.assertEqual(self.store.version, version + 1)
+        self.assertEqual(self.store.version_of("a"), version + 1)
+        self.assertEqual(self.store.version_of("c"), 0)
+
+        del self.store["a"]
+
+        self.assertEqual(self.store.version_of("a"), version + 2)
+
+    def test_every_change_is_versioned(self):
+        for change in (lambda store: store.pop("a"), lambda store: store.popitem(),
+                       lambda store: store.setdefault("c", 1), lambda store: store.clear(),
+                       lambda store: store.update(c=1)):
+            version = self.store.version
+
+            change(self.store)
+
+            self.assertGreater(self.store.version, version)
+
+    def test_load_is_one_change(self):
+        version = self.store.version
+
+        count = self.store.load({f"x{'a' * i}": i for i in range(1000)})
+
+        self.assertEqual((count, self.store.version), (1000, version + 1))
+
+    def test_load_checks_everything_first(self):
+        for values in ({"c": 1, "D": 2}, {"c": 1, "d": "x"}, {"c": 1, 2: 2}):
+            with self.assertRaises(ValueError):
+                self.store.load(values)
+        self.assertNotIn("c", self.store)
+
+    def test_namespaces(self):
+        self.store.load({"x": 1, "sub": {"y": 2}}, "tbl")
+
+        self.assertEqual(self.store.namespace("tbl"), {"x": 1, "sub.y": 2})
+        self.assertEqual(flatten({"a": {"b": {"c": 1}}}), {"a.b.c": 1})
+        self.assertEqual(self.store.drop("tbl"), 2)
+        self.assertEqual(self.store, {"a": 2, "b": 1.5})
+        self.assertNotEqual(self.store.version_of("tbl.x"), 0)
+
+    def test_json(self):
+        stream = io.StringIO()
+        self.store.dump_json(stream)
+        stream.seek(0)
+        other = VariableStore()
+
+        self.assertEqual(other.load_json(stream, "tbl"), 2)
+        self.assertEqual(other, {"tbl.a": 2, "tbl.b": 1.5})
+        with self.assertRaises(ValueError):
+            other.load_json(io.StringIO("[1]"))
+
+    def test_binary(self):
+        self.store["big"] = 2 ** 62 + 1
+        stream = io.BytesIO()
+        self.store.dump_binary(stream)
+        stream.seek(0)
+        other = VariableStore()
+
+        other.load_binary(stream)
+
+        self.assertEqual(other, self.store)
+        self.assertIsInstance(other["big"], int)
+        with self.assertRaises(ValueError):
+            other.load_binary(io.BytesIO(b"CALCVAR0"))
+
+    def test_binary_overflow(self):
+        self.store["big"] = 2 ** 64
+
+        with self.assertRaises(ValueError):
+            self.store.dump_binary(io.BytesIO())
+
+    def test_pickle(self):
+        copy = pickle.loads(pickle.dumps(self.store))
+
+        self.assertIsInstance(copy, VariableStore)
+        self.assertEqual(copy, self.store)
+
+
+class TestNamespacedNames(unittest.TestCase):
+    def test_lexer(self):
+        texts = [token.text for token in Lexer("tbl.x*2")]
+
+        self.assertEqual(texts, ["tbl.x", "*", "2"])
+
+    def test_parse(self):
+        program = ShuntingYard("tbl.x+y", {"tbl.x": 1, "y": 2}).parse()
+
+        self.assertEqual(program.names, {"tbl.x", "y"})
+
+    def test_calculator(self):
+        io_ = BufferedIO(["var", "set", "tbl.x", "4", "", "tbl.x*2", "var", "set", "Tbl.x", "",
+                          "", "tbl.x"])
+        calculator = Calculator(io_)
+        calculator.variables.load({"y": 1}, "tbl")
+
+        calculator.start()
+
+        self.assertIn(8, io_.outputs)
+        self.assertEqual(calculator.variables.namespace("tbl"), {"x": 4, "y": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import numpy as np
+from evaluator import Evaluator
+from registry import register_function, unregister_function
+from shunting_yard import ShuntingYard, UnknownInputError
+from vectorized import VectorEvaluator, evaluate_many
+
+
+class TestVectorEvaluator(unittest.TestCase):
+    def setUp(self):
+        self.xs = [-2.5, -1, -0.5, 0, 0.5, 1, 2, 3.25, 710, 1e200]
+
+    def compile(self, expression):
+        return ShuntingYard(expression, {"x": None, "y": None}).parse()
+
+    def assert_matches_scalar(self, expression):
+        program = self.compile(expression)
+        result = evaluate_many(program, {"x": np.array(self.xs), "y": 2})
+        for index, x in enumerate(self.xs):
+            try:
+                expected = Evaluator(program, {"x": x, "y": 2}).evaluate()
+            except (ZeroDivisionError, ValueError, TypeError, OverflowError) as error:
+                self.assertIs(result.errors[index], type(error), (expression, x))
+                self.assertTrue(np.isnan(result.values[index]))
+            else:
+                self.assertIsNone(result.errors[index], (expression, x))
+                self.assertEqual(result.values[index], expected, (expression, x))
+
+    def test_operators(self):
+        for expression in ("x+y", "x-y*3", "x*x", "y/x", "x^y", "x^0.5", "0^x", "x^(-1)",
+                           "10^x", "(x+1)/(x-1)"):
+            self.assert_matches_scalar(expression)
+
+    def test_functions(self):
+        for name in ("abs", "cos", "exp", "lb", "lg", "ln", "sin", "sqrt", "tan"):
+            self.assert_matches_scalar(f"{name}(x)*3+1")
+
+    def test_functions_of_two_arguments(self):
+        for expression in ("min(x,y)", "max(y,x)", "atan2(x,y)", "log(x,y)", "log(y,x)",
+                           "log(x,1)"):
+            self.assert_matches_scalar(expression)
+
+    def test_registered_function(self):
+        register_function("clamp", lambda x, limit: x if x < limit else limit / (x - 2),
+                          arity=2)
+        try:
+            self.assert_matches_scalar("clamp(x,y)+1")
+        finally:
+            unregister_function("clamp")
+
+    def test_error_does_not_abort_batch(self):
+        result = evaluate_many(self.compile("1/x"), {"x": [1, 0, 4]})
+
+        self.assertEqual(list(result.ok), [True, False, True])
+        self.assertEqual(result.values[2], 0.25)
+        self.assertIs(result.errors[1], ZeroDivisionError)
+
+    def test_first_error_is_kept(self):
+        result = evaluate_many(self.compile("sqrt(1/x)"), {"x": [0]})
+
+        self.assertIs(result.errors[0], ZeroDivisionError)
+
+    def test_rounding_matches_round(self):
+        values = np.array([0.0005, 1.0005, 2.675, -0.0015, 1e306, 123.4565])
+
+        self.assertEqual(list(VectorEvaluator.round(values)), [round(float(v), 3) for v in values])
+
+    def test_rounding_of_large_values_matches_evaluator(self):
+        xs = np.random.default_rng(0).uniform(1e13, 1e16, 10000).tolist()
+        xs.append(1.0101010101010097e+199)
+        program = self.compile("x*1.1")
+
+        result = evaluate_many(program, {"x": xs})
+
+        self.assertEqual(result.values.tolist(),
+                         [Evaluator(program, {"x": x}).evaluate() for x in xs])
+
+    def test_constant_program(self):
+        result = evaluate_many(self.compile("2*3"), {})
+
+        self.assertEqual(list(result.values), [6.0])
+
+    def test_missing_column(self):
+        with self.assertRaises(UnknownInputError):
+            evaluate_many(self.compile("x+y"), {"x": [1, 2]})
@@ -0,0 +1,375 @@
+import json
+import re
+import struct
+import numpy as np
+from program import to_number
+
+# a variable name, optionally in namespaces separated by dots, e.g. "tbl.x"
+name_pattern = re.compile(r"[a-z]+(?:\.[a-z]+)*")
+# many names separated by newlines, so that a bulk load checks them in one match
+names_pattern = re.compile(r"[a-z]+(?:\.[a-z]+)*(?:\n[a-z]+(?:\.[a-z]+)*)*")
+
+# the header of the binary format: a magic string and the number of variables. It is
+# followed by the 8 bytes of each value, a byte per value that is 1 for an int64 and 0 for
+# a float64, and the names as UTF-8 separated by newlines.
+BINARY_MAGIC = b"CALCVAR1"
+binary_header = struct.Struct("<8sQ")
+
+
+def to_array(values):
+    """Converts the value of an array variable into a read-only float array.
+
+    Args:
+        values (str | list | tuple | ndarray): The numbers, or a string of numbers in
+                                               brackets separated by commas, e.g. "[1, 2.5]".
+
+    Raises:
+        ValueError: Raised when the value isn't a non-empty list of numbers.
+
+    Returns:
+        ndarray: The numbers.
+    """
+    if isinstance(values, str):
+        text = values.strip()
+        if not (text.startswith("[") and text.endswith("]")):
+            raise ValueError(f"invalid array {values!r}")
+        values = [to_number(item) for item in text[1:-1].split(",")]
+    array = np.asarray(values)
+    if array.dtype.kind not in "iuf" or array.ndim != 1 or array.size == 0:
+        raise ValueError("an array must be a non-empty list of numbers")
+    array = array.astype(np.float64)
+    array.flags.writeable = False
+    return array
+
+
+def to_value(value):
+    """Converts the value of a variable into a number or an array.
+
+    Args:
+        value (str | int | float | list | ndarray): A number, a numeric string, or the
+                                                    numbers of an array.
+
+    Raises:
+        ValueError: Raised when the value isn't a number or an array of numbers.
+
+    Returns:
+        int | float | ndarray: The number or the array.
+    """
+    if type(value) in (int, float):  # pylint: disable=unidiomatic-typecheck
+        return value
+    if isinstance(value, str):
+        return to_array(value) if value.lstrip().startswith("[") else to_number(value)
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return to_array(value)
+    if isinstance(value, (bool, np.bool_)) or not isinstance(value, (int, float, np.number)):
+        raise ValueError(f"invalid value {value!r}")
+    return value.item() if isinstance(value, np.number) else value
+
+
+def to_text(value) -> str:
+    """Returns the value of a variable the way it is typed, e.g. "[1.0, 2.5]" for an array.
+
+    Args:
+        value (int | float | ndarray): The value.
+
+    Returns:
+        str: The value as text.
+    """
+    if isinstance(value, np.ndarray):
+        return "[" + ", ".join(map(str, value.tolist())) + "]"
+    return str(value)
+
+
+def to_plain(value):
+    """Returns the value of a variable as JSON can store it.
+
+    Args:
+        value (int | float | ndarray): The value.
+
+    Returns:
+        int | float | list: The value, a list for an array.
+    """
+    return value.tolist() if isinstance(value, np.ndarray) else value
+
+
+def flatten(values: dict, namespace: str = None) -> dict:
+    """Turns nested dicts into names with namespaces, e.g. {"tbl": {"x": 1}} -> {"tbl.x": 1}.
+
+    Args:
+        values (dict): The values, where a dict is a namespace.
+        namespace (str | None): The namespace the names are put in.
+
+    Returns:
+        dict: The values by full name.
+    """
+    if not any(isinstance(value, dict) for value in values.values()):
+        if namespace is None:
+            return values
+        prefix = namespace + "."
+        return {prefix + name: value for name, value in values.items()}
+    flat = {}
+    for name, value in values.items():
+        name = f"{namespace}.{name}" if namespace else name
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        else:
+            flat[name] = value
+    return flat
+
+
+class VariableStore(dict):
+    """The variables of a calculator, with the values stored as numbers or arrays.
+
+    It is a dict, so the parser and the evaluators look the names up with one hash
+    lookup, but every change goes through the methods below. Numeric strings are
+    converted when they are stored instead of each time they are read.
+
+    Every change increases version, and versions tells the version of the last change of
+    each name, also when it was deleted. A cache can therefore check that nothing it
+    depends on has changed by comparing a few integers.
+
+    A name can be in a namespace, e.g. "tbl.x", so large tables can be loaded next to
+    each other without their names clashing.
+
+    Attributes:
+        version: The number of changes so far.
+        versions: The version of the last change of each name that has been set.
+        arrays: The names of the variables whose values are arrays.
+    """
+
+    __slots__ = ("version", "versions", "arrays")
+
+    def __init__(self, values=None):
+        """The constructor for the VariableStore class.
+
+        Args:
+            values (dict | None): The variables to start with.
+        """
+        super().__init__()
+        self.version = 0
+        self.versions = {}
+        self.arrays = set()
+        if values:
+            self.load(values)
+
+    def __setitem__(self, name: str, value):
+        value = to_value(value)
+        super().__setitem__(name, value)
+        self.touch(name)
+        if isinstance(value, np.ndarray):
+            self.arrays.add(name)
+        else:
+            self.arrays.discard(name)
+
+    def __delitem__(self, name: str):
+        super().__delitem__(name)
+        self.touch(name)
+
+    def __ior__(self, values):
+        self.update(values)
+        return self
+
+    def __reduce__(self):
+        # the versions only matter to the caches of this process
+        return type(self), (dict(self),)
+
+    def touch(self, name: str):
+        """Records a change of a name. A deleted name is no longer an array.
+
+        Args:
+            name (str): The name.
+        """
+        self.version += 1
+        self.versions[name] = self.version
+        if name not in self:
+            self.arrays.discard(name)
+
+    def version_of(self, name: str) -> int:
+        """Returns the version of the last change of a name.
+
+        Args:
+            name (str): The name.
+
+        Returns:
+            int: The version, 0 if the name has never been set.
+        """
+        return self.versions.get(name, 0)
+
+    def pop(self, name: str, *default):
+        if name not in self:
+            return super().pop(name, *default)
+        value = super().pop(name)
+        self.touch(name)
+        return value
+
+    def popitem(self):
+        name, value = super().popitem()
+        self.touch(name)
+        return name, value
+
+    def setdefault(self, name: str, default=None):
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+    def update(self, *args, **kwargs):
+        self.load(dict(*args, **kwargs))
+
+    def clear(self):
+        self.version += 1
+        self.versions.update(dict.fromkeys(self, self.version))
+        self.arrays.clear()
+        super().clear()
+
+    def load(self, values: dict, namespace: str = None) -> int:
+        """Stores many variables at once, as one change.
+
+        Every value is checked before any is stored, so an invalid value changes nothing.
+
+        Args:
+            values (dict): The values by name. Nested dicts are namespaces.
+            namespace (str | None): The namespace the names are put in, e.g. "tbl".
+
+        Raises:
+            ValueError: Raised when a name or a value is invalid.
+
+        Returns:
+            int: The number of variables stored.
+        """
+        values = {name: to_value(value) for name, value in flatten(values, namespace).items()}
+        if values and not (all(isinstance(name, str) for name in values)
+                           and names_pattern.fullmatch("\n".join(values))):
+            invalid = next(name for name in values
+                           if not isinstance(name, str) or not name_pattern.fullmatch(name))
+            raise ValueError(f"invalid variable name {invalid!r}")
+        super().update(values)
+        self.version += 1
+        self.versions.update(dict.fromkeys(values, self.version))
+        self.arrays.difference_update(values)
+        self.arrays.update(name for name, value in values.items()
+                           if isinstance(value, np.ndarray))
+        return len(values)
+
+    def namespace(self, namespace: str) -> dict:
+        """Returns the variables of a namespace.
+
+        Args:
+            namespace (str): The namespace, e.g. "tbl".
+
+        Returns:
+            dict: The values by name without the namespace.
+        """
+        prefix = namespace + "."
+        return {name[len(prefix):]: value for name, value in self.items()
+                if name.startswith(prefix)}
+
+    def drop(self, namespace: str) -> int:
+        """Deletes the variables of a namespace, as one change.
+
+        Args:
+            namespace (str): The namespace, e.g. "tbl".
+
+        Returns:
+            int: The number of variables deleted.
+        """
+        names = [namespace + "." + name for name in self.namespace(namespace)]
+        self.version += 1
+        for name in names:
+            super().__delitem__(name)
+            self.versions[name] = self.version
+        self.arrays.difference_update(names)
+        return len(names)
+
+    def exported(self, namespace: str = None) -> dict:
+        """Returns the variables, or those of one namespace, as a plain dict.
+
+        Args:
+            namespace (str | None): The namespace, or None for every variable.
+
+        Returns:
+            dict: The values by name. The names of a namespace don't include it.
+        """
+        return dict(self) if namespace is None else self.namespace(namespace)
+
+    def load_json(self, stream, namespace: str = None) -> int:
+        """Loads variables from a JSON object of names and numbers.
+
+        Args:
+            stream (TextIO): The JSON file. A nested object is a namespace.
+            namespace (str | None): The namespace the names are put in.
+
+        Raises:
+            ValueError: Raised when the file isn't a JSON object of valid variables.
+
+        Returns:
+            int: The number of variables loaded.
+        """
+        values = json.load(stream)
+        if not isinstance(values, dict):
+            raise ValueError("expected a JSON object of variables")
+        return self.load(values, namespace)
+
+    def dump_json(self, stream, namespace: str = None):
+        """Writes the variables as a JSON object, with the arrays as lists.
+
+        Args:
+            stream (TextIO): Where the JSON is written.
+            namespace (str | None): Only write the variables of this namespace.
+        """
+        json.dump(self.exported(namespace), stream, default=to_plain)
+
+    def load_binary(self, stream, namespace: str = None) -> int:
+        """Loads variables written by dump_binary.
+
+        Args:
+            stream (BinaryIO): The binary file.
+            namespace (str | None): The namespace the names are put in.
+
+        Raises:
+            ValueError: Raised when the data isn't in the binary format.
+
+        Returns:
+            int: The number of variables loaded.
+        """
+        data = stream.read()
+        if len(data) < binary_header.size:
+            raise ValueError("not a binary variable file")
+        magic, count = binary_header.unpack_from(data)
+        end = binary_header.size + 9 * count
+        if magic != BINARY_MAGIC or len(data) < end:
+            raise ValueError("not a binary variable file")
+        floats = np.frombuffer(data, "<f8", count, binary_header.size)
+        ints = np.frombuffer(data, "<i8", count, binary_header.size)
+        kinds = np.frombuffer(data, np.uint8, count, binary_header.size + 8 * count)
+        names = data[end:].decode("utf-8").split("\n") if count else []
+        if len(names) != count:
+            raise ValueError("the number of names doesn't match the number of values")
+        values = np.where(kinds == 1, ints.astype(object), floats.astype(object)).tolist()
+        return self.load(dict(zip(names, values)), namespace)
+
+    def dump_binary(self, stream, namespace: str = None):
+        """Writes the variables in a compact binary format that loads without parsing.
+
+        Args:
+            stream (BinaryIO): Where the data is written.
+            namespace (str | None): Only write the variables of this namespace.
+
+        Raises:
+            ValueError: Raised when an int doesn't fit in 64 bits or a value is an array,
+                        which the format doesn't have.
+        """
+        values = self.exported(namespace)
+        if any(isinstance(value, np.ndarray) for value in values.values()):
+            raise ValueError("the binary format can't hold array variables, use JSON")
+        kinds = np.array([isinstance(value, int) for value in values.values()], dtype=np.uint8)
+        data = np.array([value if isinstance(value, float) else 0.0
+                         for value in values.values()], dtype="<f8")
+        try:
+            data[kinds == 1] = np.array([value for value in values.values()
+                                         if isinstance(value, int)], dtype="<i8").view("<f8")
+        except OverflowError as error:
+            raise ValueError("an int variable doesn't fit in 64 bits") from error
+        stream.write(binary_header.pack(BINARY_MAGIC, len(values)))
+        stream.write(data.tobytes())
+        stream.write(kinds.tobytes())
+        stream.write("\n".join(values).encode("utf-8"))
@@ -0,0 +1,295 @@
+import numpy as np
+from program import Program, StackMachineMixin, to_number
+from registry import functions
+from shunting_yard import UnknownInputError
+
+# the errors a function raises for one row, which only fail that row
+row_errors = (ArithmeticError, ValueError, TypeError)
+
+
+class BatchResult:
+    """The results of evaluating one program over many rows of variable values.
+
+    Attributes:
+        values: A float array of the results. Rows that failed are NaN.
+        errors: An object array with the exception class of each failed row, None otherwise.
+    """
+
+    def __init__(self, values, errors):
+        """The constructor for the BatchResult class.
+
+        Args:
+            values (ndarray): The results.
+            errors (ndarray): The exception classes of the failed rows.
+        """
+        self.values = values
+        self.errors = errors
+
+    @property
+    def ok(self):
+        """A boolean array that is True for the rows that were evaluated successfully."""
+        return np.equal(self.errors, None)
+
+    def __len__(self):
+        return len(self.values)
+
+
+class VectorEvaluator(StackMachineMixin):
+    """Evaluates a program over arrays of variable values with one array operation per opcode.
+
+    The results and errors match what Evaluator gives for each row separately, but an
+    error only fails its own row instead of the whole batch.
+
+    Attributes:
+        expression: The equation as a compiled program.
+        columns: The values of the variables as arrays (or scalars that apply to every row).
+        operands: An empty list for storing the operand arrays.
+        slots: The arrays of the common subexpressions, by slot number.
+        errors: The exception class of the first error of each row.
+        failed: A boolean array of the rows that have already failed.
+    """
+
+    def __init__(self, expression: Program, columns: dict):
+        """The constructor for the VectorEvaluator class.
+
+        Args:
+            expression (Program): The equation as a compiled program.
+            columns (dict): The variable names and their values as arrays or scalars.
+        """
+        self.expression = expression
+        self.columns = {name: self.column(value) for name, value in columns.items()}
+        shape = np.broadcast_shapes(*(value.shape for value in self.columns.values()))
+        if shape == ():
+            shape = (1,)
+        self.operands = []
+        self.slots = {}
+        self.errors = np.full(shape, None, dtype=object)
+        self.failed = np.zeros(shape, dtype=bool)
+
+    @staticmethod
+    def column(value):
+        """Converts the values of a variable into a float array.
+
+        Args:
+            value (array_like | str | int | float): The values of the variable.
+
+        Returns:
+            ndarray: The values as floats.
+        """
+        if isinstance(value, str):
+            value = to_number(value)
+        return np.asarray(value, dtype=np.float64)
+
+    def evaluate(self) -> BatchResult:
+        """Runs each instruction of the program once over all the rows.
+
+        Raises:
+            UnknownInputError: Raised when the program uses a variable with no column.
+
+        Returns:
+            BatchResult: The rounded results and the errors of each row.
+        """
+        values = self.round(self.value())
+        values[self.failed] = np.nan
+        return BatchResult(values, self.errors)
+
+    def value(self):
+        """Runs each instruction of the program once over all the rows.
+
+        The errors of the rows are recorded in errors and failed.
+
+        Raises:
+            UnknownInputError: Raised when the program uses a variable with no column.
+
+        Returns:
+            ndarray: The results without rounding. The values of the failed rows are
+                     meaningless.
+        """
+        with np.errstate(all="ignore"):
+            return self.execute(self.expression)
+
+    def number(self, value):
+        """Returns the operand of a number in the program.
+
+        Args:
+            value (int | float): The number.
+
+        Returns:
+            ndarray: The number in every row.
+        """
+        return np.full(self.errors.shape, float(value))
+
+    def variable(self, name: str):
+        """Returns the operand of a variable in the program.
+
+        Args:
+            name (str): The name of the variable.
+
+        Raises:
+            UnknownInputError: Raised when the variable has no column.
+
+        Returns:
+            ndarray: The values of the variable in every row.
+        """
+        if name not in self.columns:
+            raise UnknownInputError
+        return np.broadcast_to(self.columns[name], self.errors.shape)
+
+    def fail(self, rows, error):
+        """Records an error for the rows that haven't failed yet.
+
+        Args:
+            rows (ndarray): A boolean array of the rows where the error happened.
+            error (type): The exception class that the scalar evaluator would raise.
+        """
+        rows = rows & ~self.failed
+        self.errors[rows] = error
+        self.failed |= rows
+
+    def calculate(self, operator: str, first, second):
+        """Calculates one operation for every row.
+
+        Args:
+            operator (str): The operation in question.
+            first (ndarray): The first operands.
+            second (ndarray): The second operands.
+
+        Returns:
+            ndarray: The results of the operation.
+        """
+        if operator == "+":
+            return first + second
+        if operator == "-":
+            return first - second
+        if operator == "*":
+            return first * second
+        if operator == "/":
+            self.fail(second == 0, ZeroDivisionError)
+            return first / second
+        # operator == "^"
+        self.fail((first == 0) & (second < 0), ZeroDivisionError)
+        # a negative base with a fractional exponent gives a complex number, which float()
+        # refuses with a TypeError, unless the complex power already overflows
+        fractional = (first < 0) & np.isfinite(second) & (second != np.trunc(second))
+        self.fail(fractional & np.isinf(np.power(np.abs(first), second)), OverflowError)
+        self.fail(fractional, TypeError)
+        result = np.power(first, second)
+        self.fail(np.isinf(result) & np.isfinite(first) & np.isfinite(second), OverflowError)
+        return result
+
+    def function(self, name: str, *args):  # pylint: disable=too-many-return-statements
+        """Calculates a function for every row.
+
+        The built-in functions are calculated with NumPy. Other registered functions are
+        called for each row that hasn't failed yet.
+
+        Args:
+            name (str): The name of the function.
+            args (ndarray): The inputs of the function.
+
+        Returns:
+            ndarray: The results of the function.
+        """
+        x = args[0]
+        if name == "abs":
+            return np.abs(x)
+        if name in ("cos", "sin", "tan"):
+            self.fail(np.isinf(x), ValueError)
+            return getattr(np, name)(x)
+        if name == "exp":
+            result = np.exp(x)
+            self.fail(np.isinf(result) & np.isfinite(x), OverflowError)
+            return result
+        if name in ("lb", "lg", "ln", "log"):
+            self.fail(x <= 0, ValueError)
+            # math.log(x, base) divides by log(base), so this is done the same way here
+            if name == "ln":
+                return np.log(x)
+            base = args[1] if name == "log" else np.float64(2.0 if name == "lb" else 10.0)
+            self.fail(base <= 0, ValueError)
+            self.fail(base == 1, ZeroDivisionError)
+            return np.log(x) / np.log(base)
+        if name == "sqrt":
+            self.fail(x < 0, ValueError)
+            return np.sqrt(x)
+        if name in ("min", "max"):
+            # like min() and max(), the first argument is kept unless the second is
+            # smaller (or larger), which decides what happens with NaN
+            replace = args[1] < x if name == "min" else args[1] > x
+            return np.where(replace, args[1], x)
+        if name == "atan2":
+            return np.arctan2(x, args[1])
+        if name in ("sum", "mean", "_min", "_max", "_float"):
+            # each row has one number, which is its own sum, mean, minimum and maximum,
+            # and the rows are floats already
+            return x
+        if name == "norm":
+            return np.abs(x)
+        if name == "dot":
+            return self.calculate("*", x, args[1])
+        if name in ("_square", "_sqrt"):
+            # the optimizer's replacements of x^2 and x^0.5
+            return self.calculate("^", x, np.float64(2.0 if name == "_square" else 0.5))
+        return self.rows(functions[name].implementation, args)
+
+    def rows(self, implementation, args):
+        """Calls a scalar function once for each row that hasn't failed.
+
+        Args:
+            implementation (callable): The function.
+            args (list): The input arrays of the function.
+
+        Returns:
+            ndarray: The results, NaN in the rows that failed.
+        """
+        shape = self.errors.shape
+        args = [np.broadcast_to(arg, shape) for arg in args]
+        result = np.full(shape, np.nan)
+        for index in np.flatnonzero(~self.failed):
+            try:
+                result.flat[index] = float(implementation(*(float(arg.flat[index])
+                                                            for arg in args)))
+            except row_errors as error:
+                rows = np.zeros(shape, dtype=bool)
+                rows.flat[index] = True
+                self.fail(rows, type(error))
+        return result
+
+    @staticmethod
+    def round(values):
+        """Rounds the results to three decimals the same way as the built-in round().
+
+        np.round scales by 1000 before rounding, which can go the other way on values that
+        are very close to a tie, or overflow on huge values, so those rows use round(). A
+        value whose neighbouring floats are more than 0.001 away is its own rounding, and
+        is kept as it is instead of going through the scaling, which can move it by one ulp.
+
+        Args:
+            values (ndarray): The results.
+
+        Returns:
+            ndarray: The rounded results.
+        """
+        with np.errstate(all="ignore"):
+            rounded = np.round(values, 3)
+            scaled = values * 1000
+            fraction = np.abs(scaled - np.floor(scaled) - 0.5)
+        exact = np.isfinite(values) & ((fraction < 1e-6) | ~np.isfinite(scaled))
+        for index in np.flatnonzero(exact):
+            rounded.flat[index] = round(float(values.flat[index]), 3)
+        unchanged = np.abs(np.spacing(values)) > 0.001
+        rounded[unchanged] = values[unchanged]
+        return rounded
+
+
+def evaluate_many(program: Program, columns: dict) -> BatchResult:
+    """Evaluates a program once for every row of variable values.
+
+    Args:
+        program (Program): The compiled program.
+        columns (dict): The variable names and their values as arrays or scalars.
+
+    Returns:
+        BatchResult: The results and the errors of each row.
+    """
+    return VectorEvaluator(program, columns).evaluate()
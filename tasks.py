@@ -20,6 +20,22 @@ def coverage_report(ctx):
 def lint(ctx):
     ctx.run("pylint src", pty=True)
 
+@task(help={"output": "write the results to this JSON file",
+            "compare": "fail if the results regress from this baseline JSON file",
+            "threshold": "allowed relative throughput drop, defaults to 0.1",
+            "count": "expressions per scenario"})
+def bench(ctx, output="", compare="", threshold=0.1, count=1000):
+    command = f"python3 src/benchmark.py --count {count} --threshold {threshold}"
+    if output:
+        command += f" --output {output}"
+    if compare:
+        command += f" --compare {compare}"
+    ctx.run(command, pty=True)
+
+@task
+def bench_parallel(ctx):
+    ctx.run("python3 src/benchmark.py --scenario parallel", pty=True)
+
 @task
 def open_report(ctx):
     ctx.run("open htmlcov/index.html", pty=True)